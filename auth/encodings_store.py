@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+
+STORE_VERSION = 1
+DEFAULT_STORE_PATH = "models/face_rec_encodings.json"
+# Embedding network behind face_recognition.face_encodings, encodings from
+# other networks are not comparable
+ENCODING_MODEL = "dlib_face_recognition_resnet_model_v1"
+ENCODING_SIZE = 128
+
+# Loaded store contents: (N, D) float32 matrix (memory-mapped by default),
+# a name and an id per row, and the header
+StoredEncodings = namedtuple("StoredEncodings", ["matrix", "names", "ids", "header"])
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    """Write a file through a temporary file in the same directory, then rename it into place."""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class EncodingsStore:
+    """Face encodings on disk: a float32 .npy matrix plus a JSON header.
+
+    The header holds the format version, encoding model, row count, the
+    SHA-256 of the matrix file and the name and id of every row. Each save
+    writes a new matrix file and then atomically replaces the header, so
+    readers always see a consistent pair. The previous matrix file is kept
+    for one more save, for readers that read the old header just before it
+    was replaced; the one from two saves back is removed (processes that
+    mapped it keep their mapping).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read_header(self):
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _data_path(self, header):
+        return os.path.join(os.path.dirname(self.path) or ".", header["data_file"])
+
+    def load(self, mmap=True, verify=True):
+        """Load the encodings, memory-mapping the matrix unless mmap is False.
+
+        Raises ValueError if the header is not supported or the matrix does
+        not match its checksum.
+        """
+        header = self.read_header()
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported encodings store version {header.get('version')} in {self.path}")
+        if header.get("model") != ENCODING_MODEL:
+            raise ValueError(f"Encodings in {self.path} were made with '{header.get('model')}', "
+                             f"expected '{ENCODING_MODEL}'")
+
+        data_path = self._data_path(header)
+        if verify and file_checksum(data_path) != header["sha256"]:
+            raise ValueError(f"Checksum mismatch for {data_path}, the encodings file is corrupt or was modified")
+
+        # allow_pickle stays off: the matrix file can only hold plain numbers
+        matrix = np.load(data_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        names = header["names"]
+        ids = header["ids"]
+        if matrix.dtype != np.float32 or matrix.ndim != 2 or not len(matrix) == len(names) == len(ids):
+            raise ValueError(f"Encodings matrix {matrix.shape} {matrix.dtype} does not match {self.path}")
+        return StoredEncodings(matrix, names, ids, header)
+
+    def save(self, encodings, names, ids=None, landmarks="small"):
+        """Write a new version of the store, replacing the previous one atomically.
+
+        Rows are stored grouped by name, which lets FaceGallery use the
+        memory-mapped matrix without reordering it.
+        """
+        names = list(names)
+        ids = [f"{name}/{i}" for i, name in enumerate(names)] if ids is None else list(ids)
+        matrix = np.asarray(encodings, dtype=np.float32)
+        if matrix.size == 0:
+            matrix = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        if not len(matrix) == len(names) == len(ids):
+            raise ValueError(f"{len(matrix)} encodings for {len(names)} names and {len(ids)} ids")
+
+        order = np.argsort(np.array(names, dtype=object), kind="stable") if names else []
+        matrix = np.ascontiguousarray(matrix[order])
+        names = [names[i] for i in order]
+        ids = [ids[i] for i in order]
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        try:
+            previous = self.read_header() if self.exists() else None
+        except ValueError:
+            previous = None  # Unreadable header, nothing to clean up
+
+        base = os.path.splitext(os.path.basename(self.path))[0]
+        data_file = f"{base}.{time.time_ns()}.npy"
+        data_path = os.path.join(directory, data_file)
+        write_atomic(data_path, lambda f: np.save(f, matrix, allow_pickle=False))
+
+        header = {
+            "version": STORE_VERSION,
+            "model": ENCODING_MODEL,
+            "landmarks": landmarks,
+            "dimension": int(matrix.shape[1]),
+            "count": len(names),
+            "data_file": data_file,
+            "previous_data_file": previous.get("data_file") if previous is not None else None,
+            "sha256": file_checksum(data_path),
+            "created": time.time(),
+            "names": names,
+            "ids": ids,
+        }
+        write_atomic(self.path, lambda f: f.write(json.dumps(header, indent=1).encode()))
+
+        # Older saves did not record their predecessor, leaving it behind is harmless
+        stale = previous.get("previous_data_file") if previous is not None else None
+        if stale not in (None, data_file, header["previous_data_file"]):
+            try:
+                os.remove(os.path.join(directory, stale))
+            except OSError:
+                pass
+        return header
@@ -1,19 +1,58 @@
 import face_recognition
-import cv2
-import numpy as np
-import pickle
+import os
+import threading
 import time
-from db.db_service import get_authorized_users
+from db.db_service import get_authorized_users, get_users_version
 from camera.camera_manager import CameraManager
+from camera.frame_cache import small_rgb, tiny_gray
+from auth.motion_detector import MotionDetector
+from auth.encodings_store import EncodingsStore, DEFAULT_STORE_PATH
+from auth.face_gallery import FaceGallery, UNKNOWN
+from auth.face_tracker import FaceTracker
+from auth.face_detector import FaceDetector
+from auth.identity_cache import IdentityCache
+from auth.face_quality import FaceQuality
+from auth.recognition_engine import RecognitionEngine
+from auth.gallery_watcher import GalleryWatcher
+
+# Results of check_authentication that carry no identity decision
+NO_FRAME = "No frame"
+NO_FACE = "No face detected"
+NO_MOTION = "No motion"
+PENDING = "Recognition pending"
+ENGINE_BUSY = "Recognition workers busy"
+LOW_QUALITY = "Face quality too low"
+NON_IDENTITY_RESULTS = (NO_FRAME, NO_FACE, NO_MOTION, PENDING, ENGINE_BUSY, LOW_QUALITY)
+
+ENCODINGS_PATH = DEFAULT_STORE_PATH
+LEGACY_ENCODINGS_PATH = "models/face_rec_encodings.pickle"
 
 class FaceAuthenticator:
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, motion_gating=True, tracking=True, workers=0, hot_reload=False,
+                 quality_gating=True, identity_cache=True):
+        store = EncodingsStore(ENCODINGS_PATH)
+        if not store.exists() and os.path.exists(LEGACY_ENCODINGS_PATH):
+            # Not converted automatically, unpickling runs whatever the file contains
+            raise FileNotFoundError(f"No encodings store at {ENCODINGS_PATH}, only the legacy "
+                                    f"{LEGACY_ENCODINGS_PATH}. Convert it with: python -m util.migrate_encodings")
+
+        # Hot reload: watch the encodings store and the users table, started
+        # before loading so changes made while starting up are not missed
+        self.watcher = GalleryWatcher(ENCODINGS_PATH, self.reload_gallery,
+                                      users_version=get_users_version) if hot_reload else None
+        
         # Load pre-trained face encodings
         print("[INFO] loading encodings...")
-        with open("models/face_rec_encodings.pickle", "rb") as f:
-            data = pickle.loads(f.read())
-        self.known_face_encodings = data["encodings"]
-        self.known_face_names = data["names"]
+        data, self.gallery = self._load_gallery()
+        # Memory-mapped float32 matrix, rows grouped by name
+        self.known_face_encodings = data.matrix
+        self.known_face_names = data.names
+        # Gallery and authorized users are swapped together under gallery_lock;
+        # each frame works on the pair it picked up when it started
+        self.gallery_lock = threading.Lock()
+        self.gallery_generation = 0
+        self.active_generation = 0
+        self.last_matches = []
         
         # Get shared camera instance
         self.camera = CameraManager.get_instance(camera_index)
@@ -21,55 +60,255 @@ class FaceAuthenticator:
         
         # Configuration
         self.cv_scaler = 4
+        self.frame_timeout = 1.0  # Seconds to wait for a new camera frame
+        
+        # Sequence number of the last frame processed
+        self.last_sequence = 0
+        
+        # Motion gating: skip face detection while the doorway is static,
+        # unless a face was seen within the last face_hold_seconds
+        self.motion_detector = MotionDetector() if motion_gating else None
+        self.face_hold_seconds = 2.0
+        self.last_face_time = 0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        
+        # Face tracking: reuse a track's identity instead of re-encoding it every
+        # frame, and look for known tracks only around their last position.
+        # The whole frame is still scanned every full_detect_interval seconds.
+        self.tracker = FaceTracker(tolerance=self.gallery.tolerance) if tracking else None
+        self.full_detect_interval = 0.5
+        self.last_full_detect = 0
+        self.encodings_computed = 0
+        self.encodings_reused = 0
+        
+        # Full-frame detection: FACE_DETECTOR selects hog, cascade (Haar pre-filter,
+        # HOG on its candidates) or auto (measures both and picks the faster one
+        # that still finds the faces)
+        self.detector = FaceDetector(mode=os.getenv("FACE_DETECTOR", "auto"))
+        
+        # Quality gating: blurred, badly lit or tiny faces are not encoded, a
+        # tracked face keeps its identity and is retried on a later frame
+        self.quality = FaceQuality() if quality_gating else None
+        self.faces_rejected = 0
+        
+        # Recently matched encodings: a resident walking past again is resolved
+        # without searching the gallery when the answer is certain to be the same
+        self.identity_cache = IdentityCache(tolerance=self.gallery.tolerance,
+                                            dimension=self.gallery.dimension) if identity_cache else None
+        
+        # Optional process pool for detection and encoding. Frames are pipelined
+        # through the workers, which encode every face, so tracking is not used.
+        self.engine = None
+        self.frames_dropped = 0  # Frames the engine had no free slot for
+        if workers:
+            max_shape = (self.camera.height // self.cv_scaler + 1, self.camera.width // self.cv_scaler + 1, 3)
+            self.engine = RecognitionEngine(workers, max_shape=max_shape, quality=self.quality)
         
         # Load authorized users from database
-        self.authorized_names = []
+        self.authorized_names = self._load_authorized_users() or []
+        
+        if self.watcher is not None:
+            self.watcher.start()
+
+    def _load_gallery(self):
+        """Load the encodings store and build the gallery used for matching"""
+        data = EncodingsStore(ENCODINGS_PATH).load()
+        # Matrix form of the encodings, matched against all detected faces at once.
+        # FACE_INDEX selects the search index: brute, kdtree, ivf or auto (by gallery size)
+        gallery = FaceGallery(data.matrix, data.names,
+                              index=os.getenv("FACE_INDEX", "auto"), encodings_path=ENCODINGS_PATH)
+        return data, gallery
+
+    def _load_authorized_users(self):
+        """Get the authorized user names from the database, or None if they could not be read"""
         try:
             users = get_authorized_users() 
             if users is not None:
-                self.authorized_names = users
-                print(f"[INFO] Loaded {len(self.authorized_names)} authorized users")
-            else:
-                print("[WARNING] No authorized users found in database")
+                print(f"[INFO] Loaded {len(users)} authorized users")
+                return users
+            print("[WARNING] No authorized users found in database")
         except FileNotFoundError:
             print("[WARNING] Failed to load authorized users from database")
         except Exception as e:
             print(f"[ERROR] Failed to load authorized users: {e}")
+        return None
+
+    def reload_gallery(self):
+        """Rebuild the gallery and authorized users, then swap them in (runs on the watcher thread)"""
+        data, gallery = self._load_gallery()
+        authorized_names = self._load_authorized_users()
+        if authorized_names is None:
+            authorized_names = self.authorized_names  # Keep the current users rather than lock everyone out
+        self.swap_gallery(data.matrix, data.names, gallery, authorized_names)
+
+    def swap_gallery(self, encodings, names, gallery, authorized_names):
+        """Replace the gallery and authorized users at once, taking effect from the next frame"""
+        with self.gallery_lock:
+            self.known_face_encodings = encodings
+            self.known_face_names = names
+            self.gallery = gallery
+            self.authorized_names = authorized_names
+            self.gallery_generation += 1
+        print(f"[INFO] Face gallery reloaded: {len(names)} encodings, {len(authorized_names)} authorized users")
 
     def check_authentication(self):
-        """Capture frame and return authentication status"""
-        frame = self.camera.get_frame()
-        if frame is None:
-            return "No frame", False
+        """Wait for the next camera frame and return authentication status"""
+        latest = self.camera.wait_for_frame(self.last_sequence, timeout=self.frame_timeout,
+                                            consumer="face_auth")
+        if latest is None:
+            return NO_FRAME, False
+        self.last_sequence = latest.sequence
+        self.frames_checked += 1
+        
+        # Pick up the gallery once per frame, a reload only applies to the next one
+        with self.gallery_lock:
+            gallery, authorized_names = self.gallery, self.authorized_names
+            generation = self.gallery_generation
+        if generation != self.active_generation:
+            # Identities of existing tracks and cached encodings came from the old gallery
+            if self.tracker is not None:
+                self.tracker.reset()
+            if self.identity_cache is not None:
+                self.identity_cache.clear()
+            self.active_generation = generation
         
-        # Resize frame for faster processing
-        resized_frame = cv2.resize(frame, (0, 0), fx=(1/self.cv_scaler), fy=(1/self.cv_scaler))
-        rgb_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
+        # Cheap motion check before running the face detector
+        if self.motion_detector is not None:
+            tiny_frame = self.camera.get_derived(latest, tiny_gray, *self.motion_detector.size)
+            motion = self.motion_detector.detect(tiny_frame)
+            if not motion and time.time() - self.last_face_time > self.face_hold_seconds:
+                self.frames_skipped += 1
+                return NO_MOTION, False
+        
+        # Resized RGB frame for faster processing, shared with other consumers of the frame
+        rgb_frame = self.camera.get_derived(latest, small_rgb, self.cv_scaler)
+        if self.engine is not None:
+            return self._check_with_engine(latest, rgb_frame, gallery, authorized_names)
         
         # First check if any face is detected
-        face_locations = face_recognition.face_locations(rgb_frame)
+        face_locations = self._detect_faces(rgb_frame)
+        if self.tracker is not None:
+            tracks = self.tracker.update(face_locations)
         if not face_locations:
-            return "No face detected", False
+            return NO_FACE, False
+        self.last_face_time = time.time()
         
         # Only proceed with recognition if faces are detected
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations, model='large')
-        detected_name = "Unknown"
-        is_authorized = False
-        
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-            
-            if True in matches:
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    detected_name = name
-                    if name in self.authorized_names:
-                        is_authorized = True
-                    break  # Exit after first match
-        
-        return detected_name, is_authorized
+        if self.tracker is None:
+            face_locations = self._good_faces(rgb_frame, face_locations)
+            face_encodings = []
+            if face_locations:
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations, model='large')
+            self.encodings_computed += len(face_encodings)
+            # One batched distance computation for all faces in the frame
+            self.last_matches = self._match(gallery, face_encodings)
+        else:
+            self.last_matches = self._match_tracks(rgb_frame, tracks, gallery)
+        if not self.last_matches:
+            return LOW_QUALITY, False
+        return self._decide(self.last_matches, authorized_names)
+
+    def _decide(self, matches, authorized_names):
+        """Turn the matches of one frame into (name, authorized)"""
+        for match in matches:
+            if match.name != UNKNOWN:
+                return match.name, match.name in authorized_names  # First recognized face decides
+        return UNKNOWN, False
+
+    def _check_with_engine(self, latest, rgb_frame, gallery, authorized_names):
+        """Feed the frame to the worker pool and decide on the oldest finished frame"""
+        submitted = self.engine.submit(latest.sequence, rgb_frame)
+        if not submitted:
+            # All slots are taken, e.g. while a worker restarts; this frame is not recognized
+            self.frames_dropped += 1
+        # Only block while every worker is busy, otherwise keep the pool supplied with frames
+        timeout = self.frame_timeout if self.engine.in_flight() >= self.engine.workers else 0
+        result = self.engine.get_result(timeout)
+        if result is None:
+            return (PENDING if submitted else ENGINE_BUSY), False
+        if not result.locations:
+            return NO_FACE, False
+        self.last_face_time = time.time()
+        # Faces that failed the quality check in the worker come back without an encoding
+        face_encodings = [encoding for encoding in result.encodings if encoding is not None]
+        self.faces_rejected += len(result.encodings) - len(face_encodings)
+        if not face_encodings:
+            return LOW_QUALITY, False
+        self.encodings_computed += len(face_encodings)
+        self.last_matches = self._match(gallery, face_encodings)
+        return self._decide(self.last_matches, authorized_names)
+
+    def _detect_faces(self, rgb_frame):
+        """Find face boxes, only searching around tracked faces between full-frame scans"""
+        now = time.time()
+        if self.tracker is None or not self.tracker.tracks or now - self.last_full_detect >= self.full_detect_interval:
+            self.last_full_detect = now
+            return self.detector.detect(rgb_frame)
+        return self.detector.detect_regions(rgb_frame, self.tracker.search_regions(rgb_frame.shape))
+
+    def _match(self, gallery, face_encodings):
+        """Match encodings against the gallery, answering from the identity cache where possible"""
+        if self.identity_cache is None:
+            return gallery.match(face_encodings)
+        now = time.time()
+        matches = [self.identity_cache.lookup(encoding, now) for encoding in face_encodings]
+        missing = [i for i, match in enumerate(matches) if match is None]
+        if missing:
+            # Cache misses are still matched in one batch
+            for i, match in zip(missing, gallery.match([face_encodings[i] for i in missing])):
+                matches[i] = match
+                self.identity_cache.add(face_encodings[i], match, now)
+        return matches
+
+    def _good_faces(self, rgb_frame, boxes):
+        """Drop the faces failing the quality check, counting them"""
+        if self.quality is None:
+            return boxes
+        accepted, rejected = self.quality.filter(rgb_frame, boxes)
+        self.faces_rejected += len(rejected)
+        return accepted
+
+    def _match_tracks(self, rgb_frame, tracks, gallery):
+        """Encode only tracks without a confident recent identity, reuse the rest"""
+        now = time.time()
+        stale = [track for track in tracks if self.tracker.needs_encoding(track, now)]
+        encodable = self._good_faces(rgb_frame, [track.box for track in stale])
+        # Tracks whose face is not good enough right now are deferred to a later frame
+        deferred = len(stale) - len(encodable)
+        stale = [track for track in stale if track.box in encodable]
+        if stale:
+            face_encodings = face_recognition.face_encodings(rgb_frame, [track.box for track in stale],
+                                                             model='large')
+            for track, match in zip(stale, self._match(gallery, face_encodings)):
+                self.tracker.assign(track, match, now)
+        self.encodings_computed += len(stale)
+        self.encodings_reused += len(tracks) - len(stale) - deferred
+        # Deferred tracks keep their previous identity, if they had one yet
+        return [track.match for track in tracks if track.match is not None]
+
+    def get_stats(self):
+        """Get counters of frames checked, skipped by the motion gate, encodings reused by tracking
+        and faces rejected for quality"""
+        encodings = self.encodings_computed + self.encodings_reused
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped_no_motion": self.frames_skipped,
+            "skip_ratio": self.frames_skipped / self.frames_checked if self.frames_checked else 0.0,
+            "encodings_computed": self.encodings_computed,
+            "encodings_reused": self.encodings_reused,
+            "reuse_ratio": self.encodings_reused / encodings if encodings else 0.0,
+            "active_tracks": len(self.tracker.tracks) if self.tracker is not None else 0,
+            "faces_rejected_quality": self.faces_rejected,
+            # Only faces checked in this process, not in the recognition workers
+            "quality_rejections": dict(self.quality.rejected) if self.quality is not None else {},
+            "detector": self.detector.get_stats(),
+            "identity_cache": self.identity_cache.get_stats() if self.identity_cache is not None else None,
+            "engine": self.engine.get_stats() if self.engine is not None else None,
+            "frames_dropped_engine_busy": self.frames_dropped,
+            "gallery_reloads": self.watcher.reloads if self.watcher is not None else 0,
+            "gallery_reload_failures": self.watcher.failed_reloads if self.watcher is not None else 0,
+        }
 
     # debugging function to check authentication
     def run(self):
@@ -81,19 +320,21 @@ class FaceAuthenticator:
                 
                 # Only print when a face is detected and not too frequently
                 current_time = time.time()
-                if name != "No face detected" and (current_time - last_detection_time) >= 1:
+                if name not in NON_IDENTITY_RESULTS and (current_time - last_detection_time) >= 1:
                     status = "AUTHORIZED" if authorized else "UNAUTHORIZED"
                     print(f"User: {name} - Status: {status}")
                     last_detection_time = current_time
                 
-                time.sleep(0.1)  # Small delay to prevent CPU overload
-                
         except KeyboardInterrupt:
             print("\nStopping authentication system...")
         finally:
             self.cleanup()
 
     def cleanup(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.engine is not None:
+            self.engine.stop()
         if self.camera:
             self.camera.release()  # Unregister this component
 
@@ -0,0 +1,177 @@
+import os
+import time
+
+import cv2
+import face_recognition
+import numpy as np
+
+from auth.face_tracker import iou
+
+CASCADE_FILE = "haarcascade_frontalface_default.xml"
+
+# Detection paths: HOG over the whole frame, or a Haar pre-filter with HOG
+# confirming its candidates; auto measures both and picks one
+HOG = "hog"
+CASCADE = "cascade"
+AUTO = "auto"
+
+
+def find_cascade_file(name=CASCADE_FILE):
+    """Look for a Haar cascade in OpenCV's data folder, then in the project folder."""
+    folders = [getattr(getattr(cv2, "data", None), "haarcascades", ""),
+               os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))]
+    for folder in folders:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def merge_regions(regions):
+    """Merge overlapping (top, right, bottom, left) regions into their bounding boxes."""
+    merged = list(regions)
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                a, b = merged[i], merged[j]
+                if a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]:
+                    merged[i] = (min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return merged
+
+
+class FaceDetector:
+    """Face detector with an optional cheap Haar stage in front of dlib's HOG.
+
+    In cascade mode the Haar classifier proposes candidates and HOG only
+    runs on padded crops around them, so frames without a face-like region
+    cost a fraction of a full HOG pass. In auto mode, every calibrate_every
+    frames both paths run on the same frame: the cascade is used while it
+    finds at least min_recall of the faces HOG finds and is faster.
+    """
+
+    def __init__(self, mode=AUTO, cascade_path=None, padding=0.5, min_size=20, min_recall=0.9,
+                 calibrate_every=30, max_crop_fraction=0.6, smoothing=0.2):
+        self.mode = mode
+        self.padding = padding
+        self.min_size = min_size
+        self.min_recall = min_recall
+        self.calibrate_every = calibrate_every
+        self.max_crop_fraction = max_crop_fraction
+        self.smoothing = smoothing
+
+        self.cascade = None
+        cascade_path = cascade_path or find_cascade_file()
+        if cascade_path is not None:
+            self.cascade = cv2.CascadeClassifier(cascade_path)
+            if self.cascade.empty():
+                self.cascade = None
+        if self.cascade is None and mode != HOG:
+            if mode == CASCADE:
+                raise Exception(f"Failed to load Haar Cascade classifier {CASCADE_FILE}")
+            print(f"[DETECTOR] {CASCADE_FILE} not found, using HOG only")
+            self.mode = HOG
+        self.use_cascade = self.mode == CASCADE
+
+        # Statistics, times are smoothed per-frame milliseconds
+        self.frames = 0
+        self.cascade_frames = 0
+        self.calibrations = 0
+        self.next_calibration = 1
+        self.cascade_recall = None
+        self.hog_ms = None
+        self.cascade_ms = None
+
+    def hog(self, image):
+        return face_recognition.face_locations(image)
+
+    def detect(self, image):
+        """Find (top, right, bottom, left) face boxes in an RGB frame."""
+        self.frames += 1
+        if self.mode == AUTO and self.frames >= self.next_calibration:
+            return self._calibrate(image)
+        if self.use_cascade:
+            self.cascade_frames += 1
+            return self._detect_cascade(image)
+        return self.hog(image)
+
+    def detect_regions(self, image, regions):
+        """Run HOG on crops of the frame, mapping the faces back to frame coordinates."""
+        boxes = []
+        for top, right, bottom, left in regions:
+            crop = np.ascontiguousarray(image[top:bottom, left:right])
+            for t, r, b, l in self.hog(crop):
+                box = (t + top, r + left, b + top, l + left)
+                # Overlapping regions can find the same face, keep it once
+                if all(iou(box, other) < 0.5 for other in boxes):
+                    boxes.append(box)
+        return boxes
+
+    def candidates(self, image):
+        """Padded regions around the Haar cascade's face candidates."""
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        found = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3,
+                                              minSize=(self.min_size, self.min_size))
+        height, width = gray.shape[:2]
+        regions = []
+        for x, y, w, h in found:
+            pad_x, pad_y = int(w * self.padding), int(h * self.padding)
+            regions.append((max(y - pad_y, 0), min(x + w + pad_x, width),
+                            min(y + h + pad_y, height), max(x - pad_x, 0)))
+        return merge_regions(regions)
+
+    def _detect_cascade(self, image):
+        regions = self.candidates(image)
+        if not regions:
+            return []
+        # Crops covering most of the frame cost more than one full pass
+        area = sum((bottom - top) * (right - left) for top, right, bottom, left in regions)
+        if area > self.max_crop_fraction * image.shape[0] * image.shape[1]:
+            return self.hog(image)
+        return self.detect_regions(image, regions)
+
+    def _smooth(self, average, value):
+        return value if average is None else average + self.smoothing * (value - average)
+
+    def _calibrate(self, image):
+        """Run both paths on one frame and choose the path for the next frames."""
+        self.calibrations += 1
+        start = time.time()
+        hog_boxes = self.hog(image)
+        self.hog_ms = self._smooth(self.hog_ms, (time.time() - start) * 1000)
+        start = time.time()
+        cascade_boxes = self._detect_cascade(image)
+        self.cascade_ms = self._smooth(self.cascade_ms, (time.time() - start) * 1000)
+
+        if hog_boxes:
+            found = sum(1 for box in hog_boxes if any(iou(box, other) >= 0.3 for other in cascade_boxes))
+            self.cascade_recall = self._smooth(self.cascade_recall, found / float(len(hog_boxes)))
+        # Recall can only be measured on frames with faces, keep trying until one comes
+        wait = self.calibrate_every if hog_boxes or self.cascade_recall is not None else 1
+        self.next_calibration = self.frames + wait
+
+        use_cascade = (self.cascade_recall is not None and self.cascade_recall >= self.min_recall
+                       and self.cascade_ms < self.hog_ms)
+        if use_cascade != self.use_cascade:
+            print(f"[DETECTOR] Switching to {CASCADE if use_cascade else HOG} detection "
+                  f"(cascade recall {self.cascade_recall:.2f}, {self.cascade_ms:.1f} ms vs HOG {self.hog_ms:.1f} ms)")
+            self.use_cascade = use_cascade
+        return hog_boxes
+
+    def get_stats(self):
+        return {
+            "mode": self.mode,
+            "active": CASCADE if self.use_cascade else HOG,
+            "frames": self.frames,
+            "cascade_frames": self.cascade_frames,
+            "calibrations": self.calibrations,
+            "cascade_recall": self.cascade_recall,
+            "hog_ms": self.hog_ms,
+            "cascade_ms": self.cascade_ms,
+        }
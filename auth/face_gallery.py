@@ -0,0 +1,129 @@
+from collections import namedtuple
+
+import numpy as np
+
+from auth.gallery_index import create_index, load_or_build_index
+
+# Same threshold as face_recognition.compare_faces
+DEFAULT_TOLERANCE = 0.6
+ENCODING_SIZE = 128
+UNKNOWN = "Unknown"
+# Neighbours fetched from approximate indexes to find the runner-up identity
+CANDIDATES = 10
+
+# Result of matching one face: identity (UNKNOWN when nothing is within the
+# tolerance), position of the closest encoding in the enrolled list, its
+# distance and how much further away the closest other identity is
+Match = namedtuple("Match", ["name", "index", "distance", "margin"])
+
+
+class FaceGallery:
+    """Enrolled face encodings held as one contiguous float32 matrix.
+
+    Rows are grouped by identity so the closest encoding of every identity
+    can be found with a single reduction over the distance matrix. Large
+    galleries can be searched through an approximate index instead (see
+    auth.gallery_index); given encodings_path, the index is persisted next
+    to the encodings file.
+    """
+
+    def __init__(self, encodings, names, tolerance=DEFAULT_TOLERANCE, index="brute", encodings_path=None):
+        names = list(names)
+        matrix = np.asarray(encodings, dtype=np.float32)
+        if matrix.size == 0:
+            matrix = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        if len(matrix) != len(names):
+            raise ValueError(f"{len(matrix)} encodings for {len(names)} names")
+        self.tolerance = tolerance
+
+        # Group rows of the same identity together
+        order = np.argsort(np.array(names, dtype=object), kind="stable") if names else np.array([], dtype=int)
+        self.names = [names[i] for i in order]
+        self.source_index = order
+        if np.array_equal(order, np.arange(len(order))) and matrix.flags.c_contiguous:
+            # Already grouped (as saved by EncodingsStore), keep a memory-mapped matrix mapped
+            self.matrix = matrix
+        else:
+            self.matrix = np.ascontiguousarray(matrix[order])
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+        # First row of each identity, for per-identity reductions
+        self.identities = []
+        starts = []
+        for row, name in enumerate(self.names):
+            if not self.identities or self.identities[-1] != name:
+                self.identities.append(name)
+                starts.append(row)
+        self.identity_starts = np.array(starts, dtype=np.intp)
+        self.row_identity = np.repeat(np.arange(len(starts)), np.diff(starts + [len(self.names)]))
+
+        self.index = None
+        if len(self.names):
+            if encodings_path:
+                self.index = load_or_build_index(index, self.matrix, encodings_path)
+            else:
+                self.index = create_index(index, self.matrix)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def dimension(self):
+        return self.matrix.shape[1]
+
+    def distances(self, queries):
+        """Euclidean distances from each query encoding (M, D) to every gallery row (M, N)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        squared = q_norms[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.matrix.T)
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared)
+
+    def match(self, queries):
+        """Match every query encoding in one pass, returning a Match per query."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.size == 0:
+            return []
+        queries = np.atleast_2d(queries)
+        if not len(self):
+            return [Match(UNKNOWN, -1, float("inf"), float("inf"))] * len(queries)
+
+        if not self.index.full_scan:
+            return self._candidate_matches(*self.index.search(queries, CANDIDATES))
+        distances = self.distances(queries)
+        return self._matches(distances, np.argmin(distances, axis=1))
+
+    def _matches(self, distances, best_rows):
+        """Build Match results from query distances (M, N) and the closest row of each query."""
+        rows = np.arange(len(distances))
+        best = distances[rows, best_rows]
+
+        # Closest encoding of every identity, then the best one of another identity
+        per_identity = np.minimum.reduceat(distances, self.identity_starts, axis=1)
+        per_identity[rows, self.row_identity[best_rows]] = np.inf
+        runner_up = per_identity.min(axis=1) if per_identity.shape[1] else np.full(len(rows), np.inf)
+
+        matches = []
+        for row, distance, other in zip(best_rows, best, runner_up):
+            name = self.names[row] if distance <= self.tolerance else UNKNOWN
+            matches.append(Match(name, int(self.source_index[row]), float(distance), float(other - distance)))
+        return matches
+
+    def _candidate_matches(self, rows, distances):
+        """Build Match results from the nearest rows (M, k) returned by an index."""
+        matches = []
+        for candidate_rows, candidate_distances in zip(rows, distances):
+            best = int(candidate_rows[0])
+            if best < 0:
+                matches.append(Match(UNKNOWN, -1, float("inf"), float("inf")))
+                continue
+            distance = float(candidate_distances[0])
+            # Runner-up is the closest candidate of another identity, if any was returned
+            other = float("inf")
+            for row, row_distance in zip(candidate_rows[1:], candidate_distances[1:]):
+                if row >= 0 and self.row_identity[row] != self.row_identity[best]:
+                    other = float(row_distance)
+                    break
+            name = self.names[best] if distance <= self.tolerance else UNKNOWN
+            matches.append(Match(name, int(self.source_index[best]), distance, other - distance))
+        return matches
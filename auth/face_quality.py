@@ -0,0 +1,74 @@
+from collections import Counter
+
+import cv2
+
+# Reasons a face is rejected before encoding
+TOO_SMALL = "too_small"
+TOO_DARK = "too_dark"
+TOO_BRIGHT = "too_bright"
+LOW_CONTRAST = "low_contrast"
+BLURRY = "blurry"
+
+
+class FaceQuality:
+    """Cheap checks deciding whether a detected face is worth encoding.
+
+    A face is rejected when its box is too small, when its region is too
+    dark, too bright or too flat, or when it is blurred (low variance of
+    the Laplacian). Thresholds apply to the frame the boxes were found in.
+    """
+
+    def __init__(self, min_size=20, min_sharpness=30.0, min_brightness=40, max_brightness=220,
+                 min_contrast=15.0):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+
+        # Statistics
+        self.faces_checked = 0
+        self.rejected = Counter()
+
+    def check(self, image, box):
+        """Return the reason the (top, right, bottom, left) face is rejected, or None if it is good enough."""
+        self.faces_checked += 1
+        reason = self._reason(image, box)
+        if reason is not None:
+            self.rejected[reason] += 1
+        return reason
+
+    def _reason(self, image, box):
+        top, right, bottom, left = box
+        if min(bottom - top, right - left) < self.min_size:
+            return TOO_SMALL
+
+        roi = image[max(top, 0):bottom, max(left, 0):right]
+        if roi.size == 0:
+            return TOO_SMALL
+        gray = cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY) if roi.ndim == 3 else roi
+        mean, std = cv2.meanStdDev(gray)
+        if mean[0][0] < self.min_brightness:
+            return TOO_DARK
+        if mean[0][0] > self.max_brightness:
+            return TOO_BRIGHT
+        if std[0][0] < self.min_contrast:
+            return LOW_CONTRAST
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.min_sharpness:
+            return BLURRY
+        return None
+
+    def filter(self, image, boxes):
+        """Split face boxes into the ones worth encoding and the rejected ones."""
+        accepted = []
+        rejected = []
+        for box in boxes:
+            (accepted if self.check(image, box) is None else rejected).append(box)
+        return accepted, rejected
+
+    def get_stats(self):
+        return {
+            "faces_checked": self.faces_checked,
+            "faces_rejected": sum(self.rejected.values()),
+            "rejected_by_reason": dict(self.rejected),
+        }
@@ -0,0 +1,136 @@
+import itertools
+import time
+
+from auth.face_gallery import DEFAULT_TOLERANCE, UNKNOWN
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    intersection = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def _center(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class Track:
+    """A face followed across frames, with the identity decided for it."""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.match = None
+        self.first_seen = now
+        self.last_seen = now
+        self.last_encoded = 0
+        self.misses = 0
+
+    @property
+    def name(self):
+        return self.match.name if self.match is not None else None
+
+
+class FaceTracker:
+    """Gives face detections stable track ids so identities can be reused between frames.
+
+    Detections are associated to tracks greedily by IoU, falling back to
+    centroid distance for fast movement. A track needs a fresh encoding
+    when it is new, when its last match was ambiguous, or after
+    refresh_interval seconds.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=5, refresh_interval=2.0,
+                 min_margin=0.08, uncertain_band=0.05, tolerance=DEFAULT_TOLERANCE, search_padding=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.refresh_interval = refresh_interval
+        self.min_margin = min_margin
+        self.uncertain_band = uncertain_band
+        self.tolerance = tolerance
+        self.search_padding = search_padding
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, now=None):
+        """Associate this frame's detections with tracks, returning one track per box."""
+        now = time.time() if now is None else now
+        assigned = [None] * len(boxes)
+        free_tracks = set(range(len(self.tracks)))
+
+        # Greedy assignment, best overlapping pairs first
+        pairs = sorted(((iou(track.box, box), t, b)
+                        for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)), reverse=True)
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in free_tracks and assigned[b] is None:
+                assigned[b] = self.tracks[t]
+                free_tracks.discard(t)
+
+        # Boxes that moved too far to overlap: nearest track whose center is within one box size
+        for b, box in enumerate(boxes):
+            if assigned[b] is not None:
+                continue
+            cy, cx = _center(box)
+            size = max(box[2] - box[0], box[1] - box[3])
+            best = None
+            for t in free_tracks:
+                ty, tx = _center(self.tracks[t].box)
+                distance = ((cy - ty) ** 2 + (cx - tx) ** 2) ** 0.5
+                if distance <= size and (best is None or distance < best[0]):
+                    best = (distance, t)
+            if best is not None:
+                assigned[b] = self.tracks[best[1]]
+                free_tracks.discard(best[1])
+
+        for b, box in enumerate(boxes):
+            if assigned[b] is None:
+                assigned[b] = Track(next(self._ids), box, now)
+                self.tracks.append(assigned[b])
+            assigned[b].box = box
+            assigned[b].last_seen = now
+            assigned[b].misses = 0
+
+        # Age out tracks that were not seen for max_misses frames
+        for t in free_tracks:
+            self.tracks[t].misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return assigned
+
+    def needs_encoding(self, track, now=None):
+        """Check whether the track's identity has to be recomputed from a fresh encoding."""
+        now = time.time() if now is None else now
+        match = track.match
+        if match is None or now - track.last_encoded >= self.refresh_interval:
+            return True
+        # Low confidence: close to the acceptance threshold, or close to another identity
+        if abs(match.distance - self.tolerance) < self.uncertain_band:
+            return True
+        return match.name != UNKNOWN and match.margin < self.min_margin
+
+    def assign(self, track, match, now=None):
+        """Record the identity matched for a track from a fresh encoding."""
+        track.match = match
+        track.last_encoded = time.time() if now is None else now
+
+    def search_regions(self, frame_shape):
+        """Padded (top, right, bottom, left) regions around the current tracks, clipped to the frame."""
+        height, width = frame_shape[:2]
+        regions = []
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            pad_y = int((bottom - top) * self.search_padding)
+            pad_x = int((right - left) * self.search_padding)
+            regions.append((max(top - pad_y, 0), min(right + pad_x, width),
+                            min(bottom + pad_y, height), max(left - pad_x, 0)))
+        return regions
+
+    def reset(self):
+        self.tracks = []
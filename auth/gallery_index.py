@@ -0,0 +1,325 @@
+import hashlib
+import os
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional, KDTreeIndex falls back to brute force
+    cKDTree = None
+
+# Galleries up to this size are scanned exhaustively when the index kind is "auto"
+AUTO_EXACT_LIMIT = 5000
+
+
+def matrix_checksum(matrix):
+    """Fingerprint of a gallery matrix, used to detect stale persisted indexes."""
+    digest = hashlib.sha1(np.ascontiguousarray(matrix).tobytes())
+    digest.update(str(matrix.shape).encode())
+    return digest.hexdigest()
+
+
+def _squared_distances(queries, matrix, sq_norms):
+    squared = np.einsum("ij,ij->i", queries, queries)[:, None] + sq_norms[None, :] \
+        - 2.0 * (queries @ matrix.T)
+    return np.maximum(squared, 0.0, out=squared)
+
+
+def _top_k(squared, k):
+    """Column indices and distances of the k smallest entries of each row, in order."""
+    k = min(k, squared.shape[1])
+    if k < squared.shape[1]:
+        rows = np.argpartition(squared, k - 1, axis=1)[:, :k]
+    else:
+        rows = np.broadcast_to(np.arange(squared.shape[1]), squared.shape).copy()
+    picked = np.take_along_axis(squared, rows, axis=1)
+    order = np.argsort(picked, axis=1)
+    return np.take_along_axis(rows, order, axis=1), np.sqrt(np.take_along_axis(picked, order, axis=1))
+
+
+class GalleryIndex:
+    """Nearest-neighbour search over the rows of a FaceGallery matrix.
+
+    search() returns the row numbers and distances of the k closest rows of
+    every query, closest first. For full_scan indexes the gallery computes
+    all distances itself instead, which also gives exact runner-up margins.
+    """
+    kind = None
+    full_scan = False
+    exact = False
+
+    def build(self, matrix):
+        raise NotImplementedError
+
+    def search(self, queries, k=1):
+        raise NotImplementedError
+
+    def state(self):
+        """Arrays needed to restore the index without rebuilding it."""
+        return {}
+
+    def restore(self, matrix, state):
+        self.build(matrix)
+
+
+class BruteForceIndex(GalleryIndex):
+    """Exact linear scan over the whole gallery."""
+    kind = "brute"
+    full_scan = True
+    exact = True
+
+    def build(self, matrix):
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+
+    def search(self, queries, k=1):
+        return _top_k(_squared_distances(queries, self.matrix, self.sq_norms), k)
+
+
+class KDTreeIndex(GalleryIndex):
+    """Exact KD-tree search through scipy.
+
+    At 128 dimensions the tree prunes little, it pays off for repeated
+    queries close to enrolled encodings. Without scipy it scans the gallery.
+    The tree is rebuilt on load rather than unpickled from disk.
+    """
+    kind = "kdtree"
+    exact = True
+
+    def build(self, matrix):
+        self.tree = cKDTree(matrix) if cKDTree is not None else None
+        if self.tree is None:
+            print("[INDEX] scipy is not installed, KD-tree index falls back to a linear scan")
+            self.fallback = BruteForceIndex()
+            self.fallback.build(matrix)
+
+    def search(self, queries, k=1):
+        if self.tree is None:
+            return self.fallback.search(queries, k)
+        k = min(k, self.tree.n)
+        distances, rows = self.tree.query(queries, k=k)
+        if k == 1:
+            rows, distances = rows[:, None], distances[:, None]
+        return rows, distances.astype(np.float32)
+
+
+class IVFIndex(GalleryIndex):
+    """Inverted-file index: k-means clusters, only the nprobe closest are scanned.
+
+    Pure numpy, approximate. Recall depends on nprobe relative to the number
+    of clusters (about sqrt(N) by default).
+    """
+    kind = "ivf"
+
+    def __init__(self, n_lists=None, nprobe=8, iterations=10, seed=0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+
+    def build(self, matrix):
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(matrix))))
+        n_lists = min(n_lists, max(len(matrix), 1))
+
+        rng = np.random.default_rng(self.seed)
+        centroids = matrix[rng.choice(len(matrix), n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._assign(matrix, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, matrix)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        self._set_lists(centroids, self._assign(matrix, centroids))
+
+    def _assign(self, matrix, centroids):
+        """Nearest centroid of every row, computed in chunks to bound memory."""
+        sq_norms = np.einsum("ij,ij->i", centroids, centroids)
+        return np.concatenate([
+            np.argmin(_squared_distances(matrix[start:start + 4096], centroids, sq_norms), axis=1)
+            for start in range(0, len(matrix), 4096)
+        ]) if len(matrix) else np.empty(0, dtype=np.intp)
+
+    def _set_lists(self, centroids, assignment):
+        self.centroids = centroids.astype(np.float32)
+        self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        # Rows sorted by cluster, list i is list_rows[list_offsets[i]:list_offsets[i + 1]]
+        self.list_rows = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def search(self, queries, k=1):
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = _top_k(_squared_distances(queries, self.centroids, self.centroid_norms), nprobe)[0]
+        all_rows = []
+        all_distances = []
+        for query, lists in zip(queries, probes):
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+            if len(candidates):
+                squared = _squared_distances(query[None, :], self.matrix[candidates], self.sq_norms[candidates])
+                rows, distances = _top_k(squared, k)
+                rows, distances = candidates[rows[0]], distances[0]
+            else:
+                rows, distances = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+            # Pad when the probed lists hold fewer than k rows
+            missing = k - len(rows)
+            all_rows.append(np.concatenate([rows, np.full(missing, -1)]) if missing > 0 else rows)
+            all_distances.append(np.concatenate([distances, np.full(missing, np.inf)])
+                                 if missing > 0 else distances)
+        return np.array(all_rows), np.array(all_distances, dtype=np.float32)
+
+    def state(self):
+        return {"centroids": self.centroids, "list_rows": self.list_rows, "list_offsets": self.list_offsets,
+                "nprobe": np.array(self.nprobe)}
+
+    def restore(self, matrix, state):
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        self.centroids = state["centroids"]
+        self.centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.list_rows = state["list_rows"]
+        self.list_offsets = state["list_offsets"]
+        self.nprobe = int(state["nprobe"])
+
+
+class PCAIndex(GalleryIndex):
+    """Coarse-to-fine search: shortlist in a PCA subspace, re-rank with exact distances.
+
+    Distances between projections onto the principal axes never exceed the
+    full distances, so the shortlist is grown until no row outside it can
+    be closer than the k-th re-ranked row, or than the closest row plus
+    margin. The closest row is always exact, as are all neighbours within
+    margin of it; further ones, which only make larger margins, may be
+    skipped.
+    """
+    kind = "pca"
+    exact = True
+
+    def __init__(self, dims=32, shortlist=64, margin=0.5):
+        self.dims = dims
+        self.shortlist = shortlist
+        self.margin = margin
+
+    def build(self, matrix):
+        mean = matrix.mean(axis=0) if len(matrix) else np.zeros(matrix.shape[1], dtype=np.float32)
+        centered = (matrix - mean).astype(np.float64)
+        # Principal axes from the covariance, largest variance first
+        _, vectors = np.linalg.eigh(centered.T @ centered)
+        components = vectors[:, ::-1][:, :min(self.dims, matrix.shape[1])]
+        self._set_basis(matrix, mean.astype(np.float32), components.astype(np.float32))
+
+    def _set_basis(self, matrix, mean, components):
+        self.matrix = matrix
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+        self.mean = mean
+        self.components = components
+        self.projected = self._project(matrix)
+        self.projected_norms = np.einsum("ij,ij->i", self.projected, self.projected)
+
+    def _project(self, vectors):
+        """Coordinates on the principal axes, computed in chunks to bound memory."""
+        return np.concatenate([
+            (vectors[start:start + 4096] - self.mean) @ self.components
+            for start in range(0, len(vectors), 4096)
+        ]).astype(np.float32) if len(vectors) else np.empty((0, self.components.shape[1]), dtype=np.float32)
+
+    def search(self, queries, k=1):
+        k = min(k, len(self.matrix))
+        coarse = _squared_distances(self._project(queries), self.projected, self.projected_norms)
+        all_rows = []
+        all_distances = []
+        for query, query_coarse in zip(queries, coarse):
+            size = min(max(self.shortlist, k), len(self.matrix))
+            while True:
+                if size < len(self.matrix):
+                    partition = np.argpartition(query_coarse, size)
+                    candidates = partition[:size]
+                    # Every row outside the shortlist is at least this far, even in the subspace
+                    bound = query_coarse[partition[size]]
+                else:
+                    candidates = np.arange(len(self.matrix))
+                    bound = np.inf
+                squared = _squared_distances(query[None, :], self.matrix[candidates], self.sq_norms[candidates])
+                rows, distances = _top_k(squared, k)
+                # Small slack for float32 rounding of both distances
+                needed = min(distances[0, -1], distances[0, 0] + self.margin)
+                if needed ** 2 <= bound - 1e-4:
+                    break
+                size = min(size * 4, len(self.matrix))
+            all_rows.append(candidates[rows[0]])
+            all_distances.append(distances[0])
+        return np.array(all_rows).reshape(len(queries), k), \
+            np.array(all_distances, dtype=np.float32).reshape(len(queries), k)
+
+    def state(self):
+        return {"mean": self.mean, "components": self.components, "shortlist": np.array(self.shortlist),
+                "margin": np.array(self.margin)}
+
+    def restore(self, matrix, state):
+        self.shortlist = int(state["shortlist"])
+        self.margin = float(state["margin"])
+        self.dims = state["components"].shape[1]
+        self._set_basis(matrix, state["mean"], state["components"])
+
+
+INDEX_TYPES = {index_type.kind: index_type
+               for index_type in (BruteForceIndex, KDTreeIndex, IVFIndex, PCAIndex)}
+
+
+def _resolve_kind(kind, matrix):
+    """Index kind used for "auto": a full scan for small galleries, else the exact PCA search."""
+    if kind == "auto":
+        return "brute" if len(matrix) <= AUTO_EXACT_LIMIT else "pca"
+    return kind
+
+
+def create_index(kind, matrix):
+    """Build an index of the given kind ("brute", "kdtree", "ivf", "pca" or "auto") over the matrix."""
+    kind = _resolve_kind(kind, matrix)
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown gallery index '{kind}', expected one of {sorted(INDEX_TYPES)} or 'auto'")
+    index = INDEX_TYPES[kind]()
+    index.build(matrix)
+    return index
+
+
+def index_path(encodings_path, kind):
+    """File the index of the given kind is persisted to, next to the encodings."""
+    return f"{os.path.splitext(encodings_path)[0]}.{kind}.npz"
+
+
+def save_index(index, matrix, path):
+    np.savez(path, kind=np.array(index.kind), checksum=np.array(matrix_checksum(matrix)), **index.state())
+
+
+def load_or_build_index(kind, matrix, encodings_path):
+    """Load the persisted index for these encodings, or build and persist a new one.
+
+    A persisted index is only reused when it was built from the same matrix.
+    """
+    kind = _resolve_kind(kind, matrix)
+    path = index_path(encodings_path, kind)
+    checksum = matrix_checksum(matrix)
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                state = {key: data[key] for key in data.files}
+            if str(state.pop("kind")) == kind and str(state.pop("checksum")) == checksum:
+                index = INDEX_TYPES[kind]()
+                index.restore(matrix, state)
+                print(f"[INDEX] Loaded {kind} index from {path}")
+                return index
+        except Exception as e:
+            print(f"[INDEX] Ignoring unreadable index {path}: {str(e)}")
+
+    index = create_index(kind, matrix)
+    if not index.full_scan:
+        try:
+            save_index(index, matrix, path)
+            print(f"[INDEX] Built {kind} index for {len(matrix)} encodings, saved to {path}")
+        except OSError as e:
+            print(f"[INDEX] Could not save index to {path}: {str(e)}")
+    return index
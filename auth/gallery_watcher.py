@@ -0,0 +1,92 @@
+import os
+import threading
+
+from auth.encodings_store import EncodingsStore
+
+
+class GalleryWatcher:
+    """Polls the encodings store and the users table, calling reload() when either changes.
+
+    The store counts as changed when its header's mtime moved and its
+    matrix checksum differs; the users table through its change counter.
+    reload() runs on the watcher thread, so recognition is never paused.
+    """
+
+    def __init__(self, store_path, reload, users_version=None, interval=2.0):
+        self.store = EncodingsStore(store_path)
+        self.reload = reload
+        self.users_version = users_version
+        self.interval = interval
+        self.reloads = 0
+        self.failed_reloads = 0
+        self._stop_event = threading.Event()
+        self.thread = None
+
+        self._users_version = None
+        self._store_mtime, self._store_checksum = self._store_state()
+        self._users_version = self._read_users_version()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.store.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _store_state(self):
+        mtime = self._mtime()
+        if mtime is None:
+            return None, None
+        try:
+            checksum = self.store.read_header().get("sha256")
+        except (OSError, ValueError):
+            checksum = None  # Being replaced, settles on the next poll
+        return mtime, checksum
+
+    def _read_users_version(self):
+        if self.users_version is None:
+            return None
+        try:
+            return self.users_version()
+        except Exception as e:
+            print(f"[WATCHER] Failed to read users version: {e}")
+            return self._users_version
+
+    def check(self):
+        """Reload if anything changed since the last check, returning True when it did."""
+        changed = []
+        if self._mtime() != self._store_mtime:
+            # Cheap mtime check first, the checksum tells real changes from touches
+            self._store_mtime, checksum = self._store_state()
+            if checksum != self._store_checksum:
+                self._store_checksum = checksum
+                changed.append("encodings")
+
+        users_version = self._read_users_version()
+        if users_version != self._users_version:
+            self._users_version = users_version
+            changed.append("users")
+
+        if not changed:
+            return False
+        print(f"[WATCHER] {' and '.join(changed)} changed, reloading face gallery")
+        try:
+            self.reload()
+            self.reloads += 1
+        except Exception as e:
+            self.failed_reloads += 1
+            print(f"[WATCHER] Reload failed, keeping the current gallery: {e}")
+        return True
+
+    def _watch(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._watch)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+from auth.face_gallery import DEFAULT_TOLERANCE, ENCODING_SIZE, UNKNOWN, Match
+
+
+class IdentityCache:
+    """Recently matched encodings, answering repeat visitors without a gallery search.
+
+    A query within max_distance of a cached encoding reuses that entry's
+    match, but only when the triangle inequality guarantees the gallery
+    would give the same answer: the identity stays within the tolerance
+    and its margin over the runner-up cannot be closed. The returned
+    distance and margin are those guaranteed bounds. Entries expire after
+    ttl seconds; the least recently used one is replaced when full.
+    """
+
+    def __init__(self, capacity=64, max_distance=0.2, ttl=120.0, tolerance=DEFAULT_TOLERANCE,
+                 dimension=ENCODING_SIZE):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.encodings = np.zeros((capacity, dimension), dtype=np.float32)
+        self.matches = [None] * capacity
+        self.added = np.zeros(capacity)
+        self.used = np.zeros(capacity)
+        self.valid = np.zeros(capacity, dtype=bool)
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return int(self.valid.sum())
+
+    def lookup(self, encoding, now=None):
+        """Return the Match of a nearby cached encoding, or None on a miss."""
+        now = time.time() if now is None else now
+        self.valid &= now - self.added <= self.ttl
+        if self.valid.any():
+            diff = self.encodings - np.asarray(encoding, dtype=np.float32)
+            distances = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+            distances[~self.valid] = np.inf
+            slot = int(np.argmin(distances))
+            match = self._resolve(self.matches[slot], float(distances[slot]))
+            if match is not None:
+                self.used[slot] = now
+                self.hits += 1
+                return match
+        self.misses += 1
+        return None
+
+    def _resolve(self, cached, distance):
+        """The cached match moved by distance, if it is certain to be unchanged."""
+        if distance > self.max_distance:
+            return None
+        margin = cached.margin - 2 * distance
+        if cached.name == UNKNOWN:
+            if cached.distance - distance > self.tolerance:
+                return Match(UNKNOWN, cached.index, cached.distance - distance, margin)
+        elif cached.distance + distance <= self.tolerance and margin > 0:
+            return Match(cached.name, cached.index, cached.distance + distance, margin)
+        return None
+
+    def add(self, encoding, match, now=None):
+        """Remember the gallery's match for an encoding."""
+        now = time.time() if now is None else now
+        free = np.flatnonzero(~self.valid)
+        slot = int(free[0]) if len(free) else int(np.argmin(self.used))
+        self.encodings[slot] = encoding
+        self.matches[slot] = match
+        self.added[slot] = now
+        self.used[slot] = now
+        self.valid[slot] = True
+
+    def clear(self):
+        """Forget every entry, e.g. when the gallery they were matched against is replaced."""
+        self.valid[:] = False
+        self.matches = [None] * self.capacity
+        self.invalidations += 1
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+
+class MotionDetector:
+    """Cheap motion detector working on tiny grayscale frames.
+
+    Each frame is compared against a running-average background; motion is
+    reported when enough pixels differ from it by more than a threshold.
+    """
+
+    def __init__(self, width=80, height=60, pixel_threshold=25, min_changed_fraction=0.01,
+                 learning_rate=0.05):
+        self.size = (width, height)
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.learning_rate = learning_rate
+        self.background = None
+
+        # Statistics
+        self.frames_seen = 0
+        self.frames_with_motion = 0
+
+    def detect(self, gray):
+        """Update the background with a tiny grayscale frame and report motion."""
+        self.frames_seen += 1
+        current = cv2.GaussianBlur(gray, (5, 5), 0).astype(np.float32)
+
+        if self.background is None or self.background.shape != current.shape:
+            # Nothing to compare against yet, let the first frame through
+            self.background = current
+            self.frames_with_motion += 1
+            return True
+
+        diff = cv2.absdiff(current, self.background)
+        changed = np.count_nonzero(diff > self.pixel_threshold)
+        cv2.accumulateWeighted(current, self.background, self.learning_rate)
+
+        motion = changed >= self.min_changed_fraction * current.size
+        if motion:
+            self.frames_with_motion += 1
+        return motion
+
+    def reset(self):
+        self.background = None
@@ -0,0 +1,253 @@
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from camera.capture_stats import LatencyHistogram
+
+# Faces found in one submitted frame, returned in submission order
+RecognitionResult = namedtuple("RecognitionResult",
+                               ["sequence", "locations", "encodings", "worker", "latency", "error"])
+
+
+def recognize_faces(image, model="large", quality=None):
+    """Detect faces with HOG and compute their encodings, as run inside the workers.
+
+    With a FaceQuality, faces failing it are not encoded and get None instead.
+    """
+    import face_recognition
+
+    locations = face_recognition.face_locations(image)
+    accepted = [box for box in locations if quality is None or quality.check(image, box) is None]
+    encoded = iter(face_recognition.face_encodings(image, accepted, model=model) if accepted else [])
+    encodings = [next(encoded) if box in accepted else None for box in locations]
+    return locations, encodings
+
+
+def _worker_main(worker_id, shm_name, slot_bytes, tasks, results, recognize, model):
+    """Worker process loop: read frames from shared memory slots, send back faces."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, sequence, shape = task
+            image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            start = time.time()
+            try:
+                locations, encodings = recognize(image, model)
+                encodings = [None if encoding is None else np.asarray(encoding, dtype=np.float32)
+                             for encoding in encodings]
+                error = None
+            except Exception as e:
+                locations, encodings, error = [], [], str(e)
+            del image
+            results.put((sequence, slot, worker_id, locations, encodings, time.time() - start, error))
+    finally:
+        shm.close()
+
+
+class RecognitionEngine:
+    """Spreads face detection and encoding over a pool of worker processes.
+
+    Frames are copied into shared memory slots and only the slot number is
+    sent to a worker. get_result() hands results back in submission order.
+    The pool size defaults to RECOGNITION_WORKERS or the number of cores.
+    With a FaceQuality, workers skip encoding faces that fail it. A worker
+    that dies, or holds a frame for longer than task_timeout seconds, is
+    restarted and its frames come back as results with an error.
+    """
+
+    def __init__(self, workers=None, max_shape=(240, 320, 3), model="large", recognize=recognize_faces,
+                 quality=None, task_timeout=30.0):
+        self.workers = workers or int(os.getenv("RECOGNITION_WORKERS", 0)) or os.cpu_count() or 1
+        # Two slots per worker: one being processed, one queued
+        self.slot_count = self.workers * 2
+        self.slot_bytes = int(np.prod(max_shape))
+        self.task_timeout = task_timeout
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_count * self.slot_bytes)
+
+        self._free_slots = queue.Queue()
+        for slot in range(self.slot_count):
+            self._free_slots.put(slot)
+
+        if quality is not None:
+            recognize = functools.partial(recognize, quality=quality)
+
+        self.lock = threading.Lock()
+        self._result_ready = threading.Condition(self.lock)
+        self._pending = deque()  # Submitted sequence numbers, oldest first
+        self._done = {}
+        self.running = True
+        self.started = time.time()
+        self.submitted = 0
+        self.dropped = 0
+        self.worker_stats = [{"frames": 0, "busy_s": 0.0, "errors": 0, "restarts": 0, "latency": LatencyHistogram()}
+                             for _ in range(self.workers)]
+
+        # Spawned workers do not inherit the capture and GUI threads of this process.
+        # Each worker has its own task queue, so the frames a dead worker held are known
+        self._context = multiprocessing.get_context("spawn")
+        self._recognize = recognize
+        self._model = model
+        self._results = self._context.Queue()
+        self._tasks = [None] * self.workers
+        self._processes = [None] * self.workers
+        self._assigned = [{} for _ in range(self.workers)]  # sequence -> (slot, submit time)
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+        self._collector = threading.Thread(target=self._collect_results)
+        self._collector.daemon = True
+        self._collector.start()
+        print(f"[ENGINE] Recognition engine started with {self.workers} workers")
+
+    def _start_worker(self, worker_id):
+        self._tasks[worker_id] = self._context.Queue()
+        self._processes[worker_id] = self._context.Process(
+            target=_worker_main, daemon=True,
+            args=(worker_id, self.shm.name, self.slot_bytes, self._tasks[worker_id], self._results,
+                  self._recognize, self._model))
+        self._processes[worker_id].start()
+
+    def submit(self, sequence, image):
+        """Queue a frame for recognition, returning False when all slots are busy.
+
+        Sequence numbers must increase with every submission.
+        """
+        if image.nbytes > self.slot_bytes:
+            print(f"[ENGINE] Frame {image.shape} does not fit in a slot of {self.slot_bytes} bytes")
+            return False
+        try:
+            slot = self._free_slots.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+        target = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        np.copyto(target, image)
+        del target
+        with self.lock:
+            # The worker with the fewest frames in hand
+            worker_id = min(range(self.workers), key=lambda worker: len(self._assigned[worker]))
+            self._assigned[worker_id][sequence] = (slot, time.time())
+            self._pending.append(sequence)
+            self.submitted += 1
+            self._tasks[worker_id].put((slot, sequence, image.shape))
+        return True
+
+    def in_flight(self):
+        """Number of submitted frames whose result has not been returned yet."""
+        with self.lock:
+            return len(self._pending)
+
+    def _collect_results(self):
+        while self.running:
+            self._check_workers()
+            try:
+                sequence, slot, worker_id, locations, encodings, latency, error = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self._result_ready:
+                if self._assigned[worker_id].pop(sequence, None) is None:
+                    continue  # Already failed when the worker was restarted
+                self._free_slots.put(slot)
+                stats = self.worker_stats[worker_id]
+                stats["frames"] += 1
+                stats["busy_s"] += latency
+                stats["latency"].record(latency)
+                if error:
+                    stats["errors"] += 1
+                    print(f"[ENGINE] Worker {worker_id} failed on frame {sequence}: {error}")
+                self._done[sequence] = RecognitionResult(sequence, locations, encodings, worker_id, latency, error)
+                self._result_ready.notify_all()
+
+    def _check_workers(self):
+        """Restart workers that died or hang, failing the frames they held and freeing their slots."""
+        now = time.time()
+        for worker_id in range(self.workers):
+            process = self._processes[worker_id]
+            with self.lock:
+                oldest = min((submitted for _, submitted in self._assigned[worker_id].values()), default=now)
+            alive = process.is_alive()
+            if alive and now - oldest <= self.task_timeout:
+                continue
+            if alive:
+                reason = f"worker {worker_id} took longer than {self.task_timeout:.0f}s"
+                process.terminate()
+                process.join(timeout=1.0)
+            else:
+                reason = f"worker {worker_id} died with exit code {process.exitcode}"
+            print(f"[ENGINE] Restarting {reason}")
+            with self._result_ready:
+                stats = self.worker_stats[worker_id]
+                for sequence, (slot, submitted) in self._assigned[worker_id].items():
+                    self._free_slots.put(slot)
+                    stats["errors"] += 1
+                    self._done[sequence] = RecognitionResult(sequence, [], [], worker_id, now - submitted, reason)
+                self._assigned[worker_id] = {}
+                stats["restarts"] += 1
+                # Tasks still queued for the old process were failed above
+                self._tasks[worker_id].cancel_join_thread()
+                self._start_worker(worker_id)
+                self._result_ready.notify_all()
+
+    def get_result(self, timeout=None):
+        """Get the result of the oldest submitted frame, or None if it is not ready in time."""
+        with self._result_ready:
+            ready = self._result_ready.wait_for(
+                lambda: not self._pending or self._pending[0] in self._done or not self.running, timeout)
+            if not ready or not self._pending or self._pending[0] not in self._done:
+                return None
+            return self._done.pop(self._pending.popleft())
+
+    def get_stats(self):
+        """Per-worker frame counts, latency, throughput and utilization."""
+        with self.lock:
+            uptime = time.time() - self.started
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "dropped_busy": self.dropped,
+                "in_flight": len(self._pending),
+                "per_worker": [
+                    {
+                        "frames": stats["frames"],
+                        "errors": stats["errors"],
+                        "restarts": stats["restarts"],
+                        "throughput_fps": stats["frames"] / uptime if uptime > 0 else 0.0,
+                        "utilization": stats["busy_s"] / uptime if uptime > 0 else 0.0,
+                        "latency": stats["latency"].snapshot(),
+                    }
+                    for stats in self.worker_stats
+                ],
+            }
+
+    def stop(self):
+        """Stop the workers and free the shared memory."""
+        if not self.running:
+            return
+        # Stop the collector first, it would restart the exiting workers
+        with self._result_ready:
+            self.running = False
+            self._result_ready.notify_all()
+        self._collector.join(timeout=2.0)
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.shm.close()
+        self.shm.unlink()
+        print("[ENGINE] Recognition engine stopped")
@@ -0,0 +1,88 @@
+"""Compare the cascaded face detector with single-stage HOG on recorded footage.
+
+Recall is measured against single-stage HOG, today's detection path.
+
+Examples:
+    python -m benchmarks.bench_face_detector --source recordings/door.mp4
+    python -m benchmarks.bench_face_detector --source face_rec_dataset/Alice --frames 100
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from auth.face_detector import FaceDetector, AUTO, CASCADE, HOG, find_cascade_file
+from auth.face_tracker import iou
+from camera.frame_cache import small_rgb
+from camera.frame_source import create_source
+
+
+def read_frames(source, frames, scaler):
+    """Downscaled RGB frames, as the authenticator sees them."""
+    if not source.open():
+        print(f"[BENCH] Could not open {source.describe()}")
+        return []
+    images = []
+    try:
+        for _ in range(frames):
+            ret, frame = source.read()
+            if not ret:
+                break
+            images.append(small_rgb(frame, scaler))
+    finally:
+        source.release()
+    return images
+
+
+def bench_detector(mode, images, truth):
+    detector = FaceDetector(mode=mode)
+    latencies = []
+    found = 0
+    for image, expected in zip(images, truth):
+        begin = time.time()
+        boxes = detector.detect(image)
+        latencies.append(time.time() - begin)
+        found += sum(1 for box in expected if any(iou(box, other) >= 0.3 for other in boxes))
+    faces = sum(len(expected) for expected in truth)
+    recall = found / float(faces) if faces else float("nan")
+    latencies_ms = np.array(latencies) * 1000
+    print(f"[BENCH]   {mode:<8} recall {recall:.3f}  latency ms: mean {latencies_ms.mean():.1f}  "
+          f"p50 {np.percentile(latencies_ms, 50):.1f}  p95 {np.percentile(latencies_ms, 95):.1f}")
+    return detector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cascaded face detector against HOG")
+    parser.add_argument("--source", default="synthetic", help="Video file, image directory or 'synthetic'")
+    parser.add_argument("--frames", type=int, default=300, help="Frames to process")
+    parser.add_argument("--scaler", type=int, default=4, help="Downscale factor, as in FaceAuthenticator")
+    args = parser.parse_args()
+
+    source = create_source(args.source, realtime=False)
+    print(f"[BENCH] Reading {source.describe()}")
+    images = read_frames(source, args.frames, args.scaler)
+    if not images:
+        return
+
+    # Ground truth from the single-stage path
+    hog = FaceDetector(mode=HOG)
+    truth = [hog.detect(image) for image in images]
+    print(f"[BENCH] {len(images)} frames, {sum(len(boxes) for boxes in truth)} faces found by HOG")
+
+    modes = [HOG]
+    if find_cascade_file() is not None:
+        modes += [CASCADE, AUTO]
+    else:
+        print("[BENCH] No Haar face cascade found, only HOG is measured")
+    for mode in modes:
+        detector = bench_detector(mode, images, truth)
+    if mode == AUTO:
+        stats = detector.get_stats()
+        print(f"[BENCH]   auto settled on {stats['active']} after {stats['calibrations']} calibrations")
+
+
+if __name__ == "__main__":
+    main()
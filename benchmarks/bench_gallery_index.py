@@ -0,0 +1,78 @@
+"""Compare gallery index recall and search latency on synthetic encodings.
+
+Examples:
+    python -m benchmarks.bench_gallery_index
+    python -m benchmarks.bench_gallery_index --sizes 1000 10000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from auth.gallery_index import BruteForceIndex, INDEX_TYPES
+
+
+def synthetic_gallery(size, per_identity=5, seed=0):
+    """Clustered 128-d encodings resembling face_recognition output."""
+    rng = np.random.default_rng(seed)
+    identities = max(size // per_identity, 1)
+    centers = rng.normal(0, 0.09, (identities, 128)).astype(np.float32)
+    labels = np.arange(size) % identities
+    return centers[labels] + rng.normal(0, 0.02, (size, 128)).astype(np.float32)
+
+
+def bench_index(kind, matrix, queries, truth):
+    start = time.time()
+    index = INDEX_TYPES[kind]()
+    index.build(matrix)
+    build_time = time.time() - start
+
+    # Queries arrive one frame at a time, so time them individually
+    latencies = []
+    found = []
+    for query in queries:
+        begin = time.time()
+        rows, _ = index.search(query[None, :], 1)
+        latencies.append(time.time() - begin)
+        found.append(rows[0][0])
+    recall = np.mean(np.array(found) == truth)
+    latencies_ms = np.array(latencies) * 1000
+    print(f"[BENCH]   {kind:<7} build {build_time:7.2f}s  recall@1 {recall:.3f}  "
+          f"latency ms: mean {latencies_ms.mean():.3f}  p95 {np.percentile(latencies_ms, 95):.3f}")
+    if index.exact and recall < 1.0:
+        print(f"[BENCH]   {kind} is an exact index but missed {int(round((1 - recall) * len(truth)))} queries")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face gallery indexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per gallery size")
+    parser.add_argument("--indexes", nargs="+", default=sorted(INDEX_TYPES), choices=sorted(INDEX_TYPES))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    exact = True
+    for size in args.sizes:
+        matrix = synthetic_gallery(size)
+        # Probe with noisy copies of enrolled encodings, ground truth from an exact scan
+        picks = rng.choice(size, args.queries, replace=size < args.queries)
+        queries = matrix[picks] + rng.normal(0, 0.01, (args.queries, 128)).astype(np.float32)
+        reference = BruteForceIndex()
+        reference.build(matrix)
+        truth = reference.search(queries, 1)[0][:, 0]
+
+        print(f"[BENCH] {size} encodings, {args.queries} queries")
+        for kind in args.indexes:
+            exact = bench_index(kind, matrix, queries, truth) and exact
+    # Exact indexes (brute, kdtree, pca) must agree with the full scan
+    if not exact:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Open N concurrent MJPEG viewers and report per-client FPS and server CPU.
+
+Against a running server (CPU is measured when its process id is given):
+    python -m benchmarks.stream_load_test --url http://127.0.0.1:5000/video_feed --clients 20 --pid 1234
+
+Or start a server on a synthetic camera for each mode and compare them:
+    python -m benchmarks.stream_load_test --serve threaded async --clients 50 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PROJECT_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BOUNDARY = b'--frame'
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time of a process, from /proc (Linux only)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def viewer(url, duration, read_size):
+    """Read the stream for duration seconds, returning the number of frames received."""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+
+    frames = 0
+    tail = b''
+    deadline = time.time() + duration
+    try:
+        while time.time() < deadline:
+            try:
+                chunk = await asyncio.wait_for(reader.read(read_size), deadline - time.time())
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            # Keep the end of the previous chunk, a boundary can be split between reads
+            data = tail + chunk
+            frames += data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+    finally:
+        writer.close()
+    return frames
+
+
+async def run_viewers(url, clients, duration, read_size):
+    return await asyncio.gather(*[viewer(url, duration, read_size) for _ in range(clients)],
+                                return_exceptions=True)
+
+
+def load_test(url, clients, duration, pid=None, read_size=65536):
+    cpu_start = cpu_seconds(pid) if pid else None
+    start = time.time()
+    results = asyncio.run(run_viewers(url, clients, duration, read_size))
+    elapsed = time.time() - start
+
+    failed = [result for result in results if isinstance(result, Exception)]
+    fps = np.array([result / duration for result in results if not isinstance(result, Exception)])
+    print(f"[LOAD] {clients} clients for {duration:.0f}s against {url}")
+    if len(fps):
+        print(f"[LOAD]   per-client fps: mean {fps.mean():.1f}  min {fps.min():.1f}  "
+              f"p10 {np.percentile(fps, 10):.1f}  max {fps.max():.1f}")
+    if failed:
+        print(f"[LOAD]   {len(failed)} clients failed: {failed[0]!r}")
+    if cpu_start is not None:
+        cpu = (cpu_seconds(pid) - cpu_start) / elapsed * 100
+        print(f"[LOAD]   server CPU: {cpu:.0f}% of one core")
+
+
+def wait_for_port(host, port, timeout=20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def serve_and_test(mode, args):
+    """Start the stream server on a synthetic camera in a subprocess, then load it."""
+    env = dict(os.environ, STREAM_MODE=mode, STREAM_HOST="127.0.0.1", STREAM_PORT=str(args.port),
+               CAMERA_0_SOURCE=os.getenv("CAMERA_0_SOURCE", "synthetic"))
+    server = subprocess.Popen([sys.executable, "-c", "from camera.video_stream import start_stream; start_stream()"],
+                              cwd=PROJECT_FOLDER, env=env)
+    try:
+        if not wait_for_port("127.0.0.1", args.port):
+            print(f"[LOAD] {mode} server did not start")
+            return
+        time.sleep(1.0)  # Let the camera deliver its first frames
+        print(f"[LOAD] Server mode: {mode}")
+        load_test(f"http://127.0.0.1:{args.port}{args.path}", args.clients, args.duration, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MJPEG stream server")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/video_feed", help="Stream to load")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent viewers")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds each viewer reads")
+    parser.add_argument("--pid", type=int, help="Server process id, to report its CPU usage")
+    parser.add_argument("--serve", nargs="+", choices=["threaded", "async"],
+                        help="Start a server in each mode on a synthetic camera instead of using --url")
+    parser.add_argument("--port", type=int, default=5055, help="Port of the servers started with --serve")
+    parser.add_argument("--path", default="/video_feed", help="Path and query for --serve, e.g. '/video_feed?w=320'")
+    args = parser.parse_args()
+
+    if args.serve:
+        for mode in args.serve:
+            serve_and_test(mode, args)
+    else:
+        load_test(args.url, args.clients, args.duration, args.pid)
+
+
+if __name__ == "__main__":
+    main()
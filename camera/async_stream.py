@@ -0,0 +1,190 @@
+"""asyncio MJPEG server for many concurrent viewers (STREAM_MODE=async).
+
+Serves the same /video_feed, /snapshot and /stats as the Flask server in
+camera.video_stream, but every viewer is a coroutine instead of a thread.
+Requires aiohttp; without it start_stream falls back to the Flask server.
+"""
+import asyncio
+import time
+
+try:
+    from aiohttp import web
+except ImportError:  # aiohttp is optional, STREAM_MODE=async falls back to the Flask server
+    web = None
+
+from camera import video_stream
+
+
+class AsyncFrameFeed:
+    """Hands the frames of a JpegEncoder to asyncio clients.
+
+    The encoder thread only schedules a callback on the event loop; clients
+    await the next frame there, so no thread is blocked per viewer.
+    """
+
+    def __init__(self, encoder, loop):
+        self.encoder = encoder
+        self.loop = loop
+        self.latest = encoder.latest
+        self._new_frame = asyncio.Event()
+        encoder.add_listener(self._on_frame)
+
+    def _on_frame(self, encoded):
+        # Called on the encoder thread
+        self.loop.call_soon_threadsafe(self._publish, encoded)
+
+    def _publish(self, encoded):
+        self.latest = encoded
+        # Wake every waiting client, later waiters get a fresh event
+        new_frame, self._new_frame = self._new_frame, asyncio.Event()
+        new_frame.set()
+
+    async def wait_for_frame(self, after_sequence=0, timeout=None):
+        """Wait for a frame newer than the given sequence number, None on timeout."""
+        while self.latest is None or self.latest.sequence <= after_sequence:
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.latest
+
+    def close(self):
+        self.encoder.remove_listener(self._on_frame)
+
+
+def get_feed(app, profile, camera_index=None):
+    """Get the shared feed of a camera and profile's encoder, creating it on first use.
+
+    None if the camera is unavailable.
+    """
+    encoder = video_stream.get_encoder(profile, camera_index)
+    if encoder is None:
+        return None
+    feeds = app["feeds"]
+    if encoder not in feeds:
+        # Drop the feeds of encoders stopped with their idle camera
+        current = set(video_stream.jpeg_encoders.values())
+        for stale in [other for other in feeds if other not in current]:
+            feeds.pop(stale).close()
+        feeds[encoder] = AsyncFrameFeed(encoder, asyncio.get_running_loop())
+    return feeds[encoder]
+
+
+def _camera_index(request):
+    camera_index = request.match_info.get("camera_index")
+    return int(camera_index) if camera_index is not None else None
+
+
+def _unavailable(camera_index):
+    if not video_stream.is_stream_camera(camera_index):
+        return web.json_response({"error": f"camera {camera_index} is not streamed"}, status=404)
+    return web.json_response({"error": f"camera {camera_index} not available"}, status=503)
+
+
+async def video_feed(request):
+    """Stream MJPEG to one viewer, e.g. /video_feed?w=320&q=60&fps=5 or /video_feed/1"""
+    camera_index = _camera_index(request)
+    camera = None
+    if camera_index is not None:
+        if not video_stream.is_stream_camera(camera_index):
+            return _unavailable(camera_index)
+        # Opening a camera blocks until its first frame, keep it off the event loop
+        camera = await asyncio.get_running_loop().run_in_executor(
+            None, video_stream.get_stream_camera, camera_index)
+        if camera is None:
+            return _unavailable(camera_index)
+    profile = video_stream.parse_profile(request.query, camera)
+    feed = get_feed(request.app, profile, camera_index)
+    if feed is None:
+        return _unavailable(camera_index)
+    interval = video_stream.frame_interval(profile)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "multipart/x-mixed-replace; boundary=frame",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+    feed.encoder.add_client()
+    try:
+        last_sequence = 0
+        next_time = 0
+        while video_stream.stream_active:
+            delay = next_time - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            encoded = await feed.wait_for_frame(last_sequence, timeout=0.5)
+            if encoded is None:
+                continue
+            last_sequence = encoded.sequence
+            next_time = time.time() + interval
+            # write() waits while a slow client's socket buffer is full; it then
+            # gets the newest frame, the ones encoded meanwhile are never queued
+            await response.write(video_stream.mjpeg_part(encoded.jpeg))
+    except ConnectionResetError:
+        pass  # Viewer went away
+    finally:
+        feed.encoder.remove_client()
+    return response
+
+
+async def snapshot(request):
+    """The camera's latest JPEG, answering If-None-Match with 304 Not Modified"""
+    camera_index = _camera_index(request)
+    if not video_stream.is_stream_camera(camera_index):
+        return _unavailable(camera_index)
+    encoded = await asyncio.get_running_loop().run_in_executor(
+        None, video_stream.get_snapshot, camera_index, request.query)
+    if encoded is None:
+        return _unavailable(camera_index)
+    etag = f'"{video_stream.snapshot_etag(camera_index, encoded)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("If-None-Match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=encoded.jpeg, content_type="image/jpeg", headers=headers)
+
+
+async def stats(request):
+    """Camera capture and stream encoder statistics"""
+    stats = video_stream.get_stream_stats()
+    if stats is None:
+        return web.json_response({"error": "camera not initialized"}, status=503)
+    return web.json_response(stats)
+
+
+async def _close_feeds(app):
+    for feed in app["feeds"].values():
+        feed.close()
+
+
+def create_app():
+    app = web.Application()
+    app["feeds"] = {}
+    app.router.add_get("/video_feed", video_feed)
+    app.router.add_get(r"/video_feed/{camera_index:\d+}", video_feed)
+    app.router.add_get(r"/snapshot/{camera_index:\d+}.jpg", snapshot)
+    app.router.add_get("/stats", stats)
+    app.on_cleanup.append(_close_feeds)
+    return app
+
+
+async def _serve(host, port):
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    try:
+        while video_stream.stream_active:
+            await asyncio.sleep(0.5)
+    finally:
+        await runner.cleanup()
+
+
+def run_async_stream(host, port):
+    """Serve the stream on an asyncio loop until stop_stream(), returning False without aiohttp."""
+    if web is None:
+        print("[STREAM] aiohttp is not installed, using the threaded server (pip install aiohttp)")
+        return False
+    print(f"[STREAM] Starting async video stream server at http://{host}:{port}")
+    asyncio.run(_serve(host, port))
+    return True
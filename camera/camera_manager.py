@@ -1,128 +1,363 @@
-import cv2
+import os
+import numpy as np
 import threading
 import time
+from collections import namedtuple
+from camera.frame_source import DeviceSource, create_source
+from camera.frame_cache import DerivedFrameCache
+from camera.capture_stats import CaptureStats
+
+# A published frame: monotonically increasing sequence number, capture
+# timestamp, a read-only view into one of the ring buffer slots and whether
+# it is the last good frame of a camera that has since disconnected.
+Frame = namedtuple("Frame", ["sequence", "timestamp", "image", "stale"], defaults=(False,))
 
 class CameraManager:
     _instances = {}
     _locks = {}
 
+    # Number of preallocated frame slots in the ring buffer
+    RING_SIZE = 4
+
+    # Consecutive failed reads before the camera is considered disconnected
+    MAX_FAILED_READS = 30
+    # Reconnect backoff, doubled after every failed attempt up to the maximum
+    RECONNECT_DELAY = 0.5
+    MAX_RECONNECT_DELAY = 30.0
+
     @classmethod
-    def get_instance(cls, camera_index=0):
-        """ Get a singleton instance of the camera manager for the specified camera index."""
+    def get_instance(cls, camera_index=0, source=None):
+        """ Get a singleton instance of the camera manager for the specified camera index.
+
+        The frame source is only used when the instance is first created.
+        A released instance is replaced by a fresh one.
+        """
         if camera_index not in cls._locks:
             cls._locks[camera_index] = threading.Lock()
-            
+
         with cls._locks[camera_index]:
-            if camera_index not in cls._instances or cls._instances[camera_index] is None:
-                cls._instances[camera_index] = cls(camera_index)
+            instance = cls._instances.get(camera_index)
+            if instance is None or instance.is_released:
+                cls._instances[camera_index] = cls(camera_index, source=source)
             return cls._instances[camera_index]
 
-    def __init__(self, camera_index=0):
-        """Initialize the camera manager with the specified camera index."""
+    def __init__(self, camera_index=0, source=None):
+        """Initialize the camera manager with the specified camera index.
+
+        Frames come from the camera device with that index unless another
+        frame source is given, or configured with CAMERA_<index>_SOURCE
+        (a video file, an image directory or "synthetic").
+        """
         # Camera properties
         self.camera_index = camera_index
         self.width = 640
         self.height = 480
         self.fps = 30
-        
+
+        if source is None:
+            spec = os.getenv(f"CAMERA_{camera_index}_SOURCE")
+            if spec:
+                source = create_source(spec, self.width, self.height, self.fps)
+            else:
+                source = DeviceSource(camera_index, self.width, self.height, self.fps)
+        self.source = source
+
         # Initialize camera
         self.camera = None
         self.frame = None
         self.last_frame_time = 0
         self.is_running = False
+        self.is_released = False
+        self.is_connected = False
         self.thread = None
-        self.lock = threading.Lock()
-        
+        # Set on release, interrupts the reconnect backoff
+        self._stop_event = threading.Event()
+        self._reconnect_delay = self.RECONNECT_DELAY
+        # Called with (camera_index, connected) when the camera drops or comes back
+        self._status_listeners = []
+        self.lock = threading.RLock()
+        # Signalled by the capture thread whenever a new frame is published
+        self._frame_ready = threading.Condition(self.lock)
+
+        # Ring buffer of preallocated frame slots. The capture thread decodes
+        # straight into the slot after the latest one, so a published view
+        # stays intact for RING_SIZE - 1 further captures.
+        self._ring = [np.empty((self.height, self.width, 3), dtype=np.uint8)
+                      for _ in range(self.RING_SIZE)]
+        self._slot_sequence = [0] * self.RING_SIZE
+        self._latest_slot = -1
+        self.sequence = 0
+
+        # Downscaled, converted and encoded versions of recent frames, shared by all consumers
+        self.derived = DerivedFrameCache(self.RING_SIZE)
+
+        # Read latency, capture FPS, failed reads and per-consumer frame age
+        self.stats = CaptureStats(camera_index)
+
         # Reference counter for tracking how many components are using this camera
         self.ref_count = 0
-        
+
         # Initialize camera
         self.initialize()
-        
+
     def initialize(self):
-        """Initialize the camera and start the capture thread."""
-        try:
-            self.camera = cv2.VideoCapture(self.camera_index)
-            
-            # Set camera properties
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
-            self.camera.set(cv2.CAP_PROP_FPS, self.fps)
-            
-            # Check if camera opened successfully
-            if not self.camera.isOpened():
-                print(f"[CAMERA] Failed to open camera with index {self.camera_index}")
-                return False
-            
-            # Start camera thread
-            self.is_running = True
-            self.thread = threading.Thread(target=self._update_frame)
-            self.thread.daemon = True
-            self.thread.start()
-            
+        """Initialize the camera and start the capture thread.
+
+        The capture thread is started even if the camera cannot be opened
+        yet, it keeps retrying in the background.
+        """
+        opened = self._open_source()
+        if opened:
             print(f"[CAMERA] Camera {self.camera_index} initialized successfully")
-            return True
+        else:
+            print(f"[CAMERA] Failed to open camera {self.camera_index} ({self.source.describe()}), "
+                  f"retrying in the background")
+
+        # Start camera thread
+        self.is_running = True
+        self.thread = threading.Thread(target=self._update_frame)
+        self.thread.daemon = True
+        self.thread.start()
+        return opened
+
+    def _open_source(self):
+        """Try to open the frame source, returning True on success."""
+        try:
+            opened = self.source.open()
         except Exception as e:
-            print(f"[CAMERA] Error initializing camera {self.camera_index}: {str(e)}")
+            print(f"[CAMERA] Error opening camera {self.camera_index}: {str(e)}")
+            opened = False
+        if not opened:
+            self.source.release()
             return False
-    
+        self.camera = self.source
+        self._set_connected(True)
+        return True
+
+    def _reconnect(self):
+        """Wait out the backoff delay, then try to reopen the camera."""
+        if self._stop_event.wait(self._reconnect_delay):
+            return False  # Released while waiting
+        if self._open_source():
+            self.stats.record_reconnect(True)
+            self._reconnect_delay = self.RECONNECT_DELAY
+            print(f"[CAMERA] Camera {self.camera_index} reconnected")
+            return True
+        self.stats.record_reconnect(False)
+        self._reconnect_delay = min(self._reconnect_delay * 2, self.MAX_RECONNECT_DELAY)
+        return False
+
+    def _disconnect(self):
+        """Close a camera that stopped delivering frames so it can be reopened."""
+        print(f"[CAMERA] Camera {self.camera_index} disconnected, reconnecting")
+        self.stats.record_disconnect()
+        camera, self.camera = self.camera, None
+        if camera:
+            camera.release()
+        self._set_connected(False)
+
+    def _set_connected(self, connected):
+        """Update the connection state and notify listeners on changes."""
+        if connected == self.is_connected:
+            return
+        self.is_connected = connected
+        for callback in list(self._status_listeners):
+            try:
+                callback(self.camera_index, connected)
+            except Exception as e:
+                print(f"[CAMERA] Status listener error: {str(e)}")
+
     def _update_frame(self):
         """Continuously update the frame in a background thread."""
+        failed_reads = 0
         while self.is_running:
-            if self.camera and self.camera.isOpened():
-                ret, frame = self.camera.read()
-                if ret:
-                    with self.lock:
-                        self.frame = frame
-                        self.last_frame_time = time.time()
+            camera = self.camera
+            if camera is None or not camera.is_opened():
+                if camera is not None:
+                    self._disconnect()
+                self._reconnect()
+                failed_reads = 0
+                continue
+
+            slot = (self._latest_slot + 1) % self.RING_SIZE
+            # Invalidate the slot before overwriting it
+            self._slot_sequence[slot] = 0
+            read_start = time.time()
+            try:
+                ret, frame = camera.read(self._ring[slot])
+            except Exception as e:
+                print(f"[CAMERA] Error reading camera {self.camera_index}: {str(e)}")
+                ret, frame = False, None
+            read_end = time.time()
+            self.stats.record_read(read_end - read_start, ret, read_end)
+            if ret:
+                failed_reads = 0
+                self._publish(slot, frame, read_end)
+            else:
+                failed_reads += 1
+                if failed_reads >= self.MAX_FAILED_READS:
+                    # Unplugged devices often stay "opened" but never return frames
+                    self._disconnect()
                 else:
                     time.sleep(0.01)  # Small delay if frame capture failed
-            else:
-                time.sleep(0.1)  # Larger delay if camera not available
-    
-    def get_frame(self):
-        """Get the current frame from the camera."""
+
+    def _publish(self, slot, frame, timestamp):
+        """Make the frame decoded into the given slot the latest frame."""
+        if frame is not self._ring[slot]:
+            # The backend could not decode in place (e.g. the resolution
+            # differs from the preallocated slot), adopt its buffer instead
+            self._ring[slot] = frame
+        view = frame.view()
+        view.flags.writeable = False
         with self.lock:
-            if self.frame is not None:
-                return self.frame.copy()
-            return None
-    
+            self.sequence += 1
+            self._slot_sequence[slot] = self.sequence
+            self._latest_slot = slot
+            self.frame = view
+            self.last_frame_time = timestamp
+            self._frame_ready.notify_all()
+
+    def _latest_frame(self):
+        """Build the Frame for the latest published image, with the lock held."""
+        return Frame(self.sequence, self.last_frame_time, self.frame, not self.is_connected)
+
+    def _consume(self, frame, consumer):
+        """Record the age of a frame handed to a named consumer."""
+        if frame is not None and consumer is not None:
+            self.stats.record_consumption(consumer, frame.timestamp)
+        return frame
+
+    def get_frame(self, consumer=None):
+        """Get a read-only view of the current frame from the camera.
+
+        The view is not copied; callers that modify the image or keep it for
+        longer than a few capture intervals must copy it themselves.
+        """
+        with self.lock:
+            frame, timestamp = self.frame, self.last_frame_time
+        if frame is not None and consumer is not None:
+            self.stats.record_consumption(consumer, timestamp)
+        return frame
+
+    def get_latest(self, consumer=None):
+        """Get the latest frame with its sequence number and timestamp.
+
+        While the camera is disconnected this keeps returning the last good
+        frame, marked as stale. The image is a view into the ring buffer,
+        valid for RING_SIZE - 1 further captures: copy it to keep it, or
+        check is_frame_valid() after using it.
+        """
+        with self.lock:
+            if self.frame is None:
+                return None
+            latest = self._latest_frame()
+        return self._consume(latest, consumer)
+
+    def get_frame_after(self, sequence, consumer=None):
+        """Get the latest frame only if it is newer than the given sequence number."""
+        with self.lock:
+            if self.frame is None or self.sequence <= sequence:
+                return None
+            latest = self._latest_frame()
+        return self._consume(latest, consumer)
+
+    def wait_for_frame(self, after_sequence=0, timeout=None, consumer=None):
+        """Block until a frame newer than the given sequence number is published.
+
+        Returns None if the timeout expires or the camera is released first.
+        """
+        with self._frame_ready:
+            self._frame_ready.wait_for(
+                lambda: self.sequence > after_sequence or self.is_released, timeout)
+            if self.frame is None or self.sequence <= after_sequence:
+                return None
+            latest = self._latest_frame()
+        return self._consume(latest, consumer)
+
+    def frames(self, after_sequence=0, timeout=1.0, consumer=None):
+        """Iterate over newly published frames until the camera is released.
+
+        Frames published while the consumer was busy are skipped, each
+        iteration yields the newest one.
+        """
+        sequence = after_sequence
+        while not self.is_released:
+            frame = self.wait_for_frame(sequence, timeout, consumer)
+            if frame is not None:
+                sequence = frame.sequence
+                yield frame
+
+    def get_derived(self, frame, transform, *args):
+        """Get transform(frame.image, *args), computed at most once per captured frame.
+
+        Transforms are functions such as those in camera.frame_cache, e.g.
+        get_derived(frame, small_rgb, 4). The result is shared and read-only.
+        """
+        return self.derived.get(frame, transform, *args)
+
+    def add_status_listener(self, callback):
+        """Call callback(camera_index, connected) whenever the camera drops or reconnects."""
+        self._status_listeners.append(callback)
+
+    def remove_status_listener(self, callback):
+        if callback in self._status_listeners:
+            self._status_listeners.remove(callback)
+
+    def is_frame_valid(self, frame):
+        """Check that a frame's slot has not been recycled by the capture thread."""
+        return frame.sequence in self._slot_sequence
+
+    def get_stats(self):
+        """Get a snapshot of capture and per-consumer statistics."""
+        snapshot = self.stats.snapshot()
+        with self.lock:
+            snapshot["sequence"] = self.sequence
+            snapshot["frame_age_s"] = time.time() - self.last_frame_time if self.frame is not None else None
+        snapshot["source"] = self.source.describe()
+        snapshot["running"] = self.is_running
+        snapshot["connected"] = self.is_connected
+        return snapshot
+
     def acquire(self):
         """Register a component using this camera."""
         with self.lock:
             self.ref_count += 1
             return self.ref_count
-    
+
     def release(self):
         """Unregister a component using this camera."""
         with self.lock:
             if self.ref_count > 0:
                 self.ref_count -= 1
-            
+
             # If no more references, release resources
             if self.ref_count == 0:
                 self._release_resources()
-            
+
             return self.ref_count
-    
+
     def _release_resources(self):
         """Release camera resources."""
         self.is_running = False
+        self.is_released = True
+        self._stop_event.set()
+        with self._frame_ready:
+            self._frame_ready.notify_all()  # Wake up consumers blocked on a new frame
         if self.thread:
             self.thread.join(timeout=1.0)
-        
+
         if self.camera:
             self.camera.release()
             self.camera = None
-            
+
         print(f"[CAMERA] Camera {self.camera_index} resources released")
-    
+
     def is_frame_available(self):
         """Check if the latest frame is available."""
         with self.lock:
             frame_age = time.time() - self.last_frame_time
-            return self.frame is not None and frame_age < 1.0  # Frame less than 1 second old
-    
+            return self.is_connected and self.frame is not None and frame_age < 1.0  # Frame less than 1 second old
+
     def __del__(self):
         """Destructor to ensure resources are properly released."""
-        self._release_resources()
\ No newline at end of file
+        self._release_resources()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations, reported in milliseconds."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        index = 0
+        while index < len(self.BUCKETS_MS) and ms > self.BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket containing the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return float(self.BUCKETS_MS[index]) if index < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        labels = [f"<={bound}" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class CaptureStats:
+    """Capture and consumption counters for one camera."""
+
+    def __init__(self, camera_index, fps_window=2.0):
+        self.camera_index = camera_index
+        self.fps_window = fps_window
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+        self.frames_captured = 0
+        self.failed_reads = 0
+        self.read_latency = LatencyHistogram()
+        self._capture_times = deque()
+
+        # Camera drops and attempts to reopen it
+        self.disconnects = 0
+        self.reconnect_attempts = 0
+        self.reconnects = 0
+
+        # Per-consumer frame counts and frame age at consumption time
+        self.consumers = {}
+
+    def record_read(self, seconds, ok, timestamp=None):
+        """Record one camera read and whether it produced a frame."""
+        with self.lock:
+            self.read_latency.record(seconds)
+            if not ok:
+                self.failed_reads += 1
+                return
+            self.frames_captured += 1
+            now = timestamp or time.time()
+            self._capture_times.append(now)
+            while self._capture_times and now - self._capture_times[0] > self.fps_window:
+                self._capture_times.popleft()
+
+    def record_disconnect(self):
+        with self.lock:
+            self.disconnects += 1
+
+    def record_reconnect(self, ok):
+        """Record one attempt to reopen the camera."""
+        with self.lock:
+            self.reconnect_attempts += 1
+            if ok:
+                self.reconnects += 1
+
+    def record_consumption(self, consumer, frame_timestamp):
+        """Record that a consumer picked up a frame captured at frame_timestamp."""
+        age = max(time.time() - frame_timestamp, 0.0)
+        with self.lock:
+            stats = self.consumers.get(consumer)
+            if stats is None:
+                stats = self.consumers[consumer] = {"frames": 0, "age": LatencyHistogram()}
+            stats["frames"] += 1
+            stats["age"].record(age)
+
+    def fps(self):
+        """Effective capture rate over the last fps_window seconds."""
+        with self.lock:
+            return self._fps()
+
+    def _fps(self):
+        now = time.time()
+        while self._capture_times and now - self._capture_times[0] > self.fps_window:
+            self._capture_times.popleft()
+        if len(self._capture_times) < 2:
+            return 0.0
+        span = now - self._capture_times[0]
+        return (len(self._capture_times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        """Get a JSON-serializable copy of all counters."""
+        with self.lock:
+            return {
+                "camera_index": self.camera_index,
+                "uptime_s": time.time() - self.started,
+                "frames_captured": self.frames_captured,
+                "failed_reads": self.failed_reads,
+                "capture_fps": self._fps(),
+                "disconnects": self.disconnects,
+                "reconnect_attempts": self.reconnect_attempts,
+                "reconnects": self.reconnects,
+                "read_latency": self.read_latency.snapshot(),
+                "consumers": {
+                    name: {"frames": stats["frames"], "frame_age": stats["age"].snapshot()}
+                    for name, stats in self.consumers.items()
+                },
+            }
@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from camera.frame_cache import scaled_jpeg
+
+
+class Clip:
+    """An incident clip being collected: the pre-roll frames plus those until end."""
+
+    def __init__(self, path, frames, end):
+        self.path = path
+        self.frames = frames
+        self.end = end
+        self.bytes = sum(len(jpeg) for _, jpeg in frames)
+        self.saved = None  # True once written, False if dropped or the write failed
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def when_saved(self, callback):
+        """Call callback(path) once the clip is on disk, at once if it already is.
+
+        Never called for a clip that was dropped or failed to write.
+        """
+        with self._lock:
+            if self.saved is None:
+                self._callbacks.append(callback)
+                return
+            saved = self.saved
+        if saved:
+            callback(self.path)
+
+    def finish(self, saved):
+        with self._lock:
+            self.saved = saved
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks if saved else []:
+            try:
+                callback(self.path)
+            except Exception as e:
+                print(f"[CLIP] Callback for {self.path} failed: {e}")
+
+
+class ClipRecorder:
+    """Keeps the last seconds of a camera as JPEGs and writes clips around incidents.
+
+    A recorder thread samples the camera at fps and keeps pre_roll seconds
+    of compressed frames in a ring of at most max_bytes. trigger() only
+    takes the ring's frames and returns the Clip at once; the recorder
+    adds post_roll seconds and a writer thread saves the clip as a Motion
+    JPEG AVI, so neither the capture nor the recognition thread waits for
+    the disk. Each clip is capped at max_bytes too, and at most max_pending
+    finished clips wait for the writer.
+    """
+
+    def __init__(self, camera, pre_roll=5.0, post_roll=5.0, fps=10.0, width=None, quality=70,
+                 max_bytes=16 * 1024 * 1024, max_pending=2, folder='./db/intruder_clips', consumer="clip"):
+        self.camera = camera
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.consumer = consumer
+
+        self.lock = threading.Lock()
+        self.ring = deque()  # (timestamp, jpeg) of the last pre_roll seconds
+        self.ring_bytes = 0
+        self.clip = None  # Clip collecting its post-roll
+        self.finished = queue.Queue(maxsize=max_pending)
+        self.running = False
+        self.thread = None
+        self.writer_thread = None
+
+        # Statistics
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.write_errors = 0
+
+    def start(self):
+        """Start recording the camera into the ring."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._record)
+        self.thread.daemon = True
+        self.thread.start()
+        self.writer_thread = threading.Thread(target=self._write_clips)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def _record(self):
+        sequence = 0
+        last_time = 0
+        interval = 1.0 / self.fps
+        while self.running:
+            frame = self.camera.wait_for_frame(sequence, timeout=0.5, consumer=self.consumer)
+            if frame is None:
+                # No frames while the camera reconnects, a clip still ends on time
+                self._finish_clip(time.time())
+                continue
+            sequence = frame.sequence
+            # Some slack, or a 30 fps camera sampled at 10 fps would give every fourth frame
+            if frame.stale or frame.timestamp - last_time < interval * 0.9:
+                continue
+            last_time = frame.timestamp
+            jpeg = self.camera.get_derived(frame, scaled_jpeg, self.width, self.quality)
+            if jpeg is not None:
+                self.add(frame.timestamp, jpeg)
+
+    def add(self, timestamp, jpeg):
+        """Append an encoded frame to the ring and to the clip being collected."""
+        with self.lock:
+            self.ring.append((timestamp, jpeg))
+            self.ring_bytes += len(jpeg)
+            while self.ring and (timestamp - self.ring[0][0] > self.pre_roll or self.ring_bytes > self.max_bytes):
+                self.ring_bytes -= len(self.ring.popleft()[1])
+            clip = self.clip
+            if clip is not None and timestamp <= clip.end and clip.bytes + len(jpeg) <= self.max_bytes:
+                clip.frames.append((timestamp, jpeg))
+                clip.bytes += len(jpeg)
+        self._finish_clip(timestamp)
+
+    def trigger(self, now=None):
+        """Start a clip around now and return it, see Clip.when_saved().
+
+        A trigger while a clip is still collecting its post-roll joins that clip.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.clip is None:
+                name = f"intruder_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.avi"
+                # The JPEG bytes are shared with the ring, not copied
+                self.clip = Clip(os.path.join(self.folder, name), list(self.ring), now + self.post_roll)
+                print(f"[CLIP] Recording {self.clip.path}")
+            return self.clip
+
+    def _finish_clip(self, now):
+        with self.lock:
+            clip = self.clip
+            if clip is None or now < clip.end:
+                return
+            self.clip = None
+        try:
+            self.finished.put_nowait(clip)
+        except queue.Full:
+            self.clips_dropped += 1
+            print(f"[CLIP] Writer is behind, dropped {clip.path}")
+            clip.finish(False)
+
+    def _write_clips(self):
+        while True:
+            clip = self.finished.get()
+            if clip is None:
+                return
+            try:
+                self.write(clip)
+            except Exception as e:
+                self.write_errors += 1
+                print(f"[CLIP] Failed to write {clip.path}: {e}")
+                # Do not leave a partial file behind
+                if os.path.exists(clip.path):
+                    os.remove(clip.path)
+                clip.finish(False)
+                continue
+            self.clips_written += 1
+            clip.finish(True)
+
+    def write(self, clip):
+        """Write a clip's frames to its path as a Motion JPEG AVI."""
+        if not clip.frames:
+            raise Exception("no frames recorded")
+        duration = clip.frames[-1][0] - clip.frames[0][0]
+        # Play back at the rate the frames were recorded at
+        fps = (len(clip.frames) - 1) / duration if duration > 0 else self.fps
+        os.makedirs(os.path.dirname(clip.path) or '.', exist_ok=True)
+        writer = None
+        try:
+            for _, jpeg in clip.frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    raise Exception("could not decode a recorded frame")
+                if writer is None:
+                    height, width = image.shape[:2]
+                    writer = cv2.VideoWriter(clip.path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+                    # An unopened writer silently drops every frame
+                    if not writer.isOpened():
+                        raise Exception("could not open the video writer")
+                writer.write(image)
+        finally:
+            if writer is not None:
+                writer.release()
+        print(f"[CLIP] Saved {len(clip.frames)} frames ({duration:.1f}s) to {clip.path}")
+
+    def get_stats(self):
+        with self.lock:
+            ring_seconds = self.ring[-1][0] - self.ring[0][0] if self.ring else 0.0
+            return {
+                "ring_frames": len(self.ring),
+                "ring_seconds": ring_seconds,
+                "ring_bytes": self.ring_bytes,
+                "recording": self.clip is not None,
+                "clips_written": self.clips_written,
+                "clips_dropped": self.clips_dropped,
+                "write_errors": self.write_errors,
+            }
+
+    def stop(self):
+        """Stop recording, writing the clip being collected with the frames it has."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self._finish_clip(float('inf'))
+        if self.writer_thread is not None:
+            self.finished.put(None)
+            self.writer_thread.join(timeout=10.0)
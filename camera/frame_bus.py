@@ -0,0 +1,527 @@
+import argparse
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from camera.camera_manager import CameraManager, Frame
+from camera.frame_cache import DerivedFrameCache
+from camera.capture_stats import CaptureStats
+
+# Shared memory block name for each published camera
+BUS_NAME_PREFIX = "sass_camera_"
+
+BUS_MAGIC = 0x53415353  # "SASS"
+BUS_VERSION = 3
+
+# Readers treat a bus whose writer has not updated the heartbeat for this
+# many seconds as dead and fall back to opening the camera themselves
+HEARTBEAT_TIMEOUT = 2.0
+
+# Block layout: bus header, one header per slot, then the slot pixel data
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("slot_count", "<u4"),
+    ("writer_pid", "<u4"),
+    ("slot_bytes", "<u8"),
+    ("latest_slot", "<i8"),
+    ("latest_sequence", "<u8"),
+    ("heartbeat", "<f8"),
+    ("connected", "<u4"),
+    ("frame_height", "<u4"),
+    ("frame_width", "<u4"),
+    ("reserved", "<u4"),
+])
+SLOT_DTYPE = np.dtype([
+    ("sequence", "<u8"),
+    ("timestamp", "<f8"),
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),
+    ("reserved", "<u4"),
+])
+DATA_ALIGNMENT = 64
+
+
+def bus_name(camera_index):
+    """Name of the shared memory block publishing the given camera."""
+    return f"{BUS_NAME_PREFIX}{camera_index}"
+
+
+def _data_offset(slot_count):
+    offset = HEADER_DTYPE.itemsize + slot_count * SLOT_DTYPE.itemsize
+    return (offset + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, owned by another user
+    return True
+
+
+def _writer_alive(shm):
+    """Whether the writer of an existing block still runs and heartbeats."""
+    if shm.size < HEADER_DTYPE.itemsize:
+        return False
+    # Copy, a view would keep the block from being closed
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf).copy()
+    if header["magic"] != BUS_MAGIC:
+        return False
+    if time.time() - header["heartbeat"] > HEARTBEAT_TIMEOUT:
+        return False
+    return _pid_alive(int(header["writer_pid"]))
+
+
+def _map_headers(buf, slot_count):
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buf, offset=0)
+    slots = np.ndarray((slot_count,), dtype=SLOT_DTYPE, buffer=buf, offset=HEADER_DTYPE.itemsize)
+    return header, slots
+
+
+class FrameBusWriter:
+    """Publishes frames into shared memory slots for other processes to read."""
+
+    def __init__(self, camera_index, slot_count=4, max_shape=(480, 640, 3)):
+        self.camera_index = camera_index
+        self.slot_count = slot_count
+        self.slot_bytes = int(np.prod(max_shape))
+        self._data_offset = _data_offset(slot_count)
+        size = self._data_offset + slot_count * self.slot_bytes
+
+        name = bus_name(camera_index)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(name=name)
+            alive = _writer_alive(existing)
+            existing.close()
+            if alive:
+                raise FileExistsError(f"Camera {camera_index} is already published on '{name}'")
+            # Left behind by a capture daemon that did not shut down cleanly
+            print(f"[BUS] Reclaiming stale '{name}'")
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header, self.slots = _map_headers(self.shm.buf, slot_count)
+        self.slots[:] = 0
+        self.header["slot_count"] = slot_count
+        self.header["slot_bytes"] = self.slot_bytes
+        self.header["frame_height"] = max_shape[0]
+        self.header["frame_width"] = max_shape[1]
+        self.header["writer_pid"] = os.getpid()
+        self.header["latest_slot"] = -1
+        self.header["latest_sequence"] = 0
+        self.header["version"] = BUS_VERSION
+        self.header["connected"] = 1
+        self.heartbeat()
+        self.header["magic"] = BUS_MAGIC
+
+    def heartbeat(self):
+        """Tell readers the writer is still alive."""
+        self.header["heartbeat"] = time.time()
+
+    def set_connected(self, connected):
+        """Tell readers whether the camera behind the bus is delivering frames."""
+        self.header["connected"] = 1 if connected else 0
+
+    def publish(self, frame):
+        """Copy a frame into the next slot and make it the latest one."""
+        image = frame.image
+        if image.nbytes > self.slot_bytes:
+            print(f"[BUS] Frame {image.shape} does not fit in a slot of camera {self.camera_index}")
+            return False
+
+        slot = (int(self.header["latest_slot"]) + 1) % self.slot_count
+        slot_header = self.slots[slot]
+        # Invalidate the slot so readers holding a view of it can detect the overwrite
+        slot_header["sequence"] = 0
+        offset = self._data_offset + slot * self.slot_bytes
+        target = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+        np.copyto(target, image)
+
+        height, width = image.shape[:2]
+        slot_header["height"] = height
+        slot_header["width"] = width
+        slot_header["channels"] = image.shape[2] if image.ndim == 3 else 1
+        slot_header["timestamp"] = frame.timestamp
+        slot_header["sequence"] = frame.sequence
+
+        self.header["latest_slot"] = slot
+        self.header["latest_sequence"] = frame.sequence
+        self.heartbeat()
+        return True
+
+    def close(self):
+        """Detach from and remove the shared memory block."""
+        self.header = self.slots = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Views still exported, the mapping goes away with them
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameBusReader:
+    """Attaches to a published camera and returns zero-copy views of its frames."""
+
+    def __init__(self, camera_index, poll_interval=0.005):
+        self.camera_index = camera_index
+        self.poll_interval = poll_interval
+        self.shm = shared_memory.SharedMemory(name=bus_name(camera_index))
+
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf, offset=0)
+        if header["writer_pid"] != os.getpid():
+            # The writer owns the block; stop this process' resource tracker
+            # from unlinking it when the reader exits
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        if header["magic"] != BUS_MAGIC or header["version"] != BUS_VERSION:
+            del header
+            self.shm.close()
+            raise ValueError(f"Shared memory for camera {camera_index} is not a frame bus")
+
+        self.slot_count = int(header["slot_count"])
+        self.slot_bytes = int(header["slot_bytes"])
+        self._data_offset = _data_offset(self.slot_count)
+        self.header, self.slots = _map_headers(self.shm.buf, self.slot_count)
+
+    def is_alive(self):
+        """Check that the writer has updated the bus recently."""
+        return time.time() - float(self.header["heartbeat"]) < HEARTBEAT_TIMEOUT
+
+    def is_connected(self):
+        """Check that the writer is alive and its camera is delivering frames."""
+        return self.is_alive() and bool(self.header["connected"])
+
+    def get_latest(self):
+        """Get the latest frame as a read-only view into shared memory.
+
+        Frames are marked stale while the writer's camera is disconnected.
+        """
+        slot = int(self.header["latest_slot"])
+        sequence = int(self.header["latest_sequence"])
+        if slot < 0 or sequence == 0:
+            return None
+
+        slot_header = self.slots[slot].copy()
+        if int(slot_header["sequence"]) != sequence:
+            return None  # Slot is being rewritten, the next publish will settle it
+
+        shape = (int(slot_header["height"]), int(slot_header["width"]))
+        if slot_header["channels"] > 1:
+            shape += (int(slot_header["channels"]),)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf,
+                           offset=self._data_offset + slot * self.slot_bytes)
+        image.flags.writeable = False
+        return Frame(sequence, float(slot_header["timestamp"]), image, not self.is_connected())
+
+    def get_frame_after(self, sequence):
+        """Get the latest frame only if it is newer than the given sequence number."""
+        if int(self.header["latest_sequence"]) <= sequence:
+            return None
+        return self.get_latest()
+
+    def wait_for_frame(self, after_sequence=0, timeout=None):
+        """Poll the bus header until a frame newer than the given sequence appears."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            frame = self.get_frame_after(after_sequence)
+            if frame is not None:
+                return frame
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def is_frame_valid(self, frame):
+        """Check that a frame's slot has not been overwritten by the writer."""
+        return frame.sequence in self.slots["sequence"]
+
+    def close(self):
+        """Detach from the shared memory block."""
+        self.header = self.slots = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Consumers still hold frame views, the mapping goes away with them
+
+
+class FrameBusServer:
+    """Capture daemon that publishes a CameraManager's frames onto the frame bus."""
+
+    def __init__(self, camera_index=0, slot_count=4):
+        self.camera_index = camera_index
+        self.camera = CameraManager.get_instance(camera_index)
+        self.camera.acquire()
+        try:
+            self.writer = FrameBusWriter(camera_index, slot_count=slot_count,
+                                         max_shape=(self.camera.height, self.camera.width, 3))
+        except FileExistsError:
+            self.camera.release()
+            raise
+        self.writer.set_connected(self.camera.is_connected)
+        self.camera.add_status_listener(self._on_camera_status)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start publishing frames in a background thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self._publish_loop)
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[BUS] Publishing camera {self.camera_index} on '{bus_name(self.camera_index)}'")
+
+    def _on_camera_status(self, camera_index, connected):
+        if self.writer.header is not None:
+            self.writer.set_connected(connected)
+
+    def _publish_loop(self):
+        sequence = 0
+        while self.running:
+            frame = self.camera.wait_for_frame(sequence, timeout=0.5, consumer="frame_bus")
+            if frame is None:
+                self.writer.heartbeat()
+                continue
+            sequence = frame.sequence
+            self.writer.publish(frame)
+
+    def stop(self):
+        """Stop publishing and release the camera."""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.camera.remove_status_listener(self._on_camera_status)
+        self.writer.close()
+        self.camera.release()
+        print(f"[BUS] Camera {self.camera_index} no longer published")
+
+
+class SharedCameraClient:
+    """CameraManager-compatible client reading frames published by a capture daemon."""
+    _instances = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, camera_index=0):
+        """Get a per-process client for the camera, attaching to its frame bus."""
+        with cls._lock:
+            if camera_index not in cls._instances or cls._instances[camera_index] is None:
+                cls._instances[camera_index] = cls(camera_index)
+            return cls._instances[camera_index]
+
+    def __init__(self, camera_index=0):
+        self.camera_index = camera_index
+        self.reader = FrameBusReader(camera_index)
+        self.derived = DerivedFrameCache(self.reader.slot_count)
+        # Capture is measured by the daemon, this only tracks consumers in this process
+        self.stats = CaptureStats(camera_index)
+        self._fps_sample = None
+        self.lock = threading.Lock()
+        self.ref_count = 0
+        self.is_connected = self.reader.is_connected()
+        self._status_listeners = []
+        self._last_reattach = 0
+
+    def _consume(self, frame, consumer):
+        if frame is not None and consumer is not None:
+            self.stats.record_consumption(consumer, frame.timestamp)
+        return frame
+
+    def get_frame(self, consumer=None):
+        """Get a read-only view of the current frame."""
+        frame = self._consume(self.reader.get_latest(), consumer)
+        return frame.image if frame is not None else None
+
+    def get_latest(self, consumer=None):
+        """Get the latest frame with its sequence number and timestamp."""
+        return self._consume(self.reader.get_latest(), consumer)
+
+    def get_frame_after(self, sequence, consumer=None):
+        """Get the latest frame only if it is newer than the given sequence number."""
+        return self._consume(self.reader.get_frame_after(sequence), consumer)
+
+    def wait_for_frame(self, after_sequence=0, timeout=None, consumer=None):
+        """Block until a frame newer than the given sequence number is published.
+
+        When the daemon stopped heartbeating, re-attaches to a block a
+        restarted daemon published under the same name. Its sequence numbers
+        start over, so its latest frame is returned whatever after_sequence.
+        """
+        frame = self.reader.wait_for_frame(after_sequence, timeout)
+        if frame is None and not self.reader.is_alive() and self._reattach():
+            frame = self.reader.get_latest()
+        self._check_status()
+        return self._consume(frame, consumer)
+
+    def _reattach(self):
+        """Attach to a live block under the bus name, if it is a new one."""
+        now = time.time()
+        if now - self._last_reattach < HEARTBEAT_TIMEOUT:
+            return False
+        self._last_reattach = now
+        try:
+            reader = FrameBusReader(self.camera_index)
+        except (FileNotFoundError, ValueError):
+            return False
+        if not reader.is_alive():
+            reader.close()
+            return False
+        with self.lock:
+            # The old block is left to the garbage collector, consumers may still hold views of it
+            self.reader = reader
+            self.derived = DerivedFrameCache(reader.slot_count)
+        print(f"[BUS] Re-attached to restarted capture daemon for camera {self.camera_index}")
+        return True
+
+    def _check_status(self):
+        """Notify status listeners when the daemon's camera drops or comes back."""
+        if self.reader.header is None:
+            return
+        connected = self.reader.is_connected()
+        if connected == self.is_connected:
+            return
+        self.is_connected = connected
+        for callback in list(self._status_listeners):
+            try:
+                callback(self.camera_index, connected)
+            except Exception as e:
+                print(f"[BUS] Status listener error: {str(e)}")
+
+    def add_status_listener(self, callback):
+        """Call callback(camera_index, connected) when the published camera drops or reconnects.
+
+        Changes are picked up by wait_for_frame().
+        """
+        self._status_listeners.append(callback)
+
+    def remove_status_listener(self, callback):
+        if callback in self._status_listeners:
+            self._status_listeners.remove(callback)
+
+    def frames(self, after_sequence=0, timeout=1.0, consumer=None):
+        """Iterate over newly published frames while the client is attached."""
+        sequence = after_sequence
+        while self.reader.header is not None:
+            frame = self.wait_for_frame(sequence, timeout, consumer)
+            if frame is not None:
+                sequence = frame.sequence
+                yield frame
+
+    def get_derived(self, frame, transform, *args):
+        """Get transform(frame.image, *args), computed at most once per frame in this process."""
+        return self.derived.get(frame, transform, *args)
+
+    def is_frame_valid(self, frame):
+        """Check that a frame's slot has not been recycled by the daemon."""
+        return self.reader.is_frame_valid(frame)
+
+    @property
+    def width(self):
+        """Width of the daemon's camera frames, like CameraManager.width."""
+        return int(self.reader.header["frame_width"])
+
+    @property
+    def height(self):
+        """Height of the daemon's camera frames, like CameraManager.height."""
+        return int(self.reader.header["frame_height"])
+
+    def get_stats(self):
+        """Get a snapshot of per-consumer statistics in this process."""
+        snapshot = self.stats.snapshot()
+        latest = self.reader.get_latest()
+        now = time.time()
+        sequence = latest.sequence if latest is not None else 0
+        # Estimate the daemon's capture rate from how far the sequence moved since the last snapshot
+        if self._fps_sample is not None and now > self._fps_sample[0]:
+            snapshot["capture_fps"] = (sequence - self._fps_sample[1]) / (now - self._fps_sample[0])
+        self._fps_sample = (now, sequence)
+        snapshot["sequence"] = sequence
+        snapshot["frame_age_s"] = time.time() - latest.timestamp if latest is not None else None
+        snapshot["source"] = f"frame bus '{bus_name(self.camera_index)}'"
+        snapshot["running"] = self.reader.is_alive()
+        snapshot["connected"] = self.reader.is_connected()
+        return snapshot
+
+    def is_frame_available(self):
+        """Check if a frame less than 1 second old is available."""
+        frame = self.reader.get_latest()
+        return frame is not None and time.time() - frame.timestamp < 1.0
+
+    def acquire(self):
+        """Register a component using this camera."""
+        with self.lock:
+            self.ref_count += 1
+            return self.ref_count
+
+    def release(self):
+        """Unregister a component, detaching from the bus when none remain."""
+        with self.lock:
+            if self.ref_count > 0:
+                self.ref_count -= 1
+            if self.ref_count == 0:
+                self.reader.close()
+                with SharedCameraClient._lock:
+                    if SharedCameraClient._instances.get(self.camera_index) is self:
+                        SharedCameraClient._instances[self.camera_index] = None
+            return self.ref_count
+
+
+def attach_camera(camera_index=0):
+    """Get the camera from a running capture daemon, None if no process publishes it."""
+    try:
+        client = SharedCameraClient.get_instance(camera_index)
+        if client.reader.is_alive():
+            return client
+        print(f"[BUS] Capture daemon for camera {camera_index} is not responding")
+        if client.ref_count == 0:
+            client.release()
+    except (FileNotFoundError, ValueError):
+        pass
+    return None
+
+
+def open_camera(camera_index=0):
+    """Get the camera from a running capture daemon, or open it in this process.
+
+    Returns a SharedCameraClient when another process publishes the camera
+    on the frame bus, otherwise the in-process CameraManager singleton.
+    """
+    client = attach_camera(camera_index)
+    if client is not None:
+        return client
+    return CameraManager.get_instance(camera_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish cameras on the shared memory frame bus")
+    parser.add_argument("--camera", type=int, nargs="+", default=[0], help="Camera indices to publish")
+    parser.add_argument("--slots", type=int, default=4, help="Frame slots per camera")
+    args = parser.parse_args()
+
+    servers = [FrameBusServer(index, slot_count=args.slots) for index in args.camera]
+    for server in servers:
+        server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n[BUS] Shutting down capture daemon...")
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+# Transforms consumers derive from captured frames. Each takes the BGR frame
+# first; the cache key is (frame sequence, transform, remaining arguments).
+
+def downscale(image, factor):
+    """Shrink the frame by an integer factor."""
+    return cv2.resize(image, (0, 0), fx=(1 / factor), fy=(1 / factor))
+
+
+def resize(image, width, height):
+    """Resize the frame to a fixed size."""
+    return cv2.resize(image, (width, height))
+
+
+def to_rgb(image):
+    """Convert the BGR frame to RGB."""
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def to_gray(image):
+    """Convert the BGR frame to grayscale."""
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def tiny_gray(image, width, height):
+    """Tiny grayscale frame, as used by motion detection."""
+    return cv2.cvtColor(cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA),
+                        cv2.COLOR_BGR2GRAY)
+
+
+def small_rgb(image, factor):
+    """Downscaled RGB frame, as used by face detection."""
+    return to_rgb(downscale(image, factor))
+
+
+def preview_rgb(image, width, height):
+    """Fixed-size RGB frame, as shown in the GUI previews."""
+    return to_rgb(resize(image, width, height))
+
+
+def encode_jpeg(image, quality=None):
+    """JPEG-encoded frame bytes."""
+    params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)] if quality else []
+    ok, jpeg = cv2.imencode('.jpg', image, params)
+    return jpeg.tobytes() if ok else None
+
+
+def scaled_jpeg(image, width=None, quality=None):
+    """JPEG-encoded frame scaled to the given width, keeping the aspect ratio."""
+    if width and width != image.shape[1]:
+        height = max(int(round(image.shape[0] * width / float(image.shape[1]))), 1)
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    return encode_jpeg(image, quality)
+
+
+class DerivedFrameCache:
+    """Memoizes images derived from captured frames.
+
+    Every (sequence, transform, args) result is computed at most once, even
+    when several consumers ask for it concurrently; the others wait for the
+    first one. Results are shared, so arrays are returned read-only.
+    """
+
+    def __init__(self, max_frames=4):
+        self.max_frames = max_frames
+        self.lock = threading.Lock()
+        self._values = {}
+        self._pending = {}
+        self._keys_by_sequence = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, frame, transform, *args):
+        """Get transform(frame.image, *args), computing it on first request."""
+        key = (frame.sequence, transform, args)
+        with self.lock:
+            if key in self._values:
+                self.hits += 1
+                return self._values[key]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = threading.Event()
+                self.misses += 1
+
+        if not owner:
+            # Another consumer is computing the same derivative right now
+            pending.wait()
+            with self.lock:
+                if key in self._values:
+                    self.hits += 1
+                    return self._values[key]
+            return self._freeze(transform(frame.image, *args))
+
+        value = None
+        try:
+            value = self._freeze(transform(frame.image, *args))
+            return value
+        finally:
+            with self.lock:
+                if value is not None:
+                    self._store(frame.sequence, key, value)
+                del self._pending[key]
+            pending.set()
+
+    def _freeze(self, value):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        return value
+
+    def _store(self, sequence, key, value):
+        self._values[key] = value
+        self._keys_by_sequence.setdefault(sequence, []).append(key)
+        # Drop derivatives of frames that have left the camera ring buffer
+        while len(self._keys_by_sequence) > self.max_frames:
+            oldest = min(self._keys_by_sequence)
+            for old_key in self._keys_by_sequence.pop(oldest):
+                self._values.pop(old_key, None)
+
+    def clear(self):
+        with self.lock:
+            self._values.clear()
+            self._keys_by_sequence.clear()
@@ -0,0 +1,245 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+
+
+class FramePacer:
+    """Spaces reads out to a target frame rate, or lets them run as fast as possible."""
+
+    def __init__(self, fps, realtime=True):
+        self.interval = 1.0 / fps if fps and fps > 0 else 0
+        self.realtime = realtime
+        self.next_time = None
+
+    def wait(self):
+        """Sleep until the next frame is due."""
+        if not self.realtime or not self.interval:
+            return
+        now = time.time()
+        if self.next_time is None or now - self.next_time > self.interval:
+            # First frame, or the consumer fell behind: restart the schedule
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time += self.interval
+
+    def reset(self):
+        self.next_time = None
+
+
+class FrameSource:
+    """Something CameraManager can capture frames from.
+
+    read() follows the cv2.VideoCapture convention: it returns (ret, frame)
+    and decodes into `out` when a buffer of the right shape is passed.
+    """
+
+    def open(self):
+        """Open the source, returning True on success."""
+        raise NotImplementedError
+
+    def is_opened(self):
+        """Check whether the source can currently deliver frames."""
+        raise NotImplementedError
+
+    def read(self, out=None):
+        """Read the next frame."""
+        raise NotImplementedError
+
+    def release(self):
+        """Release the underlying device or file."""
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+class DeviceSource(FrameSource):
+    """A live camera device opened through cv2.VideoCapture."""
+
+    def __init__(self, camera_index=0, width=640, height=480, fps=30):
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.camera_index)
+
+        # Set camera properties
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+        return self.capture.isOpened()
+
+    def is_opened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self, out=None):
+        if out is None:
+            return self.capture.read()
+        return self.capture.read(out)
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def describe(self):
+        return f"camera device {self.camera_index}"
+
+
+class VideoFileSource(FrameSource):
+    """Replays a recorded video file, paced at its recorded frame rate or unthrottled."""
+
+    def __init__(self, path, realtime=True, loop=False, fps=None):
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self.realtime = realtime
+        self.capture = None
+        self.pacer = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            return False
+        fps = self.fps or self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.pacer = FramePacer(fps, self.realtime)
+        return True
+
+    def is_opened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self, out=None):
+        self.pacer.wait()
+        ret, frame = self.capture.read() if out is None else self.capture.read(out)
+        if not ret and self.loop:
+            # Rewind to the start of the recording
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.pacer.reset()
+            ret, frame = self.capture.read() if out is None else self.capture.read(out)
+        return ret, frame
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def describe(self):
+        return f"video file {self.path}"
+
+
+class ImageDirectorySource(FrameSource):
+    """Replays the images of a directory in name order as a frame sequence."""
+
+    def __init__(self, path, fps=30, realtime=True, loop=True):
+        self.path = path
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.image_paths = []
+        self.position = 0
+        self.pacer = FramePacer(fps, realtime)
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            return False
+        self.image_paths = sorted(
+            os.path.join(self.path, f) for f in os.listdir(self.path)
+            if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        self.pacer.reset()
+        return bool(self.image_paths)
+
+    def is_opened(self):
+        return bool(self.image_paths)
+
+    def read(self, out=None):
+        if self.position >= len(self.image_paths):
+            if not self.loop:
+                return False, None
+            self.position = 0
+        self.pacer.wait()
+        frame = cv2.imread(self.image_paths[self.position])
+        self.position += 1
+        if frame is None:
+            return False, None
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            frame = out
+        return True, frame
+
+    def release(self):
+        self.image_paths = []
+
+    def describe(self):
+        return f"image directory {self.path}"
+
+
+class SyntheticSource(FrameSource):
+    """Generates a moving test pattern, for load testing without any footage."""
+
+    def __init__(self, width=640, height=480, fps=30, realtime=True, frame_limit=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_limit = frame_limit
+        self.pacer = FramePacer(fps, realtime)
+        self.frame_count = 0
+        self.opened = False
+        # Static background gradient, the moving box is drawn over a copy of it
+        ramp = np.linspace(0, 255, width, dtype=np.uint8)
+        self.background = np.repeat(np.tile(ramp, (height, 1))[:, :, None], 3, axis=2)
+
+    def open(self):
+        self.frame_count = 0
+        self.pacer.reset()
+        self.opened = True
+        return True
+
+    def is_opened(self):
+        return self.opened
+
+    def read(self, out=None):
+        if self.frame_limit is not None and self.frame_count >= self.frame_limit:
+            return False, None
+        self.pacer.wait()
+        if out is None or out.shape != self.background.shape:
+            out = np.empty_like(self.background)
+        np.copyto(out, self.background)
+
+        size = self.height // 4
+        x = (self.frame_count * 4) % max(self.width - size, 1)
+        y = (self.height - size) // 2
+        cv2.rectangle(out, (x, y), (x + size, y + size), (0, 0, 255), -1)
+        cv2.putText(out, str(self.frame_count), (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.frame_count += 1
+        return True, out
+
+    def release(self):
+        self.opened = False
+
+    def describe(self):
+        return f"synthetic {self.width}x{self.height}@{self.fps}"
+
+
+def create_source(spec, width=640, height=480, fps=30, realtime=True):
+    """Build a frame source from a short description.
+
+    `spec` is a camera index, "synthetic", the path of an image directory
+    or the path of a video file.
+    """
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return DeviceSource(int(spec), width, height, fps)
+    if spec == "synthetic":
+        return SyntheticSource(width, height, fps, realtime=realtime)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=fps, realtime=realtime)
+    return VideoFileSource(spec, realtime=realtime)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import namedtuple
+
+from camera.frame_cache import encode_jpeg, scaled_jpeg
+
+# A JPEG shared with every stream client: the camera frame's sequence
+# number and capture timestamp, and the encoded bytes
+EncodedFrame = namedtuple("EncodedFrame", ["sequence", "timestamp", "jpeg"])
+
+
+class JpegEncoder:
+    """Encodes each new camera frame once, on its own thread, for all stream clients.
+
+    Clients call wait_for_frame() with the sequence number they sent last
+    and write the shared bytes; they never encode themselves. The thread
+    starts with the first client and only encodes while clients are
+    attached. Frames are scaled to width and encoded with quality when
+    given, one encoder serves every client of that profile. snapshot()
+    serves single JPEGs from the same cache.
+    """
+
+    def __init__(self, camera, width=None, quality=None, consumer="stream"):
+        self.camera = camera
+        self.width = width
+        self.quality = quality
+        self.consumer = consumer
+        self.lock = threading.Lock()
+        self._frame_ready = threading.Condition(self.lock)
+        self.latest = None
+        self.clients = 0
+        self.running = False
+        self.thread = None
+        self._listeners = []
+
+        # Statistics
+        self.frames_encoded = 0
+        self.encode_time = 0.0
+
+    def add_client(self):
+        """Register a stream client, starting the encoder thread if needed."""
+        with self.lock:
+            self.clients += 1
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self._encode_frames)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def remove_client(self):
+        with self.lock:
+            self.clients = max(self.clients - 1, 0)
+
+    def _encode_frames(self):
+        sequence = 0
+        while self.running:
+            frame = self.camera.wait_for_frame(sequence, timeout=0.5, consumer=self.consumer)
+            if frame is None:
+                continue
+            sequence = frame.sequence
+            if not self.clients:
+                continue  # Nobody watching, do not spend CPU on encoding
+            self._encode_and_publish(frame)
+
+    def _encode_and_publish(self, frame):
+        """Encode a camera frame and hand it to the clients, returning the EncodedFrame."""
+        start = time.time()
+        jpeg = self.encode(frame)
+        if jpeg is None:
+            return None
+        encoded = EncodedFrame(frame.sequence, frame.timestamp, jpeg)
+        with self._frame_ready:
+            self.frames_encoded += 1
+            self.encode_time += time.time() - start
+            # A snapshot may have encoded a newer frame meanwhile
+            if self.latest is not None and self.latest.sequence >= encoded.sequence:
+                return encoded
+            self.latest = encoded
+            self._frame_ready.notify_all()
+        for callback in list(self._listeners):
+            callback(encoded)
+        return encoded
+
+    def add_listener(self, callback):
+        """Call callback(encoded_frame) on the encoder thread after each new frame."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def encode(self, frame):
+        """JPEG bytes of a camera frame, shared through the camera's derived-frame cache."""
+        if self.width is None and self.quality is None:
+            return self.camera.get_derived(frame, encode_jpeg)
+        return self.camera.get_derived(frame, scaled_jpeg, self.width, self.quality)
+
+    def snapshot(self, max_age=1.0):
+        """The latest encoded frame, encoding the camera's newest one only when needed.
+
+        While clients are attached the stream's own frame is returned. Without
+        them, the camera's latest frame is encoded once it is more than
+        max_age seconds newer than the cached one, so frequent polls share
+        a single encode. None if the camera has no frame yet.
+        """
+        latest = self.latest
+        if self.clients and latest is not None:
+            return latest
+        frame = self.camera.get_latest(consumer="snapshot")
+        if frame is None or (latest is not None and
+                             (frame.sequence <= latest.sequence or frame.timestamp - latest.timestamp <= max_age)):
+            return latest
+        return self._encode_and_publish(frame) or latest
+
+    def wait_for_frame(self, after_sequence=0, timeout=None):
+        """Block until a frame newer than the given sequence number is encoded.
+
+        Returns None if the timeout expires or the encoder is stopped first.
+        """
+        with self._frame_ready:
+            self._frame_ready.wait_for(
+                lambda: (self.latest is not None and self.latest.sequence > after_sequence) or not self.running,
+                timeout)
+            if self.latest is None or self.latest.sequence <= after_sequence:
+                return None
+            return self.latest
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "width": self.width,
+                "quality": self.quality,
+                "clients": self.clients,
+                "frames_encoded": self.frames_encoded,
+                "encode_ms": self.encode_time / self.frames_encoded * 1000 if self.frames_encoded else 0.0,
+                "last_sequence": self.latest.sequence if self.latest is not None else 0,
+            }
+
+    def stop(self):
+        with self._frame_ready:
+            self.running = False
+            self._frame_ready.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
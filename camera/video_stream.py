@@ -1,45 +1,277 @@
-from flask import Flask, Response
-import cv2
+from flask import Flask, Response, jsonify, request
 import os
+import time
+from collections import namedtuple
 from camera.camera_manager import CameraManager
+from camera.frame_bus import attach_camera
+from camera.jpeg_encoder import JpegEncoder
 from dotenv import load_dotenv
 import threading
 
 app = Flask(__name__)
 
 # Global variables
-camera_manager = None
+camera_manager = None  # Default camera, opened by init_camera for the server's lifetime
+default_camera_index = 0
+stream_cameras = {}  # Other STREAM_CAMERAS, attached by their first request and released when idle
+camera_last_used = {}
+idle_thread = None
+jpeg_encoders = {}  # One encoder per (camera index, width, quality)
+encoders_lock = threading.Lock()
 stream_active = False
 
+# Seconds between two checks for idle cameras
+IDLE_CHECK_INTERVAL = 5.0
+
+# Stream a client asks for with ?w=&q=&fps=. Widths and qualities are
+# rounded so that clients share encoders; None keeps the camera's frames
+StreamProfile = namedtuple("StreamProfile", ["width", "quality", "fps"])
+DEFAULT_PROFILE = StreamProfile(None, None, None)
+MIN_WIDTH = 80
+WIDTH_STEP = 16
+QUALITY_STEP = 5
+
+def max_stream_fps():
+    """Frame rate no client is sent more than, from STREAM_MAX_FPS"""
+    return float(os.getenv('STREAM_MAX_FPS', 15))
+
+def camera_idle_timeout():
+    """Seconds a camera opened on request stays open without clients, from STREAM_IDLE_TIMEOUT"""
+    return float(os.getenv('STREAM_IDLE_TIMEOUT', 60))
+
+def stream_camera_indices():
+    """Indices of the other cameras clients may request, from STREAM_CAMERAS, e.g. "1,2" """
+    indices = set()
+    for index in os.getenv('STREAM_CAMERAS', '').split(','):
+        try:
+            indices.add(int(index))
+        except ValueError:
+            pass
+    return indices
+
+def is_stream_camera(camera_index):
+    return camera_index == default_camera_index or camera_index in stream_camera_indices()
+
+def snapshot_max_age():
+    """Seconds a snapshot may lag behind the camera, from SNAPSHOT_MAX_AGE"""
+    return float(os.getenv('SNAPSHOT_MAX_AGE', 1.0))
+
+def _query_number(args, key, convert):
+    try:
+        return convert(args[key]) if key in args else None
+    except ValueError:
+        return None
+
+def parse_profile(args, camera=None):
+    """Build the StreamProfile of a request's query arguments, ignoring invalid values"""
+    camera = camera if camera is not None else camera_manager
+    width = _query_number(args, 'w', int)
+    quality = _query_number(args, 'q', int)
+    fps = _query_number(args, 'fps', float)
+    if width is not None:
+        max_width = camera.width if camera is not None and camera.width else width
+        width = min(max(width - width % WIDTH_STEP, MIN_WIDTH), max_width)
+        if camera is not None and width == camera.width:
+            width = None
+    if quality is not None:
+        quality = min(max(int(round(quality / float(QUALITY_STEP))) * QUALITY_STEP, 10), 95)
+    if fps is not None and fps <= 0:
+        fps = None
+    return StreamProfile(width, quality, fps)
+
+def _open_camera(camera_index):
+    """The camera with this index, acquiring it if needed. Call with encoders_lock held
+
+    Cameras other than the default one are only attached to on the frame
+    bus, their devices belong to the process publishing them. None for
+    cameras not listed in STREAM_CAMERAS or not published.
+    """
+    global idle_thread
+    if camera_index == default_camera_index:
+        return camera_manager
+    if not is_stream_camera(camera_index):
+        return None
+    camera = stream_cameras.get(camera_index)
+    if camera is None:
+        camera = attach_camera(camera_index)
+        if camera is None:
+            return None
+        stream_cameras[camera_index] = camera
+        camera.acquire()  # Register this component
+        print(f"[STREAM] Attached to camera {camera_index}")
+        if idle_thread is None:
+            idle_thread = threading.Thread(target=_release_idle_cameras_loop)
+            idle_thread.daemon = True
+            idle_thread.start()
+    camera_last_used[camera_index] = time.time()
+    return camera
+
+def get_stream_camera(camera_index=None):
+    """Get a camera to stream, opening it on its first request. None if it delivers no frame"""
+    with encoders_lock:
+        camera = _open_camera(default_camera_index if camera_index is None else camera_index)
+    if camera is None:
+        return None
+    # A freshly opened camera may not have delivered its first frame yet
+    if camera.wait_for_frame(0, timeout=2.0) is None:
+        return None
+    return camera
+
+def get_encoder(profile, camera_index=None):
+    """Get the shared encoder of a camera and profile, creating it on first use. None if the camera is unavailable"""
+    camera_index = default_camera_index if camera_index is None else camera_index
+    key = (camera_index, profile.width, profile.quality)
+    with encoders_lock:
+        encoder = jpeg_encoders.get(key)
+        if encoder is None:
+            # One encoder thread per camera and profile, started by its first client
+            camera = _open_camera(camera_index)
+            if camera is None:
+                return None
+            encoder = jpeg_encoders[key] = JpegEncoder(camera, profile.width, profile.quality)
+        elif camera_index in stream_cameras:
+            camera_last_used[camera_index] = time.time()
+        return encoder
+
+def release_idle_cameras(now=None):
+    """Release the cameras opened on request that had no clients for the idle timeout"""
+    now = time.time() if now is None else now
+    idle = []
+    with encoders_lock:
+        for camera_index in list(stream_cameras):
+            keys = [key for key in jpeg_encoders if key[0] == camera_index]
+            if any(jpeg_encoders[key].clients for key in keys):
+                camera_last_used[camera_index] = now
+            elif now - camera_last_used.get(camera_index, 0) > camera_idle_timeout():
+                encoders = [jpeg_encoders.pop(key) for key in keys]
+                camera_last_used.pop(camera_index, None)
+                idle.append((stream_cameras.pop(camera_index), encoders))
+    for camera, encoders in idle:
+        for encoder in encoders:
+            encoder.stop()
+        camera.release()  # Unregister this component
+        print(f"[STREAM] Released idle camera {camera.camera_index}")
+    return len(idle)
+
+def _release_idle_cameras_loop():
+    global idle_thread
+    while True:
+        time.sleep(IDLE_CHECK_INTERVAL)
+        release_idle_cameras()
+        with encoders_lock:
+            if not stream_cameras:
+                idle_thread = None
+                return
+
+def get_snapshot(camera_index=None, args=None):
+    """The camera's latest EncodedFrame from the encoder cache, None if the camera has no frame"""
+    camera = get_stream_camera(camera_index)
+    if camera is None:
+        return None
+    encoder = get_encoder(parse_profile(args or {}, camera), camera_index)
+    if encoder is None:
+        return None
+    return encoder.snapshot(snapshot_max_age())
+
+def snapshot_etag(camera_index, encoded):
+    """Entity tag of a snapshot, the capture time tells apart reopened cameras"""
+    return f"{camera_index}-{encoded.sequence}-{int(encoded.timestamp * 1000)}"
+
 def init_camera(camera_index=0):
     """Initialize the camera"""
-    global camera_manager
+    global camera_manager, default_camera_index
+    default_camera_index = camera_index
     camera_manager = CameraManager.get_instance(camera_index)
     camera_manager.acquire()  # Register this component
+    # A freshly opened camera may not have delivered its first frame yet
+    camera_manager.wait_for_frame(0, timeout=2.0)
     return camera_manager.is_frame_available()
 
-def get_camera_feed():
+def frame_interval(profile):
+    """Seconds between two frames sent to a client of the profile"""
+    fps = min(profile.fps or max_stream_fps(), max_stream_fps())
+    return 1.0 / fps if fps > 0 else 0
+
+def mjpeg_part(jpeg):
+    """One JPEG as a part of the multipart MJPEG response"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+def get_camera_feed(profile=DEFAULT_PROFILE, camera_index=None):
     """Generator function for camera frames"""
-    global camera_manager, stream_active
+    global stream_active
     
-    while stream_active:
-        frame = camera_manager.get_frame()
-        if frame is not None:
-            # Encode the frame
-            _, jpeg = cv2.imencode('.jpg', frame)
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-        else:
-            # Brief pause if no frame is available
-            import time
-            time.sleep(0.05)
+    encoder = get_encoder(profile, camera_index)
+    if encoder is None:
+        return
+    # Paced on the server: frames encoded in between are skipped, not queued
+    interval = frame_interval(profile)
+    encoder.add_client()
+    try:
+        last_sequence = 0
+        next_time = 0
+        while stream_active:
+            delay = next_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            # Wait until the encoder has a frame this client has not been sent yet
+            encoded = encoder.wait_for_frame(last_sequence, timeout=0.5)
+            if encoded is not None:
+                last_sequence = encoded.sequence
+                next_time = time.time() + interval
+                yield mjpeg_part(encoded.jpeg)
+    finally:
+        encoder.remove_client()
 
 @app.route('/video_feed')
 def video_feed():
-    """Route for streaming video"""
-    return Response(get_camera_feed(),
+    """Route for streaming video, e.g. /video_feed?w=320&q=60&fps=5"""
+    return Response(get_camera_feed(parse_profile(request.args)),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/video_feed/<int:camera_index>')
+def camera_video_feed(camera_index):
+    """Route for streaming another camera, opened on the first request"""
+    if not is_stream_camera(camera_index):
+        return jsonify({"error": f"camera {camera_index} is not streamed"}), 404
+    camera = get_stream_camera(camera_index)
+    if camera is None:
+        return jsonify({"error": f"camera {camera_index} not available"}), 503
+    return Response(get_camera_feed(parse_profile(request.args, camera), camera_index),
+                   mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/snapshot/<int:camera_index>.jpg')
+def snapshot(camera_index):
+    """Route for the camera's latest JPEG, answering If-None-Match with 304 Not Modified"""
+    if not is_stream_camera(camera_index):
+        return jsonify({"error": f"camera {camera_index} is not streamed"}), 404
+    encoded = get_snapshot(camera_index, request.args)
+    if encoded is None:
+        return jsonify({"error": f"camera {camera_index} not available"}), 503
+    response = Response(encoded.jpeg, mimetype='image/jpeg')
+    response.set_etag(snapshot_etag(camera_index, encoded))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def get_stream_stats():
+    """Camera capture statistics with those of the stream encoders, None before init_camera"""
+    if camera_manager is None:
+        return None
+    stats = camera_manager.get_stats()
+    with encoders_lock:
+        encoders = list(jpeg_encoders.items())
+        stats["stream_cameras"] = sorted(stream_cameras)
+    stats["stream"] = [dict(encoder.get_stats(), camera=key[0]) for key, encoder in encoders]
+    return stats
+
+@app.route('/stats')
+def stats():
+    """Route for camera capture and consumer statistics"""
+    stats = get_stream_stats()
+    if stats is None:
+        return jsonify({"error": "camera not initialized"}), 503
+    return jsonify(stats)
+
 def start_stream(host='0.0.0.0', port=5000):
     """Start the video stream server"""
     global stream_active
@@ -57,6 +289,12 @@ def start_stream(host='0.0.0.0', port=5000):
     port = int(os.getenv('STREAM_PORT', 5000))
     host = os.getenv('STREAM_HOST', '0.0.0.0')
     
+    # STREAM_MODE=async serves all viewers from one asyncio loop instead of a thread each
+    if os.getenv('STREAM_MODE', 'threaded') == 'async':
+        from camera.async_stream import run_async_stream
+        if run_async_stream(host, port):
+            return
+    
     print(f"[STREAM] Starting video stream server at http://{host}:{port}")
     app.run(host=host, port=port, threaded=True)
 
@@ -64,6 +302,16 @@ def stop_stream():
     """Stop the video stream"""
     global stream_active, camera_manager
     stream_active = False
+    with encoders_lock:
+        encoders = list(jpeg_encoders.values())
+        jpeg_encoders.clear()
+        cameras = list(stream_cameras.values())
+        stream_cameras.clear()
+        camera_last_used.clear()
+    for encoder in encoders:
+        encoder.stop()
+    for camera in cameras:
+        camera.release()
     if camera_manager:
         camera_manager.release()  # Unregister this component
     print("[STREAM] Video stream stopped")
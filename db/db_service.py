@@ -3,11 +3,13 @@ from datetime import datetime
 import os
 from cloud.cloudinary_service import CloudinaryService
 
+DB_PATH = './db/security.db'
+
 class DatabaseService:
     def __init__(self):
         # Create directories if they don't exist
         os.makedirs('./db/intruder_images', exist_ok=True)
-        self.db_path = './db/security.db'
+        self.db_path = DB_PATH
         self.init_db()
         self.cloud_service = CloudinaryService()
 
@@ -36,6 +38,10 @@ class DatabaseService:
                 FOREIGN KEY (log_id) REFERENCES access_logs (id) ON DELETE CASCADE
             )
         ''')
+        # Databases created before incident clips were recorded lack the clip_path column
+        cursor.execute("PRAGMA table_info(intruder_images)")
+        if 'clip_path' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE intruder_images ADD COLUMN clip_path TEXT")
 
         # Create user table
         cursor.execute('''
@@ -54,12 +60,33 @@ class DatabaseService:
             )
         ''')
 
+        # Create change_counters table, bumped by triggers so running
+        # services can notice changes without re-reading whole tables
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_counters (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO change_counters (name, version)
+            VALUES ('users', 0)
+        ''')
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS users_{event.lower()}_counter
+                AFTER {event} ON users
+                BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name = 'users';
+                END
+            ''')
+
 
         conn.commit()
         conn.close()
 
     def log_access(self, name, authorized, frame=None, unlock_method="face"):
-        """Log access attempts with optional image storage"""
+        """Log access attempts with optional image storage, returning the log id"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -84,6 +111,27 @@ class DatabaseService:
         
         conn.commit()
         conn.close()
+        return log_id
+
+    def link_clip(self, log_id, clip_path):
+        """Link a saved incident clip to an access log, called once the clip is on disk"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            UPDATE intruder_images
+            SET clip_path = ?
+            WHERE log_id = ?
+        ''', (clip_path, log_id))
+        # The image upload may have failed, the clip still gets a row
+        if cursor.rowcount == 0:
+            cursor.execute('''
+                INSERT INTO intruder_images (image_path, log_id, clip_path)
+                VALUES ('', ?, ?)
+            ''', (log_id, clip_path))
+
+        conn.commit()
+        conn.close()
 
     def add_user(self, name, authorized=True):
         """Add a new user to the database"""
@@ -130,6 +178,21 @@ class DatabaseService:
         # Convert tuple of tuples to list of names
         return [user[0] for user in users]
     
+    def get_users_version(self):
+        """Get the users table change counter, incremented on every change to users"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT version
+            FROM change_counters
+            WHERE name = 'users'
+        ''')
+        
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else 0
+    
     def add_pin(self, pin):
         """Add a new authorized PIN to the database"""
         conn = sqlite3.connect(self.db_path)
@@ -222,7 +285,7 @@ class DatabaseService:
             SELECT access_logs.timestamp, access_logs.name, intruder_images.image_path
             FROM access_logs
             INNER JOIN intruder_images ON access_logs.id = intruder_images.log_id
-            WHERE access_logs.authorized = 0
+            WHERE access_logs.authorized = 0 AND intruder_images.image_path != ''
             ORDER BY access_logs.timestamp DESC
             LIMIT ?
         ''', (limit,))
@@ -303,6 +366,24 @@ def print_all_tables_and_data():
 def get_authorized_users():
     db = DatabaseService()
     return db.get_authorized_users()
+
+def get_users_version(db_path=DB_PATH):
+    """Read the users change counter with a single query, cheap enough to poll.
+
+    Unlike the other helpers this does not create a DatabaseService, which
+    would initialize the tables and the Cloudinary client on every call.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return 0  # No database yet
+    try:
+        row = conn.execute("SELECT version FROM change_counters WHERE name = 'users'").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # Tables not created yet
+    finally:
+        conn.close()
+    return row[0] if row else 0
     
 def get_pins():
     db = DatabaseService()
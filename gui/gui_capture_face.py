@@ -10,6 +10,7 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from db.db_service import DatabaseService
+from camera.frame_bus import open_camera
 
 # Global root
 preview_loop_id = None
@@ -29,13 +30,17 @@ def capture_photos_gui(name):
     global preview_loop_id
 
     folder = create_folder(name)
-    cap = cv2.VideoCapture(0)
+    # Share the camera with the capture daemon instead of opening the device again
+    camera = open_camera(0)
+    camera.acquire()
 
-    if not cap.isOpened():
+    if camera.wait_for_frame(0, timeout=2.0) is None:
+        camera.release()
         messagebox.showerror("Error", "Could not access the webcam.")
         return
 
     photo_count = 0
+    last_sequence = 0
 
     capture_window = customtkinter.CTkToplevel(root)
     capture_window.title(f"Capture Photos for {name}")
@@ -46,20 +51,29 @@ def capture_photos_gui(name):
 
     def update_frame():
         global preview_loop_id
-        ret, frame = cap.read()
-        if ret:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = PIL_Image.fromarray(frame_rgb)
-            img_tk = ImageTk.PhotoImage(image=img)
-            preview_label.imgtk = img_tk
-            preview_label.configure(image=img_tk)
+        nonlocal last_sequence
+        latest = camera.get_frame_after(last_sequence, consumer="enrollment")
+        if latest is not None:
+            last_sequence = latest.sequence
+            frame_rgb = cv2.cvtColor(latest.image, cv2.COLOR_BGR2RGB)
+            # Skip a frame whose ring slot was recycled during the conversion
+            if camera.is_frame_valid(latest):
+                img = PIL_Image.fromarray(frame_rgb)
+                img_tk = ImageTk.PhotoImage(image=img)
+                preview_label.imgtk = img_tk
+                preview_label.configure(image=img_tk)
         preview_loop_id = preview_label.after(10, update_frame)
 
     def on_key(event):
         nonlocal photo_count
         if event.char == ' ':
-            ret, frame = cap.read()
-            if ret:
+            latest = camera.get_latest()
+            # Copied out of the camera ring, a torn copy is retaken from the next frame
+            frame = latest.image.copy() if latest is not None else None
+            while latest is not None and not camera.is_frame_valid(latest):
+                latest = camera.get_latest()
+                frame = latest.image.copy() if latest is not None else None
+            if latest is not None:
                 photo_count += 1
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"{name}_{timestamp}.jpg"
@@ -72,7 +86,7 @@ def capture_photos_gui(name):
     def close_window():
         if preview_loop_id:
             preview_label.after_cancel(preview_loop_id)
-        cap.release()
+        camera.release()
         capture_window.destroy()
         
         # # Add user to database as authorized
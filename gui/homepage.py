@@ -5,7 +5,6 @@ from tkinter import *
 import customtkinter
 import shutil
 from tkinter import messagebox
-import cv2
 from PIL import Image, ImageTk
 import threading
 import requests
@@ -14,7 +13,9 @@ from tkinter import ttk
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from db.db_service import DatabaseService
-from camera.camera_manager import CameraManager
+from camera.frame_bus import open_camera
+from camera.frame_cache import preview_rgb
+from util.face_rec_model_training import train
 
 db_service = DatabaseService()
 
@@ -23,6 +24,23 @@ gate_camera = None
 door_camera = None
 camera_running = True
 
+# Sequence numbers of the last frame shown in each preview
+gate_last_sequence = 0
+door_last_sequence = 0
+
+# Face model training runs in a background thread; user changes made while
+# it runs are picked up by one more pass
+project_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+training_lock = threading.Lock()
+training_thread = None
+training_pending = False
+
+# Widgets used by the callbacks, created by build_gui()
+root = None
+camera_label1 = camera_label2 = None
+camera_stats_label1 = camera_stats_label2 = None
+user_listbox = None
+
 def open_popup(txt):
     popup_window = customtkinter.CTkToplevel(root)
     popup_window.title("Notification")
@@ -270,22 +288,23 @@ def open_logs_window():
 
 def update_gate_camera():
     """Update gate camera feed using CameraManager"""
-    global gate_camera, camera_running
+    global gate_camera, camera_running, gate_last_sequence
     
     if not camera_running:
         return
     
     try:
-        # Get frame from camera manager
-        frame = gate_camera.get_frame()
+        # Get a frame newer than the one already shown from camera manager
+        latest = gate_camera.get_frame_after(gate_last_sequence, consumer="gate_preview")
         
-        if frame is not None:
-            # Resize frame to fit in the UI
-            frame = cv2.resize(frame, (550, 400))
+        if latest is not None:
+            gate_last_sequence = latest.sequence
             
-            # Convert to RGB for tkinter display
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Resized RGB frame for tkinter display, shared with other consumers
+            frame_rgb = gate_camera.get_derived(latest, preview_rgb, 550, 400)
             
+        # Skip a frame whose ring slot was recycled while it was resized, the next one follows
+        if latest is not None and gate_camera.is_frame_valid(latest):
             # Convert to PIL Image
             img = Image.fromarray(frame_rgb)
             
@@ -295,7 +314,7 @@ def update_gate_camera():
             # Update label with new image
             camera_label1.imgtk = img_tk
             camera_label1.configure(image=img_tk)
-        else:
+        elif gate_camera.get_latest() is None:
             camera_label1.configure(text="No frame available")
     except Exception as e:
         print(f"Error updating gate camera: {e}")
@@ -307,22 +326,23 @@ def update_gate_camera():
 
 def update_door_camera():
     """Update door camera feed using CameraManager"""
-    global door_camera, camera_running
+    global door_camera, camera_running, door_last_sequence
     
     if not camera_running:
         return
     
     try:
-        # Get frame from camera manager
-        frame = door_camera.get_frame()
+        # Get a frame newer than the one already shown from camera manager
+        latest = door_camera.get_frame_after(door_last_sequence, consumer="door_preview")
         
-        if frame is not None:
-            # Resize frame to fit in the UI
-            frame = cv2.resize(frame, (550, 400))
+        if latest is not None:
+            door_last_sequence = latest.sequence
             
-            # Convert to RGB for tkinter display
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Resized RGB frame for tkinter display, shared with other consumers
+            frame_rgb = door_camera.get_derived(latest, preview_rgb, 550, 400)
             
+        # Skip a frame whose ring slot was recycled while it was resized, the next one follows
+        if latest is not None and door_camera.is_frame_valid(latest):
             # Convert to PIL Image
             img = Image.fromarray(frame_rgb)
             
@@ -332,7 +352,7 @@ def update_door_camera():
             # Update label with new image
             camera_label2.imgtk = img_tk
             camera_label2.configure(image=img_tk)
-        else:
+        elif door_camera.get_latest() is None:
             camera_label2.configure(text="No frame available")
     except Exception as e:
         print(f"Error updating door camera: {e}")
@@ -342,18 +362,40 @@ def update_door_camera():
     if camera_running:
         camera_label2.after(33, update_door_camera)  # ~30 FPS
 
+def format_camera_stats(camera):
+    """One-line capture summary shown under a camera preview"""
+    stats = camera.get_stats()
+    age = stats["frame_age_s"]
+    age_text = f"{age * 1000:.0f} ms" if age is not None else "n/a"
+    return (f"{stats['capture_fps']:.1f} FPS | frame age {age_text} | "
+            f"failed reads {stats['failed_reads']}")
+
+def update_camera_stats():
+    """Refresh the capture statistics under each camera preview"""
+    if not camera_running:
+        return
+    
+    for camera, label in ((gate_camera, camera_stats_label1), (door_camera, camera_stats_label2)):
+        if camera is not None:
+            try:
+                label.configure(text=format_camera_stats(camera))
+            except Exception as e:
+                label.configure(text=f"Stats unavailable: {str(e)}")
+    
+    camera_stats_label1.after(1000, update_camera_stats)
+
 def initialize_cameras():
     """Initialize camera managers"""
     global gate_camera, door_camera
     
     try:
-        # Initialize gate camera (index 1)
-        gate_camera = CameraManager.get_instance(1)
+        # Initialize gate camera (index 1), shared with the capture daemon if one is running
+        gate_camera = open_camera(1)
         gate_camera.acquire()
         
         # Try to initialize door camera (index 2)
         try:
-            door_camera = CameraManager.get_instance(2)
+            door_camera = open_camera(2)
             door_camera.acquire()
         except Exception as e:
             print(f"Door camera initialization failed: {e}")
@@ -363,6 +405,7 @@ def initialize_cameras():
         # Start camera update loops
         update_gate_camera()
         update_door_camera()
+        update_camera_stats()
         
         print("Cameras initialized successfully")
     except Exception as e:
@@ -399,14 +442,40 @@ def StartNow():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def start_training():
+    """Update the face encodings in the background so the GUI stays responsive."""
+    global training_thread, training_pending
+    with training_lock:
+        training_pending = True
+        if training_thread is not None and training_thread.is_alive():
+            return
+        training_thread = threading.Thread(target=training_loop, daemon=True)
+        training_thread.start()
+
+def training_loop():
+    global training_pending
+    while True:
+        with training_lock:
+            if not training_pending:
+                return
+            training_pending = False
+        try:
+            counts = train(dataset_folder=os.path.join(project_folder, "face_rec_dataset"),
+                           models_folder=os.path.join(project_folder, "models"),
+                           progress=lambda done, total: print(f"[TRAINING] Encoded {done}/{total} images"))
+            message = (f"Face model updated: {counts['recomputed']} images encoded, "
+                       f"{counts['reused']} reused.")
+        except Exception as e:
+            print(f"[TRAINING] Failed to update face model: {e}")
+            message = f"Face model update failed: {str(e)}"
+        # Tk widgets may only be touched from the GUI thread
+        root.after(0, open_popup, message)
+
 def Confirm():
     """Trains the face recognition model and adds user to the database as authorized."""
     try:
         # Get list of folders in face_rec_dataset directory (each folder is a user)
-        dataset_folder = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "face_rec_dataset"
-        )
+        dataset_folder = os.path.join(project_folder, "face_rec_dataset")
         
         if not os.path.exists(dataset_folder):
             open_popup("No users found. Please add a user first.")
@@ -433,14 +502,8 @@ def Confirm():
             print(f"Failed to add user to database: {str(e)}")
         
         # Start face recognition model training
-        script_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "util",
-            "face_rec_model_training.py"
-        )
-        print(f"Attempting to run: {script_path}")
-        subprocess.Popen([sys.executable, script_path])
-        print("face_rec_model_training.py started.")
+        start_training()
+        print("Face model training started.")
         
         # Show confirmation popup
         open_popup(f"User {username} has been confirmed and added as authorized.")
@@ -491,12 +554,7 @@ def remove_user():
             shutil.rmtree(dataset_folder)
             
         # 3. Retrain the model (after deleting a user)
-        script_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "util",
-            "face_rec_model_training.py"
-        )
-        subprocess.Popen([sys.executable, script_path])
+        start_training()
         
         # 4. Update the listbox
         refresh_user_list()
@@ -522,127 +580,145 @@ def on_closing():
     root.destroy()
     sys.exit(0)  # Exit with success code
 
-# Set up UI appearance
-customtkinter.set_appearance_mode("dark")
-customtkinter.set_default_color_theme("blue")
+def build_gui():
+    """Create the dashboard window and its widgets"""
+    global root, camera_label1, camera_label2, camera_stats_label1, camera_stats_label2, user_listbox
+
+    # Set up UI appearance
+    customtkinter.set_appearance_mode("dark")
+    customtkinter.set_default_color_theme("blue")
+
+    # Create main window
+    root = customtkinter.CTk()
+    root.geometry("1200x700")
+    root.title("Security System Dashboard")
+    root.resizable(False, False)
+    root.protocol("WM_DELETE_WINDOW", on_closing)  # Handle window closing
+
+    # Main frames
+    Mainframe1 = customtkinter.CTkFrame(root, width=1200, height=600)
+    Mainframe1.pack(fill="both", expand=True)
+
+    frame1 = customtkinter.CTkFrame(Mainframe1, width=600, height=600)
+    frame1.pack(side='left', fill='both', padx=(20,10), pady=20, expand=True)
+
+    frame2 = customtkinter.CTkFrame(Mainframe1, width=600, height=600)
+    frame2.pack(side='right', fill='both', padx=(10,20), pady=20, expand=True)
 
-# Create main window
-root = customtkinter.CTk()
-root.geometry("1200x700")
-root.title("Security System Dashboard")
-root.resizable(False, False)
-root.protocol("WM_DELETE_WINDOW", on_closing)  # Handle window closing
+    # Tab section for cameras
+    tab = customtkinter.CTkTabview(frame2)
+    tab.pack(fill="both", expand=True)
 
-# Main frames
-Mainframe1 = customtkinter.CTkFrame(root, width=1200, height=600)
-Mainframe1.pack(fill="both", expand=True)
+    tab1 = tab.add("Gate Camera")
+    tab2 = tab.add("Door Camera")
 
-frame1 = customtkinter.CTkFrame(Mainframe1, width=600, height=600)
-frame1.pack(side='left', fill='both', padx=(20,10), pady=20, expand=True)
+    Title1 = customtkinter.CTkLabel(tab1, text='Gate Camera | LIVE', font=('', 25, 'bold'))
+    Title1.pack(pady=25, padx=40)
 
-frame2 = customtkinter.CTkFrame(Mainframe1, width=600, height=600)
-frame2.pack(side='right', fill='both', padx=(10,20), pady=20, expand=True)
+    Title2 = customtkinter.CTkLabel(tab2, text='Door Camera | LIVE', font=('', 25, 'bold'))
+    Title2.pack(pady=25, padx=40)
 
-# Tab section for cameras
-tab = customtkinter.CTkTabview(frame2)
-tab.pack(fill="both", expand=True)
+    # Camera frames
+    frame3 = customtkinter.CTkFrame(tab1, width=550, height=450)
+    frame3.pack(fill='both', padx=(10,10), pady=(0, 20), expand=True)
 
-tab1 = tab.add("Gate Camera")
-tab2 = tab.add("Door Camera")
+    camera_label1 = customtkinter.CTkLabel(frame3, text="Initializing camera...")
+    camera_label1.pack(fill="both", expand=True)
 
-Title1 = customtkinter.CTkLabel(tab1, text='Gate Camera | LIVE', font=('', 25, 'bold'))
-Title1.pack(pady=25, padx=40)
+    camera_stats_label1 = customtkinter.CTkLabel(frame3, text="", font=('', 12))
+    camera_stats_label1.pack(pady=(0, 5))
 
-Title2 = customtkinter.CTkLabel(tab2, text='Door Camera | LIVE', font=('', 25, 'bold'))
-Title2.pack(pady=25, padx=40)
+    frame3_1 = customtkinter.CTkFrame(tab2, width=550, height=450)
+    frame3_1.pack(fill='both', padx=(10,10), pady=(0, 20), expand=True)
 
-# Camera frames
-frame3 = customtkinter.CTkFrame(tab1, width=550, height=450)
-frame3.pack(fill='both', padx=(10,10), pady=(0, 20), expand=True)
+    camera_label2 = customtkinter.CTkLabel(frame3_1, text="Initializing camera...")
+    camera_label2.pack(fill="both", expand=True)
 
-camera_label1 = customtkinter.CTkLabel(frame3, text="Initializing camera...")
-camera_label1.pack(fill="both", expand=True)
+    camera_stats_label2 = customtkinter.CTkLabel(frame3_1, text="", font=('', 12))
+    camera_stats_label2.pack(pady=(0, 5))
 
-frame3_1 = customtkinter.CTkFrame(tab2, width=550, height=450)
-frame3_1.pack(fill='both', padx=(10,10), pady=(0, 20), expand=True)
+    # Dashboard section
+    Dash = customtkinter.CTkLabel(frame1, text='Dashboard', font=('', 30, 'bold'))
+    Dash.pack(pady=25, padx=50)
 
-camera_label2 = customtkinter.CTkLabel(frame3_1, text="Initializing camera...")
-camera_label2.pack(fill="both", expand=True)
+    frame4 = customtkinter.CTkFrame(frame1, width=600, height=300)
+    frame4.pack(fill="both", padx=(10,10), pady=(10,5), expand=True)
 
-# Dashboard section
-Dash = customtkinter.CTkLabel(frame1, text='Dashboard', font=('', 30, 'bold'))
-Dash.pack(pady=25, padx=50)
+    frame5 = customtkinter.CTkFrame(frame1, width=600, height=200)
+    frame5.pack(fill="both", padx=(10,10), pady=(5,10), expand=True)
 
-frame4 = customtkinter.CTkFrame(frame1, width=600, height=300)
-frame4.pack(fill="both", padx=(10,10), pady=(10,5), expand=True)
+    frame5.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
-frame5 = customtkinter.CTkFrame(frame1, width=600, height=200)
-frame5.pack(fill="both", padx=(10,10), pady=(5,10), expand=True)
+    SetUp = customtkinter.CTkLabel(frame5, text='Add User', font=('', 20, 'bold'))
+    SetUp.grid(column=0, row=0, pady=(20, 5), padx=5)
 
-frame5.grid_columnconfigure((0, 1, 2, 3), weight=1)
+    Button_Start = customtkinter.CTkButton(frame5, text='Start Now', command=StartNow)
+    Button_Start.grid(column=0, row=1, pady=(5, 10), padx=5)
 
-SetUp = customtkinter.CTkLabel(frame5, text='Add User', font=('', 20, 'bold'))
-SetUp.grid(column=0, row=0, pady=(20, 5), padx=5)
+    SetUp = customtkinter.CTkLabel(frame5, text='Confirm User', font=('', 20, 'bold'))
+    SetUp.grid(column=3, row=0, pady=(20, 5), padx=5)
 
-Button_Start = customtkinter.CTkButton(frame5, text='Start Now', command=StartNow)
-Button_Start.grid(column=0, row=1, pady=(5, 10), padx=5)
+    Button_Start = customtkinter.CTkButton(frame5, text='Confirm', command=Confirm)
+    Button_Start.grid(column=3, row=1, pady=(5, 10), padx=5)
 
-SetUp = customtkinter.CTkLabel(frame5, text='Confirm User', font=('', 20, 'bold'))
-SetUp.grid(column=3, row=0, pady=(20, 5), padx=5)
+    # User Management Section in frame4
+    user_management_label = customtkinter.CTkLabel(frame4, text="User Management", font=('', 20, 'bold'))
+    user_management_label.pack(pady=(15, 10))
 
-Button_Start = customtkinter.CTkButton(frame5, text='Confirm', command=Confirm)
-Button_Start.grid(column=3, row=1, pady=(5, 10), padx=5)
+    user_frame = customtkinter.CTkFrame(frame4)
+    user_frame.pack(fill="both", padx=20, pady=10, expand=True)
 
-# User Management Section in frame4
-user_management_label = customtkinter.CTkLabel(frame4, text="User Management", font=('', 20, 'bold'))
-user_management_label.pack(pady=(15, 10))
+    # Create a scrollable listbox for users
+    user_list_frame = customtkinter.CTkFrame(user_frame)
+    user_list_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
 
-user_frame = customtkinter.CTkFrame(frame4)
-user_frame.pack(fill="both", padx=20, pady=10, expand=True)
+    user_list_label = customtkinter.CTkLabel(user_list_frame, text="Registered Users:", font=('', 16))
+    user_list_label.pack(pady=(5, 5), anchor="w")
 
-# Create a scrollable listbox for users
-user_list_frame = customtkinter.CTkFrame(user_frame)
-user_list_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+    # Create a special scrollable frame for the listbox since CTk doesn't have a listbox
+    listbox_frame = Frame(user_list_frame, bg="#2b2b2b")
+    listbox_frame.pack(fill="both", expand=True)
 
-user_list_label = customtkinter.CTkLabel(user_list_frame, text="Registered Users:", font=('', 16))
-user_list_label.pack(pady=(5, 5), anchor="w")
+    scrollbar = Scrollbar(listbox_frame)
+    scrollbar.pack(side=RIGHT, fill=Y)
 
-# Create a special scrollable frame for the listbox since CTk doesn't have a listbox
-listbox_frame = Frame(user_list_frame, bg="#2b2b2b")
-listbox_frame.pack(fill="both", expand=True)
+    user_listbox = Listbox(listbox_frame, yscrollcommand=scrollbar.set, 
+                          bg="#2b2b2b", fg="white", selectbackground="#1f538d",
+                          font=('', 12), relief="flat", borderwidth=0)
+    user_listbox.pack(side=LEFT, fill=BOTH, expand=True)
+    scrollbar.config(command=user_listbox.yview)
 
-scrollbar = Scrollbar(listbox_frame)
-scrollbar.pack(side=RIGHT, fill=Y)
+    # Buttons for user management
+    button_frame = customtkinter.CTkFrame(user_frame)
+    button_frame.pack(side="right", fill="y", padx=10, pady=10)
 
-user_listbox = Listbox(listbox_frame, yscrollcommand=scrollbar.set, 
-                      bg="#2b2b2b", fg="white", selectbackground="#1f538d",
-                      font=('', 12), relief="flat", borderwidth=0)
-user_listbox.pack(side=LEFT, fill=BOTH, expand=True)
-scrollbar.config(command=user_listbox.yview)
+    delete_button = customtkinter.CTkButton(button_frame, text="Delete User", 
+                                           command=remove_user, 
+                                           fg_color="#E74C3C")
+    delete_button.pack(padx=10, pady=10)
 
-# Buttons for user management
-button_frame = customtkinter.CTkFrame(user_frame)
-button_frame.pack(side="right", fill="y", padx=10, pady=10)
+    refresh_button = customtkinter.CTkButton(button_frame, text="Refresh List", 
+                                            command=refresh_user_list)
+    refresh_button.pack(padx=10, pady=10)
 
-delete_button = customtkinter.CTkButton(button_frame, text="Delete User", 
-                                       command=remove_user, 
-                                       fg_color="#E74C3C")
-delete_button.pack(padx=10, pady=10)
+    # Add Access Logs button
+    logs_button = customtkinter.CTkButton(button_frame, text="Access Logs", 
+                                         command=open_logs_window)
+    logs_button.pack(padx=10, pady=10)
 
-refresh_button = customtkinter.CTkButton(button_frame, text="Refresh List", 
-                                        command=refresh_user_list)
-refresh_button.pack(padx=10, pady=10)
+def main():
+    build_gui()
 
-# Add Access Logs button
-logs_button = customtkinter.CTkButton(button_frame, text="Access Logs", 
-                                     command=open_logs_window)
-logs_button.pack(padx=10, pady=10)
+    # Load users initially
+    refresh_user_list()
 
-# Load users initially
-refresh_user_list()
+    # Initialize cameras after UI setup
+    # initialize_cameras()
 
-# Initialize cameras after UI setup
-# initialize_cameras()
+    # Start the main loop
+    root.mainloop()
 
-# Start the main loop
-root.mainloop()
\ No newline at end of file
+# Training uses a spawn process pool, whose workers import this module again:
+# the window must only be built when run as a script
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from datetime import datetime, timedelta
+import functools
+import os
 import threading
 import time
-from auth.face_authenticator import FaceAuthenticator
+from auth.face_authenticator import FaceAuthenticator, NON_IDENTITY_RESULTS
+from camera.clip_recorder import ClipRecorder
 from mqtt.mqtt_service import MQTTService
 from db.db_service import DatabaseService, get_pins
 
@@ -10,7 +13,8 @@ class DoorLockHandler:
         self.is_locked = True
         self.unlock_time = None
         self.unlock_duration = 300  # 5 minutes for face auth 
-        self.auth = FaceAuthenticator()
+        # RECOGNITION_WORKERS > 0 spreads detection and encoding over that many processes
+        self.auth = FaceAuthenticator(workers=int(os.getenv("RECOGNITION_WORKERS", 0)), hot_reload=True)
         self.auth_thread = None
         self.running = False
         self.last_locked_time = None
@@ -19,6 +23,17 @@ class DoorLockHandler:
         self.mqtt = MQTTService()
         self.db = DatabaseService()
 
+        # Face authentication pauses while the camera is reconnecting, PIN unlock keeps working
+        self.camera_connected = bool(self.auth.camera.is_connected)
+        self.auth.camera.add_status_listener(self._on_camera_status)
+
+        # Keeps the last seconds of the door camera to save a clip around each alert
+        self.clip_recorder = None
+        if os.getenv("CLIP_RECORDING", "1") == "1":
+            self.clip_recorder = ClipRecorder(self.auth.camera,
+                                              pre_roll=float(os.getenv("CLIP_PRE_ROLL", 5)),
+                                              post_roll=float(os.getenv("CLIP_POST_ROLL", 5)))
+
         # Load authorized pins from 
         self.valid_pins = []
         try:
@@ -69,15 +84,31 @@ class DoorLockHandler:
             return True
         return False
 
+    def _on_camera_status(self, camera_index, connected):
+        """Handle the door camera dropping out or coming back."""
+        self.camera_connected = connected
+        if connected:
+            print("[DOOR] Camera reconnected, face authentication resumed")
+        else:
+            print("[DOOR] Camera disconnected, face authentication paused (PIN unlock still available)")
+        self.mqtt.publish_camera_state("Front Door Camera", "online" if connected else "offline")
+
     def _face_auth_loop(self):
         """Background face authentication loop"""
         last_detection_time = 0
         last_alert_time = 0
         while self.running:
+            if not self.camera_connected:
+                # Nothing to authenticate until the camera manager reopens the device
+                self.check_status()
+                time.sleep(0.5)
+                continue
+
+            # Blocks until the camera publishes a frame newer than the last one checked
             name, authorized = self.auth.check_authentication()
             current_time = time.time()
             
-            if name != "No face detected" and (current_time - last_detection_time) >= 1:
+            if name not in NON_IDENTITY_RESULTS and (current_time - last_detection_time) >= 1:
                 # Check cooldown period before unlocking
                 if authorized and self.is_locked:
                     if self.last_locked_time is None or \
@@ -90,21 +121,28 @@ class DoorLockHandler:
                     # Wait 5 minutes before sending another alert
                     if name != "Unauthorized" and (current_time - last_alert_time) >= 300:  # 5 minutes cooldown
                         print(f"[FACE] Unauthorized access detected: {name}")
+                        # Start the clip first, its pre-roll ends now
+                        clip = self.clip_recorder.trigger() if self.clip_recorder else None
                         frame = self.auth.camera.get_frame()
                         if frame is not None:
-                            self.db.log_access(name, authorized, frame=frame)
+                            # Copy out of the camera ring buffer, the upload outlives the slot
+                            log_id = self.db.log_access(name, authorized, frame=frame.copy())
                         else:
                             print("[FACE] Failed to capture frame for alert")
-                            self.db.log_access(name, authorized)
+                            log_id = self.db.log_access(name, authorized)
+                        if clip is not None:
+                            # Linked from the writer thread once the clip is on disk
+                            clip.when_saved(functools.partial(self.db.link_clip, log_id))
                         last_alert_time = current_time
                 last_detection_time = current_time
             
             self.check_status()
-            time.sleep(0.1)
 
     def start(self):
         """Start the door control system"""
         self.running = True
+        if self.clip_recorder:
+            self.clip_recorder.start()
         self.auth_thread = threading.Thread(target=self._face_auth_loop)
         self.auth_thread.start()
         print("Door Control System Ready")
@@ -120,6 +158,22 @@ class DoorLockHandler:
                     status = "locked" if self.is_locked else "unlocked"
                     unlock_method = " (by PIN)" if self.unlocked_by_pin else ""
                     print(f"[DOOR] Status: {status}{unlock_method}")
+                    if not self.camera_connected:
+                        print("[DOOR] Camera disconnected, only PIN unlock available")
+                    stats = self.auth.get_stats()
+                    print(f"[FACE] Frames checked: {stats['frames_checked']}, "
+                          f"skipped without motion: {stats['frames_skipped_no_motion']}")
+                    print(f"[FACE] Encodings computed: {stats['encodings_computed']}, "
+                          f"reused from tracks: {stats['encodings_reused']}")
+                    print(f"[FACE] Faces rejected for quality: {stats['faces_rejected_quality']}")
+                    if stats["identity_cache"]:
+                        print(f"[FACE] Identity cache hit rate: {stats['identity_cache']['hit_rate']:.0%} "
+                              f"({stats['identity_cache']['hits']} hits)")
+                    if stats["engine"]:
+                        for worker_id, worker in enumerate(stats["engine"]["per_worker"]):
+                            print(f"[FACE] Worker {worker_id}: {worker['frames']} frames, "
+                                  f"{worker['throughput_fps']:.1f} fps, "
+                                  f"mean {worker['latency']['mean_ms']:.0f} ms")
                 elif command == "lock":
                     self.lock()
                 elif command.startswith("pin "):
@@ -136,6 +190,8 @@ class DoorLockHandler:
         self.running = False
         if self.auth_thread:
             self.auth_thread.join()
+        if self.clip_recorder:
+            self.clip_recorder.stop()
         self.auth.cleanup()
         print("\nDoor control system stopped")
 
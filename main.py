@@ -3,6 +3,7 @@ import time
 import subprocess
 from handlers.door_lock_handler import DoorLockHandler
 from camera.video_stream import start_stream_thread, stop_stream
+from camera.frame_bus import FrameBusServer
 from db.firebase_service import FirebaseService
 import tkinter as tk
 
@@ -10,11 +11,12 @@ import tkinter as tk
 door_lock_handler = None
 firebase = None
 video_stream_thread = None
+frame_bus_server = None
 services_running = False
 
 def start_services():
     """Start all background security services"""
-    global door_lock_handler, firebase, video_stream_thread, services_running
+    global door_lock_handler, firebase, video_stream_thread, frame_bus_server, services_running
     
     if services_running:
         print("Services already running")
@@ -31,6 +33,14 @@ def start_services():
     # Start the video stream in a thread
     video_stream_thread = start_stream_thread()
     
+    # Publish the camera on the shared memory frame bus for the GUI processes
+    try:
+        frame_bus_server = FrameBusServer(0)
+        frame_bus_server.start()
+    except FileExistsError as e:
+        # A capture daemon already publishes it
+        print(f"[BUS] {e}")
+    
     # Start the door lock handler
     door_lock_handler.start()
     
@@ -38,7 +48,7 @@ def start_services():
 
 def stop_services():
     """Stop all running services"""
-    global door_lock_handler, firebase, services_running
+    global door_lock_handler, firebase, frame_bus_server, services_running
     
     if not services_running:
         return
@@ -52,6 +62,11 @@ def stop_services():
     # Stop video stream
     stop_stream()
     
+    # Stop publishing frames to other processes
+    if frame_bus_server:
+        frame_bus_server.stop()
+        frame_bus_server = None
+    
     # Clean up Firebase
     if firebase:
         firebase.cleanup()
@@ -63,6 +63,20 @@ class MQTTService:
             print(f"[MQTT] Failed to publish door command: {str(e)}")
             return False
 
+    def publish_camera_state(self, name, state):
+        """Publish whether a camera is online or offline."""
+        try:
+            payload = {
+                "name": name,
+                "state": state
+            }
+            self.client.publish("central_main/status", json.dumps(payload))
+            print(f"[MQTT] Camera state '{state}' sent for {name}.")
+            return True
+        except Exception as e:
+            print(f"[MQTT] Failed to publish camera state: {str(e)}")
+            return False
+
     def disconnect(self):
         """Stop the MQTT loop and disconnect from broker."""
         self.client.loop_stop()
@@ -8,6 +8,8 @@ import re
 import threading
 import queue
 from concurrent.futures import ThreadPoolExecutor
+from camera.frame_bus import open_camera
+from camera.frame_cache import to_gray
 
 # Configure paths
 PLATE_FOLDER = "plate/"
@@ -41,10 +43,11 @@ class LicensePlateRecognizer:
             raise Exception("Failed to load Haar Cascade classifier")
         self.last_capture_time = 0
 
-    def detect_license_plate(self, frame):
+    def detect_license_plate(self, frame, gray=None):
         """Detect license plate using Haar Cascade"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Convert to grayscale, unless a shared grayscale frame was passed in
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
         # Detect plates with adjusted parameters
         plates = self.plate_cascade.detectMultiScale(
@@ -69,10 +72,10 @@ class LicensePlateRecognizer:
 
         return vehicle_path, plate_path
 
-    def process_frame(self, frame):
+    def process_frame(self, frame, gray=None):
         """Process a single frame for license plate recognition"""
         # Detect license plates
-        plates = self.detect_license_plate(frame)
+        plates = self.detect_license_plate(frame, gray)
 
         for (x, y, w, h) in plates:
             # Draw rectangle around plate
@@ -90,31 +93,38 @@ class LicensePlateRecognizer:
 
     def license_plate_recognition(self):
         """Main function to run license plate recognition"""
-        # Open video capture
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        # Share the camera with the capture daemon instead of opening the device again
+        camera = open_camera(0)
+        camera.acquire()
+        if camera.wait_for_frame(0, timeout=2.0) is None:
             print("Error: Could not open video capture")
+            camera.release()
             return
 
+        last_sequence = 0
+        waiting = False
         try:
             while running:
+                latest = camera.wait_for_frame(last_sequence, timeout=1.0, consumer="plate")
+                if latest is None:
+                    # The camera may be reconnecting, keep waiting until stopped
+                    if not waiting:
+                        print("Warning: No frames from the camera, waiting for it to reconnect")
+                        waiting = True
+                    continue
+                waiting = False
+                last_sequence = latest.sequence
+
                 current_time = time.time()
                 if current_time - self.last_capture_time >= CAPTURE_INTERVAL:
-                    ret, frame = cap.read()
-                    if not ret:
-                        print("Error: Could not read frame")
-                        break
-
-                # Process frame
-                    processed_frame = self.process_frame(frame)
+                    # Process frame (copied, detections are drawn onto it)
+                    processed_frame = self.process_frame(latest.image.copy(),
+                                                         camera.get_derived(latest, to_gray))
                     self.last_capture_time = current_time
                 else:
-                    # Still read frame to keep video smooth, but don't process
-                    ret, frame = cap.read()
-                    if not ret:
-                        print("Error: Could not read frame")
-                        break
-                    processed_frame = frame
+                    # Still show the frame to keep video smooth, but don't process. Copied,
+                    # the view is only valid for a few captures and the window keeps it
+                    processed_frame = latest.image.copy()
                 # Display result
 
                 cv2.imshow('License Plate Recognition', processed_frame)
@@ -124,7 +134,7 @@ class LicensePlateRecognizer:
                     stop_queue.put("stop")
                     break
         finally:
-            cap.release()
+            camera.release()
             cv2.destroyAllWindows()
 
     def calculate_sharpness(self, image_path):
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+from camera import async_stream
+from camera.async_stream import AsyncFrameFeed
+from camera.jpeg_encoder import EncodedFrame
+
+
+def test_feed_wakes_clients_from_the_encoder_thread():
+    async def run():
+        encoder = MagicMock()
+        encoder.latest = None
+        feed = AsyncFrameFeed(encoder, asyncio.get_running_loop())
+        on_frame = encoder.add_listener.call_args[0][0]
+
+        waiters = [asyncio.ensure_future(feed.wait_for_frame(0, timeout=1.0)) for _ in range(3)]
+        await asyncio.sleep(0)
+        publisher = threading.Thread(target=on_frame, args=(EncodedFrame(1, 0.0, b"jpeg-1"),))
+        publisher.start()
+        frames = await asyncio.gather(*waiters)
+        publisher.join()
+        assert [frame.jpeg for frame in frames] == [b"jpeg-1"] * 3
+
+        # Nothing newer yet
+        assert await feed.wait_for_frame(1, timeout=0.05) is None
+        feed.close()
+        encoder.remove_listener.assert_called_once_with(on_frame)
+
+    asyncio.run(run())
+
+
+def test_slow_client_skips_to_the_newest_frame():
+    async def run():
+        encoder = MagicMock()
+        encoder.latest = None
+        feed = AsyncFrameFeed(encoder, asyncio.get_running_loop())
+        # Frames published while the client was busy writing
+        for sequence in range(1, 4):
+            feed._publish(EncodedFrame(sequence, 0.0, f"jpeg-{sequence}".encode()))
+        frame = await feed.wait_for_frame(0, timeout=1.0)
+        assert frame.sequence == 3
+
+    asyncio.run(run())
+
+
+def test_run_without_aiohttp_falls_back():
+    with patch.object(async_stream, "web", None):
+        assert async_stream.run_async_stream("127.0.0.1", 5000) is False
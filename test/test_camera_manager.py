@@ -1,7 +1,11 @@
+import threading
+import time
+import numpy as np
 from unittest.mock import patch, MagicMock
 from camera.camera_manager import CameraManager
+from camera.frame_source import SyntheticSource
 
-@patch("camera.camera_manager.cv2.VideoCapture")
+@patch("camera.frame_source.cv2.VideoCapture")
 def test_get_instance_returns_singleton(mock_video_capture):
     mock_cam = MagicMock()
     mock_video_capture.return_value = mock_cam
@@ -13,7 +17,7 @@ def test_get_instance_returns_singleton(mock_video_capture):
 
     assert cam1 is cam2  # Singleton
 
-@patch("camera.camera_manager.cv2.VideoCapture")
+@patch("camera.frame_source.cv2.VideoCapture")
 def test_acquire_and_release(mock_video_capture):
     mock_cam = MagicMock()
     mock_video_capture.return_value = mock_cam
@@ -34,7 +38,7 @@ def test_acquire_and_release(mock_video_capture):
     ref4 = cam.release()
     assert ref4 == 0
 
-@patch("camera.camera_manager.cv2.VideoCapture")
+@patch("camera.frame_source.cv2.VideoCapture")
 def test_get_frame(mock_video_capture):
     mock_cam = MagicMock()
     mock_video_capture.return_value = mock_cam
@@ -49,3 +53,150 @@ def test_get_frame(mock_video_capture):
 
     result_frame = cam.get_frame()
     assert result_frame is not None
+
+def _fake_read(out=None):
+    """Simulate a camera decoding straight into the provided buffer."""
+    time.sleep(0.005)
+    out[:] = 7
+    return True, out
+
+@patch("camera.frame_source.cv2.VideoCapture")
+def test_frames_are_zero_copy_with_sequence_numbers(mock_video_capture):
+    mock_cam = MagicMock()
+    mock_video_capture.return_value = mock_cam
+    mock_cam.isOpened.return_value = True
+    mock_cam.read.side_effect = _fake_read
+
+    cam = CameraManager(3)
+    try:
+        deadline = time.time() + 2
+        while cam.sequence < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        latest = cam.get_latest()
+        assert latest is not None
+        assert latest.sequence >= 2
+        assert latest.timestamp > 0
+        assert not latest.image.flags.writeable
+        assert any(np.shares_memory(latest.image, slot) for slot in cam._ring)
+        assert cam.is_frame_valid(latest)
+
+        newer = cam.get_frame_after(latest.sequence - 1)
+        assert newer is not None and newer.sequence >= latest.sequence
+        assert cam.get_frame_after(cam.sequence + 1) is None
+    finally:
+        cam._release_resources()
+
+@patch("camera.frame_source.cv2.VideoCapture")
+def test_wait_for_frame_wakes_on_publish(mock_video_capture):
+    mock_cam = MagicMock()
+    mock_video_capture.return_value = mock_cam
+    mock_cam.isOpened.return_value = False  # Camera never opens, frames are published by hand
+
+    cam = CameraManager(4)
+    assert cam.wait_for_frame(0, timeout=0.05) is None
+
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    publisher = threading.Timer(0.05, cam._publish, args=(0, image, time.time()))
+    publisher.start()
+
+    frame = cam.wait_for_frame(0, timeout=2)
+    assert frame is not None
+    assert frame.sequence == 1
+
+    # Releasing the camera wakes up blocked consumers and ends subscriptions
+    threading.Timer(0.05, cam._release_resources).start()
+    assert cam.wait_for_frame(frame.sequence, timeout=2) is None
+    assert list(cam.frames(frame.sequence)) == []
+
+def test_stats_snapshot_tracks_capture_and_consumers():
+    cam = CameraManager(5, source=SyntheticSource(fps=200))
+    try:
+        sequence = 0
+        for _ in range(5):
+            frame = cam.wait_for_frame(sequence, timeout=1, consumer="door")
+            sequence = frame.sequence
+        cam.get_latest(consumer="stream")
+        time.sleep(0.05)
+
+        stats = cam.get_stats()
+        assert stats["frames_captured"] >= 5
+        assert stats["failed_reads"] == 0
+        assert stats["capture_fps"] > 0
+        assert stats["read_latency"]["count"] >= 5
+        assert stats["consumers"]["door"]["frames"] == 5
+        assert stats["consumers"]["stream"]["frame_age"]["count"] == 1
+    finally:
+        cam._release_resources()
+
+class _FlakySource(SyntheticSource):
+    """Synthetic camera that fails to open until told otherwise and can be unplugged."""
+
+    def __init__(self):
+        super().__init__(fps=200)
+        self.available = False
+
+    def open(self):
+        return self.available and super().open()
+
+    def read(self, out=None):
+        if not self.available:
+            return False, None
+        return super().read(out)
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+@patch.object(CameraManager, "MAX_FAILED_READS", 3)
+@patch.object(CameraManager, "RECONNECT_DELAY", 0.02)
+def test_reconnects_after_failed_open_and_unplug():
+    source = _FlakySource()
+    events = []
+    cam = CameraManager(6, source=source)
+    cam.add_status_listener(lambda index, connected: events.append((index, connected)))
+    try:
+        # The capture thread keeps retrying a camera that is not plugged in
+        assert cam.thread.is_alive()
+        assert _wait_until(lambda: cam.stats.reconnect_attempts >= 2)
+        assert cam.get_latest() is None
+
+        source.available = True
+        frame = cam.wait_for_frame(0, timeout=2)
+        assert frame is not None and not frame.stale
+        assert events == [(6, True)]
+
+        # Unplugged: consumers keep the last good frame, flagged as stale
+        source.available = False
+        assert _wait_until(lambda: not cam.is_connected)
+        last = cam.get_latest()
+        assert last is not None and last.stale
+        assert not cam.is_frame_available()
+        assert events[-1] == (6, False)
+
+        source.available = True
+        assert cam.wait_for_frame(last.sequence, timeout=2) is not None
+        assert events[-1] == (6, True)
+
+        stats = cam.get_stats()
+        assert stats["connected"]
+        assert stats["disconnects"] == 1
+        assert stats["reconnects"] == 2
+    finally:
+        cam._release_resources()
+
+@patch.object(CameraManager, "RECONNECT_DELAY", 0.02)
+def test_get_instance_replaces_released_camera():
+    cam = CameraManager.get_instance(7, source=SyntheticSource(fps=200))
+    cam.acquire()
+    cam.release()
+    assert cam.is_released
+
+    fresh = CameraManager.get_instance(7, source=SyntheticSource(fps=200))
+    try:
+        assert fresh is not cam
+        assert fresh.wait_for_frame(0, timeout=2) is not None
+    finally:
+        fresh._release_resources()
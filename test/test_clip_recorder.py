@@ -0,0 +1,148 @@
+import threading
+import time
+import cv2
+import numpy as np
+from unittest.mock import MagicMock, patch
+import pytest
+from camera.camera_manager import Frame
+from camera.clip_recorder import ClipRecorder
+
+
+def jpeg(value=0):
+    image = np.full((48, 64, 3), value, dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def test_ring_keeps_pre_roll_within_max_bytes():
+    recorder = ClipRecorder(MagicMock(), pre_roll=2.0, max_bytes=1000)
+    for i in range(50):
+        recorder.add(100.0 + i * 0.1, b"x" * 10)
+    stats = recorder.get_stats()
+    assert stats["ring_seconds"] <= 2.0
+    assert stats["ring_frames"] == 21
+
+    # A tighter byte budget wins over the pre-roll
+    for i in range(50, 60):
+        recorder.add(100.0 + i * 0.1, b"x" * 300)
+    assert recorder.get_stats()["ring_bytes"] <= 1000
+
+
+def test_trigger_collects_pre_and_post_roll(tmp_path):
+    recorder = ClipRecorder(MagicMock(), pre_roll=1.0, post_roll=1.0, folder=str(tmp_path))
+    for i in range(20):
+        recorder.add(100.0 + i * 0.1, jpeg(i))
+
+    clip = recorder.trigger(now=102.0)
+    path = clip.path
+    # Later alerts during the post-roll join the same clip
+    assert recorder.trigger(now=102.5) is clip
+    for i in range(20, 35):
+        recorder.add(100.0 + i * 0.1, jpeg(i))
+
+    assert recorder.finished.get_nowait() is clip
+    timestamps = [timestamp for timestamp, _ in clip.frames]
+    assert timestamps[0] >= 100.9 and timestamps[-1] <= 103.0 + 1e-6
+    assert recorder.get_stats()["recording"] is False
+
+    recorder.write(clip)
+    video = cv2.VideoCapture(path)
+    assert int(video.get(cv2.CAP_PROP_FRAME_COUNT)) == len(clip.frames)
+    video.release()
+
+
+def test_clips_are_dropped_when_the_writer_is_behind():
+    recorder = ClipRecorder(MagicMock(), post_roll=0.0, max_pending=1)
+    clips = []
+    for now in (100.0, 101.0):
+        clips.append(recorder.trigger(now=now))
+        recorder.add(now + 0.5, b"x")
+    assert recorder.finished.qsize() == 1
+    assert recorder.get_stats()["clips_dropped"] == 1
+
+    # A dropped clip is never reported as saved
+    saved = MagicMock()
+    clips[1].when_saved(saved)
+    assert clips[1].saved is False
+    saved.assert_not_called()
+
+
+def test_recorder_samples_the_camera_and_writes_on_stop(tmp_path):
+    class FakeCamera:
+        def __init__(self):
+            self.sequence = 0
+            self.ready = threading.Condition()
+
+        def publish(self):
+            with self.ready:
+                self.sequence += 1
+                self.ready.notify_all()
+
+        def wait_for_frame(self, after_sequence=0, timeout=None, consumer=None):
+            with self.ready:
+                self.ready.wait_for(lambda: self.sequence > after_sequence, timeout)
+                if self.sequence <= after_sequence:
+                    return None
+                return Frame(self.sequence, time.time(), None)
+
+        def get_derived(self, frame, transform, *args):
+            return jpeg(frame.sequence)
+
+    camera = FakeCamera()
+    recorder = ClipRecorder(camera, pre_roll=5.0, post_roll=60.0, fps=1000.0, folder=str(tmp_path))
+    recorder.start()
+    for _ in range(5):
+        camera.publish()
+        time.sleep(0.02)
+    clip = recorder.trigger()
+    saved = MagicMock()
+    clip.when_saved(saved)
+    camera.publish()
+    time.sleep(0.05)
+    # Stopping writes the clip with the post-roll recorded so far
+    recorder.stop()
+
+    assert recorder.get_stats()["clips_written"] == 1
+    saved.assert_called_once_with(clip.path)
+    video = cv2.VideoCapture(clip.path)
+    assert int(video.get(cv2.CAP_PROP_FRAME_COUNT)) == 6
+    video.release()
+
+
+def test_failed_write_is_not_reported_as_saved(tmp_path):
+    recorder = ClipRecorder(MagicMock(), post_roll=0.0, folder=str(tmp_path))
+    recorder.write = MagicMock(side_effect=OSError("disk full"))
+    clip = recorder.trigger(now=100.0)
+    saved = MagicMock()
+    clip.when_saved(saved)
+    recorder.add(100.5, b"x")
+    # Run the writer loop on this thread until it reaches the end marker
+    recorder.finished.put(None)
+    recorder._write_clips()
+
+    assert clip.saved is False
+    assert recorder.get_stats()["write_errors"] == 1
+    saved.assert_not_called()
+
+
+def test_write_fails_when_the_writer_cannot_open(tmp_path):
+    recorder = ClipRecorder(MagicMock(), post_roll=0.0, folder=str(tmp_path))
+    clip = recorder.trigger(now=100.0)
+    saved = MagicMock()
+    clip.when_saved(saved)
+    recorder.add(100.5, jpeg())
+    recorder.finished.put(None)
+    with patch("camera.clip_recorder.cv2.VideoWriter") as mock_writer:
+        mock_writer.return_value.isOpened.return_value = False
+        recorder._write_clips()
+
+    assert clip.saved is False
+    assert recorder.get_stats()["write_errors"] == 1
+    saved.assert_not_called()
+
+
+def test_undecodable_frame_fails_the_write(tmp_path):
+    recorder = ClipRecorder(MagicMock(), folder=str(tmp_path))
+    clip = recorder.trigger(now=100.0)
+    clip.frames.append((100.5, b"not a jpeg"))
+    with pytest.raises(Exception, match="decode"):
+        recorder.write(clip)
@@ -194,6 +194,101 @@ class TestDatabaseService(unittest.TestCase):
         self.assertIn("FROM users", args[0])
         self.assertIn("WHERE authorized = 1", args[0])
 
+    @patch('sqlite3.connect')
+    def test_get_users_version(self, mock_connect):
+        """Test reading the users change counter"""
+        # Set up mock connection
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        
+        mock_cursor.fetchone.return_value = (7,)
+        
+        self.assertEqual(self.db.get_users_version(), 7)
+        args = mock_cursor.execute.call_args[0]
+        self.assertIn("FROM change_counters", args[0])
+        self.assertIn("name = 'users'", args[0])
+        mock_conn.close.assert_called_once()
+
+    @patch('sqlite3.connect')
+    def test_link_clip(self, mock_connect):
+        """Test linking a saved clip to the intruder image row of its log"""
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        mock_cursor.rowcount = 1
+
+        self.db.link_clip(3, "./db/intruder_clips/clip.avi")
+
+        args = mock_cursor.execute.call_args[0]
+        self.assertIn("UPDATE intruder_images", args[0])
+        self.assertEqual(args[1], ("./db/intruder_clips/clip.avi", 3))
+        mock_conn.commit.assert_called_once()
+
+    @patch('sqlite3.connect')
+    def test_link_clip_without_image(self, mock_connect):
+        """Test that a clip is linked even when the image upload failed"""
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_connect.return_value = mock_conn
+        mock_cursor.rowcount = 0
+
+        self.db.link_clip(3, "./db/intruder_clips/clip.avi")
+
+        args = mock_cursor.execute.call_args[0]
+        self.assertIn("INSERT INTO intruder_images", args[0])
+        self.assertEqual(args[1], (3, "./db/intruder_clips/clip.avi"))
+
+    @patch('db.db_service.CloudinaryService')
+    def test_clip_path_migration(self, mock_cloudinary_class):
+        """Test that an existing intruder_images table gains the clip_path column"""
+        import tempfile
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            os.chdir(folder)
+            try:
+                os.makedirs('db')
+                conn = sqlite3.connect('./db/security.db')
+                conn.execute("CREATE TABLE intruder_images (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                             "image_path TEXT NOT NULL, log_id INTEGER)")
+                conn.execute("INSERT INTO intruder_images (image_path, log_id) VALUES ('old.jpg', 1)")
+                conn.commit()
+                conn.close()
+
+                DatabaseService()
+                DatabaseService()  # Migrating twice is harmless
+
+                conn = sqlite3.connect('./db/security.db')
+                columns = [column[1] for column in conn.execute("PRAGMA table_info(intruder_images)")]
+                rows = conn.execute("SELECT image_path, clip_path FROM intruder_images").fetchall()
+                conn.close()
+            finally:
+                os.chdir(cwd)
+
+        self.assertIn("clip_path", columns)
+        self.assertEqual(rows, [('old.jpg', None)])
+
+    @patch('db.db_service.CloudinaryService')
+    def test_module_get_users_version_only_queries(self, mock_cloudinary_class):
+        """Test that polling the users version does not initialize a DatabaseService"""
+        import tempfile
+        from db import db_service
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, 'security.db')
+            self.assertEqual(db_service.get_users_version(db_path), 0)  # No database yet
+
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE TABLE change_counters (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("INSERT INTO change_counters VALUES ('users', 4)")
+            conn.commit()
+            conn.close()
+
+            self.assertEqual(db_service.get_users_version(db_path), 4)
+        mock_cloudinary_class.assert_not_called()
+
     @patch('sqlite3.connect')
     def test_get_pins(self, mock_connect):
         """Test getting PIN details"""
@@ -78,3 +78,43 @@ def test_publish_mqtt_on_lock_unlock(handler):
 
     door.lock()
     mqtt_mock.publish_door_state.assert_called_with("lock")
+
+def test_camera_disconnect_pauses_face_auth(handler):
+    door, face_mock, mqtt_mock, db_mock = handler
+
+    face_mock.camera.add_status_listener.assert_called_with(door._on_camera_status)
+
+    door._on_camera_status(0, False)
+    assert not door.camera_connected
+    mqtt_mock.publish_camera_state.assert_called_with("Front Door Camera", "offline")
+
+    # PIN unlock keeps working without the camera
+    assert door.unlock_with_pin("1234")
+
+    door._on_camera_status(0, True)
+    assert door.camera_connected
+    mqtt_mock.publish_camera_state.assert_called_with("Front Door Camera", "online")
+
+def test_unauthorized_alert_links_clip_once_saved(handler):
+    door, face_mock, mqtt_mock, db_mock = handler
+
+    door.clip_recorder = MagicMock()
+    clip = door.clip_recorder.trigger.return_value
+    frame = MagicMock()
+    face_mock.camera.get_frame.return_value = frame
+    db_mock.log_access.return_value = 42
+
+    def stranger():
+        door.running = False  # Run the loop once
+        return ("Stranger", False)
+    face_mock.check_authentication.side_effect = stranger
+    door.running = True
+    door._face_auth_loop()
+
+    door.clip_recorder.trigger.assert_called_once()
+    db_mock.log_access.assert_called_once_with("Stranger", False, frame=frame.copy())
+    # Nothing is linked until the writer has saved the clip
+    db_mock.link_clip.assert_not_called()
+    callback = clip.when_saved.call_args[0][0]
+    callback("./db/intruder_clips/clip.avi")
+    db_mock.link_clip.assert_called_once_with(42, "./db/intruder_clips/clip.avi")
@@ -0,0 +1,85 @@
+import json
+import os
+import pickle
+import numpy as np
+import pytest
+from auth.encodings_store import EncodingsStore, ENCODING_MODEL
+from util.migrate_encodings import migrate
+
+def _encodings(count, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.1, (count, 128))
+
+def test_save_and_load_round_trip(tmp_path):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    encodings = _encodings(4)
+    header = store.save(encodings, ["bob", "alice", "bob", "alice"], ids=["b0", "a0", "b1", "a1"])
+    assert header["count"] == 4
+    assert header["model"] == ENCODING_MODEL
+
+    data = store.load()
+    assert isinstance(data.matrix, np.memmap)
+    assert data.matrix.dtype == np.float32
+    # Rows are grouped by name, ids follow their rows
+    assert data.names == ["alice", "alice", "bob", "bob"]
+    assert data.ids == ["a0", "a1", "b0", "b1"]
+    np.testing.assert_allclose(data.matrix[0], encodings[1], rtol=1e-6)
+    np.testing.assert_allclose(data.matrix[3], encodings[2], rtol=1e-6)
+
+def test_save_replaces_previous_version(tmp_path):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    store.save(_encodings(2), ["a", "b"])
+    first = store.load()
+    old_header = store.read_header()
+    store.save(_encodings(3, seed=1), ["a", "b", "c"])
+
+    assert len(store.load().names) == 3
+    assert first.matrix.shape == (2, 128)
+    # A reader that read the old header just before the save can still open its matrix
+    assert os.path.exists(tmp_path / old_header["data_file"])
+
+    store.save(_encodings(4, seed=2), ["a", "b", "c", "d"])
+    npy_files = [f for f in os.listdir(tmp_path) if f.endswith(".npy")]
+    # The current matrix and the previous one are kept, older ones removed
+    assert len(npy_files) == 2
+    assert old_header["data_file"] not in npy_files
+
+def test_tampered_matrix_is_rejected(tmp_path):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    header = store.save(_encodings(2), ["a", "b"])
+    with open(tmp_path / header["data_file"], "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b"\x00\x00\x80\x7f")
+
+    with pytest.raises(ValueError, match="Checksum"):
+        store.load()
+
+def test_unknown_model_is_rejected(tmp_path):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    header = store.save(_encodings(1), ["a"])
+    header["model"] = "other_network"
+    with open(store.path, "w") as f:
+        json.dump(header, f)
+
+    with pytest.raises(ValueError, match="other_network"):
+        store.load()
+
+def test_empty_store(tmp_path):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    store.save([], [])
+    data = store.load()
+    assert data.matrix.shape == (0, 128)
+    assert data.names == []
+
+def test_migrate_legacy_pickle(tmp_path):
+    pickle_path = tmp_path / "face_rec_encodings.pickle"
+    encodings = list(_encodings(2))
+    with open(pickle_path, "wb") as f:
+        f.write(pickle.dumps({"encodings": encodings, "names": ["a", "b"]}))
+
+    store_path = str(tmp_path / "face_rec_encodings.json")
+    migrate(str(pickle_path), store_path, remove=True)
+
+    data = EncodingsStore(store_path).load()
+    assert data.names == ["a", "b"]
+    np.testing.assert_allclose(data.matrix, np.array(encodings), rtol=1e-6)
+    assert not pickle_path.exists()
@@ -1,25 +1,22 @@
 import pytest
-import builtins
-import pickle
+import numpy as np
 from unittest.mock import patch, MagicMock
-from auth.face_authenticator import FaceAuthenticator
+from auth.encodings_store import StoredEncodings
+from auth.face_authenticator import FaceAuthenticator, LOW_QUALITY, ENGINE_BUSY
 
-# Helper function to mock pickle file content
-def fake_pickle_data():
-    return pickle.dumps({
-        "encodings": [[0.1, 0.2, 0.3]],  # Fake face encoding data
-        "names": ["TestUser"]
-    })
+# Helper function to mock the encodings store content
+def fake_store_data():
+    return StoredEncodings(
+        np.array([[0.1, 0.2, 0.3]], dtype=np.float32),  # Fake face encoding data
+        ["TestUser"], ["TestUser/0"], {})
 
-@patch("builtins.open")
+@patch("auth.face_authenticator.EncodingsStore")
 @patch("auth.face_authenticator.get_authorized_users")
 
 @patch("camera.camera_manager.CameraManager.get_instance")
-def test_face_authenticator_init(mock_camera_instance, mock_get_users, mock_open):
-    # Mock pickle file content
-    fake_file = MagicMock()
-    fake_file.read.return_value = fake_pickle_data()
-    mock_open.return_value.__enter__.return_value = fake_file
+def test_face_authenticator_init(mock_camera_instance, mock_get_users, mock_store):
+    # Mock encodings store content
+    mock_store.return_value.load.return_value = fake_store_data()
 
     # Mock authorized users
     mock_get_users.return_value = ["TestUser"]
@@ -41,3 +38,124 @@ def test_face_authenticator_init(mock_camera_instance, mock_get_users, mock_open
     # Check that the camera is acquired
     mock_camera.acquire.assert_called_once()
 
+
+@patch("auth.face_authenticator.EncodingsStore")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_legacy_pickle_only_names_the_migration(mock_camera_instance, mock_store, tmp_path):
+    legacy = tmp_path / "face_rec_encodings.pickle"
+    legacy.write_bytes(b"legacy")
+    mock_store.return_value.exists.return_value = False
+
+    with patch("auth.face_authenticator.LEGACY_ENCODINGS_PATH", str(legacy)), \
+            pytest.raises(FileNotFoundError, match="util.migrate_encodings"):
+        FaceAuthenticator()
+    mock_store.return_value.load.assert_not_called()
+    mock_camera_instance.assert_not_called()
+
+
+@patch("auth.face_authenticator.EncodingsStore")
+@patch("auth.face_authenticator.get_authorized_users")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_tracked_face_is_not_re_encoded(mock_camera_instance, mock_get_users, mock_store):
+    from camera.camera_manager import Frame
+
+    mock_store.return_value.load.return_value = fake_store_data()
+    mock_get_users.return_value = ["TestUser"]
+
+    frames = iter(Frame(sequence, 0.0, None) for sequence in range(1, 4))
+    mock_camera = MagicMock()
+    mock_camera.wait_for_frame.side_effect = lambda *args, **kwargs: next(frames)
+    mock_camera.get_derived.return_value = np.random.RandomState(0).randint(0, 256, (120, 160, 3), dtype=np.uint8)
+    mock_camera_instance.return_value = mock_camera
+
+    auth = FaceAuthenticator(motion_gating=False)
+    with patch("auth.face_authenticator.face_recognition") as mock_face_recognition, \
+            patch("auth.face_detector.face_recognition", mock_face_recognition):
+        mock_face_recognition.face_locations.return_value = [(10, 50, 50, 10)]
+        mock_face_recognition.face_encodings.return_value = [np.array([0.1, 0.2, 0.3])]
+
+        for _ in range(3):
+            assert auth.check_authentication() == ("TestUser", True)
+
+    # Encoded once for the new track, the identity is reused afterwards
+    assert mock_face_recognition.face_encodings.call_count == 1
+    stats = auth.get_stats()
+    assert stats["encodings_computed"] == 1
+    assert stats["encodings_reused"] == 2
+
+
+@patch("auth.face_authenticator.EncodingsStore")
+@patch("auth.face_authenticator.get_authorized_users")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_low_quality_face_is_not_encoded(mock_camera_instance, mock_get_users, mock_store):
+    from camera.camera_manager import Frame
+
+    mock_store.return_value.load.return_value = fake_store_data()
+    mock_get_users.return_value = ["TestUser"]
+
+    mock_camera = MagicMock()
+    mock_camera.wait_for_frame.return_value = Frame(1, 0.0, None)
+    mock_camera.get_derived.return_value = np.full((120, 160, 3), 10, dtype=np.uint8)  # Dark, flat frame
+    mock_camera_instance.return_value = mock_camera
+
+    auth = FaceAuthenticator(motion_gating=False)
+    with patch("auth.face_authenticator.face_recognition") as mock_face_recognition, \
+            patch("auth.face_detector.face_recognition", mock_face_recognition):
+        mock_face_recognition.face_locations.return_value = [(10, 50, 50, 10)]
+
+        assert auth.check_authentication() == (LOW_QUALITY, False)
+
+    mock_face_recognition.face_encodings.assert_not_called()
+    assert auth.get_stats()["faces_rejected_quality"] == 1
+
+
+@patch("auth.face_authenticator.EncodingsStore")
+@patch("auth.face_authenticator.get_authorized_users")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_repeat_visitor_is_resolved_from_identity_cache(mock_camera_instance, mock_get_users, mock_store):
+    from camera.camera_manager import Frame
+
+    mock_store.return_value.load.return_value = fake_store_data()
+    mock_get_users.return_value = ["TestUser"]
+
+    frames = iter(Frame(sequence, 0.0, None) for sequence in range(1, 3))
+    mock_camera = MagicMock()
+    mock_camera.wait_for_frame.side_effect = lambda *args, **kwargs: next(frames)
+    mock_camera.get_derived.return_value = np.random.RandomState(0).randint(0, 256, (120, 160, 3), dtype=np.uint8)
+    mock_camera_instance.return_value = mock_camera
+
+    auth = FaceAuthenticator(motion_gating=False, tracking=False)
+    auth.gallery.match = MagicMock(wraps=auth.gallery.match)
+    with patch("auth.face_authenticator.face_recognition") as mock_face_recognition, \
+            patch("auth.face_detector.face_recognition", mock_face_recognition):
+        mock_face_recognition.face_locations.return_value = [(10, 50, 50, 10)]
+        mock_face_recognition.face_encodings.return_value = [np.array([0.1, 0.2, 0.3])]
+
+        for _ in range(2):
+            assert auth.check_authentication() == ("TestUser", True)
+
+    auth.gallery.match.assert_called_once()
+    assert auth.get_stats()["identity_cache"]["hits"] == 1
+
+
+@patch("auth.face_authenticator.EncodingsStore")
+@patch("auth.face_authenticator.get_authorized_users")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_frame_rejected_by_busy_engine_is_not_pending(mock_camera_instance, mock_get_users, mock_store):
+    from camera.camera_manager import Frame
+
+    mock_store.return_value.load.return_value = fake_store_data()
+    mock_get_users.return_value = ["TestUser"]
+    mock_camera = MagicMock()
+    mock_camera.wait_for_frame.return_value = Frame(1, 0.0, None)
+    mock_camera_instance.return_value = mock_camera
+
+    auth = FaceAuthenticator(motion_gating=False)
+    # Every slot is held while the workers restart
+    auth.engine = MagicMock(workers=2)
+    auth.engine.submit.return_value = False
+    auth.engine.in_flight.return_value = 0
+    auth.engine.get_result.return_value = None
+
+    assert auth.check_authentication() == (ENGINE_BUSY, False)
+    assert auth.get_stats()["frames_dropped_engine_busy"] == 1
@@ -0,0 +1,70 @@
+import time
+import numpy as np
+import pytest
+from unittest.mock import patch, MagicMock
+from auth.face_detector import FaceDetector, merge_regions, AUTO, CASCADE, HOG
+
+FRAME = np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def make_detector(mode, candidates):
+    """Detector whose Haar stage proposes the given (x, y, w, h) candidates."""
+    with patch("auth.face_detector.cv2.CascadeClassifier", create=True) as mock_cascade_class:
+        mock_cascade = MagicMock()
+        mock_cascade.empty.return_value = False
+        mock_cascade.detectMultiScale.return_value = candidates
+        mock_cascade_class.return_value = mock_cascade
+        return FaceDetector(mode=mode, cascade_path="cascade.xml")
+
+
+def fake_hog(image):
+    """Full frames are slow, a face is found where the candidate (x=60, y=40) is."""
+    if image.shape[0] == FRAME.shape[0]:
+        time.sleep(0.02)
+        return [(40, 100, 80, 60)]
+    return [(20, 60, 60, 20)]  # The padded crop starts 20 px above and left of the candidate
+
+
+def test_merge_regions():
+    regions = merge_regions([(0, 20, 20, 0), (10, 30, 30, 10), (50, 70, 70, 50)])
+    assert sorted(regions) == [(0, 30, 30, 0), (50, 70, 70, 50)]
+
+
+def test_cascade_without_candidates_skips_hog():
+    detector = make_detector(CASCADE, [])
+    with patch("auth.face_detector.face_recognition") as mock_face_recognition:
+        assert detector.detect(FRAME) == []
+    mock_face_recognition.face_locations.assert_not_called()
+
+
+def test_cascade_confirms_candidates_in_crops():
+    detector = make_detector(CASCADE, [(60, 40, 40, 40)])
+    with patch.object(detector, "hog", side_effect=fake_hog) as mock_hog:
+        assert detector.detect(FRAME) == [(40, 100, 80, 60)]
+    # HOG only saw the padded crop around the candidate
+    assert mock_hog.call_args[0][0].shape == (80, 80, 3)
+
+
+def test_auto_switches_to_cascade_when_it_finds_the_faces_faster():
+    detector = make_detector(AUTO, [(60, 40, 40, 40)])
+    with patch.object(detector, "hog", side_effect=fake_hog):
+        detector.detect(FRAME)
+    assert detector.cascade_recall == 1.0
+    assert detector.get_stats()["active"] == CASCADE
+
+
+def test_auto_keeps_hog_when_the_cascade_misses_faces():
+    detector = make_detector(AUTO, [])
+    with patch.object(detector, "hog", side_effect=fake_hog):
+        for _ in range(3):
+            assert detector.detect(FRAME) == [(40, 100, 80, 60)]
+    assert detector.cascade_recall == 0.0
+    assert detector.get_stats()["active"] == HOG
+    assert detector.calibrations == 1
+
+
+def test_missing_cascade_falls_back_to_hog():
+    with patch("auth.face_detector.find_cascade_file", return_value=None):
+        assert FaceDetector(mode=AUTO).mode == HOG
+        with pytest.raises(Exception):
+            FaceDetector(mode=CASCADE)
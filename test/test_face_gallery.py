@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import face_recognition
+from auth.face_gallery import FaceGallery, UNKNOWN
+from auth import gallery_index
+from auth.gallery_index import index_path
+
+def _gallery(seed=0, identities=5, per_identity=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 0.1, (identities, 128))
+    encodings = []
+    names = []
+    for index, center in enumerate(centers):
+        for _ in range(per_identity):
+            encodings.append(center + rng.normal(0, 0.01, 128))
+            names.append(f"user{index}")
+    # Interleave identities to check rows get regrouped correctly
+    order = rng.permutation(len(names))
+    return [encodings[i] for i in order], [names[i] for i in order]
+
+def test_distances_match_face_recognition():
+    encodings, names = _gallery()
+    gallery = FaceGallery(encodings, names)
+    query = encodings[4] + 0.005
+
+    distances = gallery.distances([query])[0]
+    expected = face_recognition.face_distance(np.array(encodings), query)
+    # Gallery rows are grouped by identity, map them back to enrollment order
+    np.testing.assert_allclose(distances[np.argsort(gallery.source_index)], expected, atol=1e-4)
+
+def test_match_returns_identity_distance_and_margin():
+    encodings, names = _gallery()
+    gallery = FaceGallery(encodings, names)
+    assert gallery.matrix.dtype == np.float32
+    assert gallery.matrix.flags.c_contiguous
+
+    queries = [encodings[0], encodings[7], np.full(128, 5.0)]
+    matches = gallery.match(queries)
+
+    assert matches[0].name == names[0]
+    assert matches[0].index == 0
+    assert matches[0].distance < 1e-3
+    assert matches[1].name == names[7]
+
+    # The runner-up is the closest encoding of a different identity
+    expected = face_recognition.face_distance(np.array(encodings), encodings[7])
+    others = [d for d, name in zip(expected, names) if name != names[7]]
+    assert abs(matches[1].margin - (min(others) - matches[1].distance)) < 1e-4
+
+    assert matches[2].name == UNKNOWN
+
+def test_empty_gallery_matches_nothing():
+    gallery = FaceGallery([], [])
+    assert gallery.match([]) == []
+    match = gallery.match([np.zeros(128)])[0]
+    assert match.name == UNKNOWN and match.index == -1
+
+def test_single_identity_has_infinite_margin():
+    gallery = FaceGallery([[0.1, 0.2, 0.3], [0.1, 0.2, 0.31]], ["TestUser", "TestUser"])
+    match = gallery.match([[0.1, 0.2, 0.3]])[0]
+    assert match.name == "TestUser"
+    assert match.margin == float("inf")
+
+def test_approximate_indexes_find_enrolled_faces():
+    encodings, names = _gallery(seed=1, identities=50, per_identity=4)
+    exact = FaceGallery(encodings, names)
+    queries = [encoding + 0.002 for encoding in encodings[::7]]
+    expected = [match.name for match in exact.match(queries)]
+
+    for kind in ("kdtree", "ivf"):
+        gallery = FaceGallery(encodings, names, index=kind)
+        assert [match.name for match in gallery.match(queries)] == expected
+        # Candidates include other identities, so margins are still reported
+        assert all(match.margin > 0 for match in gallery.match(queries))
+
+def test_index_is_persisted_next_to_encodings(tmp_path):
+    encodings, names = _gallery(seed=2, identities=20, per_identity=2)
+    encodings_path = str(tmp_path / "face_rec_encodings.pickle")
+
+    first = FaceGallery(encodings, names, index="ivf", encodings_path=encodings_path)
+    assert os.path.exists(index_path(encodings_path, "ivf"))
+
+    second = FaceGallery(encodings, names, index="ivf", encodings_path=encodings_path)
+    np.testing.assert_array_equal(first.index.centroids, second.index.centroids)
+
+    # A different gallery does not reuse the stale index
+    changed = FaceGallery(encodings[:-2], names[:-2], index="ivf", encodings_path=encodings_path)
+    assert len(changed.index.list_rows) == len(encodings) - 2
+
+def test_pca_search_matches_exact_search():
+    encodings, names = _gallery(seed=3, identities=200, per_identity=4)
+    exact = FaceGallery(encodings, names)
+    gallery = FaceGallery(encodings, names, index="pca")
+    rng = np.random.default_rng(3)
+    queries = [encoding + rng.normal(0, 0.02, 128) for encoding in encodings[::5]] + [np.full(128, 0.3)]
+
+    for expected, match in zip(exact.match(queries), gallery.match(queries)):
+        assert (match.name, match.index) == (expected.name, expected.index)
+        assert abs(match.distance - expected.distance) < 1e-4
+        # Margins agree up to the index margin, larger ones only need to be known as large
+        assert abs(min(match.margin, 0.5) - min(expected.margin, 0.5)) < 1e-4
+
+def test_auto_uses_pca_search_for_large_galleries(monkeypatch):
+    encodings, names = _gallery(seed=4, identities=10, per_identity=2)
+    monkeypatch.setattr(gallery_index, "AUTO_EXACT_LIMIT", 10)
+    assert FaceGallery(encodings, names, index="auto").index.kind == "pca"
+    assert FaceGallery(encodings[:10], names[:10], index="auto").index.kind == "brute"
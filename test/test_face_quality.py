@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+from auth.face_quality import FaceQuality, TOO_SMALL, TOO_DARK, TOO_BRIGHT, LOW_CONTRAST, BLURRY
+
+BOX = (10, 70, 70, 10)
+
+
+def textured_image(low=0, high=256):
+    return np.random.RandomState(0).randint(low, high, (80, 80, 3)).astype(np.uint8)
+
+
+def test_sharp_well_lit_face_is_accepted():
+    assert FaceQuality().check(textured_image(), BOX) is None
+
+
+def test_small_face_is_rejected():
+    assert FaceQuality(min_size=20).check(textured_image(), (10, 25, 25, 10)) == TOO_SMALL
+
+
+def test_badly_lit_faces_are_rejected():
+    quality = FaceQuality()
+    assert quality.check(textured_image(0, 30), BOX) == TOO_DARK
+    assert quality.check(textured_image(230, 256), BOX) == TOO_BRIGHT
+    assert quality.check(textured_image(120, 130), BOX) == LOW_CONTRAST
+
+
+def test_blurred_face_is_rejected():
+    # Large structures keep the contrast, the blur removes the fine detail
+    image = cv2.resize(textured_image()[:8, :8], (80, 80), interpolation=cv2.INTER_LINEAR)
+    blurred = cv2.GaussianBlur(image, (15, 15), 0)
+    assert FaceQuality(min_contrast=5.0).check(blurred, BOX) == BLURRY
+
+
+def test_filter_counts_rejections():
+    quality = FaceQuality()
+    accepted, rejected = quality.filter(textured_image(), [BOX, (10, 15, 15, 10)])
+
+    assert accepted == [BOX]
+    assert rejected == [(10, 15, 15, 10)]
+    assert quality.get_stats() == {"faces_checked": 2, "faces_rejected": 1,
+                                   "rejected_by_reason": {TOO_SMALL: 1}}
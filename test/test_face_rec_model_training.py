@@ -1,7 +1,8 @@
 import unittest
 from unittest import mock
 import os
-import pickle
+import shutil
+import tempfile
 import numpy as np
 import sys
 
@@ -17,17 +18,16 @@ with mock.patch.dict('sys.modules', {
 }):
     from util import face_rec_model_training
 
+from auth.encodings_store import EncodingsStore
+
 class TestFaceRecModelTraining(unittest.TestCase):
     def setUp(self):
         self.test_models_folder = "test_models"
-        self.test_pickle_file = os.path.join(self.test_models_folder, "face_rec_encodings.pickle")
         os.makedirs(self.test_models_folder, exist_ok=True)
 
     def tearDown(self):
-        if os.path.exists(self.test_pickle_file):
-            os.remove(self.test_pickle_file)
         if os.path.exists(self.test_models_folder):
-            os.rmdir(self.test_models_folder)
+            shutil.rmtree(self.test_models_folder)
 
     def test_create_folder_creates_and_returns_path(self):
         folder_name = "test_create_folder"
@@ -41,21 +41,151 @@ class TestFaceRecModelTraining(unittest.TestCase):
         # Cleanup
         os.rmdir(folder_name)
 
-    @mock.patch("builtins.open", new_callable=mock.mock_open)
-    @mock.patch("pickle.dumps")
-    def test_serialization_creates_pickle_file(self, mock_dumps, mock_open_file):
-        data = {"encodings": [np.array([0.1, 0.2])], "names": ["TestUser"]}
-        pickle_path = os.path.join(self.test_models_folder, "face_rec_encodings.pickle")
-
-        # Simulate saving pickle
-        try:
-            with open(pickle_path, "wb") as f:
-                f.write(pickle.dumps(data))
-        except IOError as e:
-            self.fail(f"Serialization raised IOError: {e}")
-
-        mock_dumps.assert_called_once_with(data)
-        mock_open_file.assert_called_once_with(pickle_path, "wb")
+    def test_serialization_creates_header_and_matrix(self):
+        import json
+        from auth.encodings_store import file_checksum
+
+        dataset_folder = os.path.join(self.test_models_folder, "dataset")
+        image_path = os.path.join(dataset_folder, "TestUser", "1.jpg")
+        os.makedirs(os.path.dirname(image_path))
+        with open(image_path, "wb") as f:
+            f.write(b"image")
+        encoding = np.full(128, 0.1)
+
+        with mock.patch.object(face_rec_model_training.paths, "list_images", return_value=[image_path]), \
+             mock.patch.object(face_rec_model_training, "encode_images", return_value={image_path: [encoding]}):
+            face_rec_model_training.train(dataset_folder=dataset_folder, models_folder=self.test_models_folder)
+
+        with open(os.path.join(self.test_models_folder, "face_rec_encodings.json")) as f:
+            header = json.load(f)
+        self.assertEqual(header["names"], ["TestUser"])
+        data_path = os.path.join(self.test_models_folder, header["data_file"])
+        self.assertTrue(data_path.endswith(".npy"))
+        self.assertEqual(file_checksum(data_path), header["sha256"])
+        matrix = np.load(data_path, allow_pickle=False)
+        self.assertEqual((matrix.shape, matrix.dtype), ((1, 128), np.float32))
+        np.testing.assert_allclose(matrix[0], encoding, rtol=1e-6)
+
+class TestIncrementalTraining(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = EncodingsStore(os.path.join(self.folder, "models", "face_rec_encodings.json"))
+        self.manifest_path = os.path.join(self.folder, "models", "face_rec_manifest.json")
+        self.encoded = []
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def add_image(self, name, filename, content):
+        person_folder = os.path.join(self.folder, "dataset", name)
+        os.makedirs(person_folder, exist_ok=True)
+        path = os.path.join(person_folder, filename)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def fake_encode(self, image_path):
+        self.encoded.append(image_path)
+        with open(image_path, "rb") as f:
+            content = f.read()
+        # One face per image, except images containing "noface"
+        return [] if b"noface" in content else [np.full(128, len(content) / 100.0)]
+
+    def train(self, image_paths):
+        self.encoded = []
+        return face_rec_model_training.update_encodings(
+            image_paths, self.store, self.manifest_path, encode=self.fake_encode)
+
+    def test_only_new_or_changed_images_are_encoded(self):
+        alice = self.add_image("Alice", "1.jpg", b"alice-1")
+        bob = self.add_image("Bob", "1.jpg", b"bob-1")
+        empty = self.add_image("Bob", "2.jpg", b"noface")
+
+        counts = self.train([alice, bob, empty])
+        self.assertEqual(counts["recomputed"], 3)
+        self.assertEqual(counts["encodings"], 2)
+
+        # Nothing changed: everything reused, including the image without a face
+        counts = self.train([alice, bob, empty])
+        self.assertEqual(self.encoded, [])
+        self.assertEqual(counts["reused"], 3)
+        self.assertEqual(self.store.load().names, ["Alice", "Bob"])
+
+        # Changed content and a new image are encoded, the rest reused
+        self.add_image("Alice", "1.jpg", b"alice-1-retaken")
+        carol = self.add_image("Carol", "1.jpg", b"carol-1")
+        counts = self.train([alice, bob, empty, carol])
+        self.assertEqual(sorted(self.encoded), sorted([alice, carol]))
+        self.assertEqual((counts["reused"], counts["recomputed"], counts["removed"]), (2, 2, 1))
+
+    def test_deleted_user_is_dropped(self):
+        alice = self.add_image("Alice", "1.jpg", b"alice-1")
+        bob = self.add_image("Bob", "1.jpg", b"bob-1")
+        self.train([alice, bob])
+
+        counts = self.train([alice])
+        self.assertEqual(counts["removed"], 1)
+        self.assertEqual(self.store.load().names, ["Alice"])
+
+    def test_search_basis_is_reused_by_the_gallery(self):
+        from auth.face_gallery import FaceGallery
+        from auth.gallery_index import index_path
+
+        self.train([self.add_image("Alice", "1.jpg", b"alice-1"), self.add_image("Bob", "1.jpg", b"bob-1")])
+        path = face_rec_model_training.save_search_basis(self.store)
+        self.assertEqual(path, index_path(self.store.path, "pca"))
+
+        data = self.store.load()
+        with mock.patch("auth.gallery_index.PCAIndex.build") as mock_build:
+            gallery = FaceGallery(data.matrix, data.names, index="pca", encodings_path=self.store.path)
+        mock_build.assert_not_called()
+        self.assertEqual(gallery.match(data.matrix[:1])[0].name, "Alice")
+
+class TestBatchEncoder(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_image(self, filename, width, height):
+        import cv2
+        path = os.path.join(self.folder, filename)
+        cv2.imwrite(path, np.zeros((height, width, 3), dtype=np.uint8))
+        return path
+
+    def test_large_images_are_downscaled_for_detection(self):
+        import cv2
+        path = self.write_image("large.png", 1600, 1200)
+
+        with mock.patch.object(face_rec_model_training, "cv2", cv2), \
+             mock.patch.object(face_rec_model_training, "face_recognition") as mock_face_recognition:
+            mock_face_recognition.face_locations.return_value = [(10, 60, 60, 10)]
+            mock_face_recognition.face_encodings.return_value = ["encoding"]
+            encodings = face_rec_model_training.encode_image(path, max_side=800)
+
+        self.assertEqual(encodings, ["encoding"])
+        detected_on = mock_face_recognition.face_locations.call_args[0][0]
+        self.assertEqual(detected_on.shape[:2], (600, 800))
+        # Boxes are mapped back to the full resolution image for encoding
+        encoded_on, boxes = mock_face_recognition.face_encodings.call_args[0]
+        self.assertEqual(encoded_on.shape[:2], (1200, 1600))
+        self.assertEqual(boxes, [(20, 120, 120, 20)])
+
+    def test_encode_images_uses_process_pool_and_reports_progress(self):
+        import importlib
+        # The module imported above runs against mocks and is no longer in
+        # sys.modules, pool workers need the importable one
+        training = importlib.import_module("util.face_rec_model_training")
+        image_paths = [self.write_image(f"{i}.png", 64, 48) for i in range(3)]
+        progress = []
+
+        results = training.encode_images(
+            image_paths, workers=2, chunk_size=1, progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(sorted(results), sorted(image_paths))
+        self.assertTrue(all(len(encodings) == 0 for encodings in results.values()))  # Blank images
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,51 @@
+from auth.face_gallery import Match, UNKNOWN
+from auth.face_tracker import FaceTracker, iou
+
+def test_iou():
+    box = (10, 50, 50, 10)
+    assert iou(box, box) == 1.0
+    assert iou(box, (100, 150, 150, 100)) == 0.0
+    assert 0 < iou(box, (20, 60, 60, 20)) < 1
+
+def test_tracks_keep_ids_across_frames():
+    tracker = FaceTracker()
+    first = tracker.update([(10, 50, 50, 10), (10, 150, 50, 110)], now=0)
+    assert first[0].track_id != first[1].track_id
+
+    # Both faces moved a little, the second one too far to overlap
+    second = tracker.update([(12, 52, 52, 12), (10, 185, 50, 145)], now=0.1)
+    assert [track.track_id for track in second] == [track.track_id for track in first]
+
+    # A new face gets a new track
+    third = tracker.update([(12, 52, 52, 12), (200, 300, 300, 200)], now=0.2)
+    assert third[0].track_id == first[0].track_id
+    assert third[1].track_id not in (first[0].track_id, first[1].track_id)
+
+def test_lost_tracks_are_dropped():
+    tracker = FaceTracker(max_misses=2)
+    tracker.update([(10, 50, 50, 10)], now=0)
+    for step in range(3):
+        tracker.update([], now=step + 1)
+    assert tracker.tracks == []
+
+def test_needs_encoding():
+    tracker = FaceTracker(refresh_interval=2.0)
+    track = tracker.update([(10, 50, 50, 10)], now=0)[0]
+    assert tracker.needs_encoding(track, now=0)
+
+    tracker.assign(track, Match("Alice", 0, 0.3, 0.2), now=0)
+    assert not tracker.needs_encoding(track, now=1.0)
+    assert tracker.needs_encoding(track, now=2.5)  # Refresh interval elapsed
+
+    # Ambiguous between two identities, or close to the tolerance
+    tracker.assign(track, Match("Alice", 0, 0.3, 0.02), now=3)
+    assert tracker.needs_encoding(track, now=3.1)
+    tracker.assign(track, Match(UNKNOWN, 0, 0.62, 0.3), now=4)
+    assert tracker.needs_encoding(track, now=4.1)
+    tracker.assign(track, Match(UNKNOWN, 0, 0.9, 0.01), now=5)
+    assert not tracker.needs_encoding(track, now=5.1)
+
+def test_search_regions_are_padded_and_clipped():
+    tracker = FaceTracker(search_padding=0.5)
+    tracker.update([(10, 50, 50, 10)], now=0)
+    assert tracker.search_regions((120, 160, 3)) == [(0, 70, 70, 0)]
@@ -0,0 +1,109 @@
+import sys
+import os
+import time
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from camera.camera_manager import Frame
+from camera.frame_bus import FrameBusWriter, FrameBusReader, SharedCameraClient, open_camera
+
+TEST_CAMERA_INDEX = 97
+
+def test_reader_gets_zero_copy_views_of_published_frames():
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(48, 64, 3))
+    reader = FrameBusReader(TEST_CAMERA_INDEX)
+    try:
+        assert reader.get_latest() is None
+
+        writer.publish(Frame(1, 123.0, np.full((48, 64, 3), 5, dtype=np.uint8)))
+        frame = reader.get_latest()
+        assert frame.sequence == 1
+        assert frame.timestamp == 123.0
+        assert frame.image.shape == (48, 64, 3)
+        assert frame.image[0, 0, 0] == 5
+        assert not frame.image.flags.writeable
+        assert reader.get_frame_after(1) is None
+
+        # A smaller frame keeps its own shape
+        writer.publish(Frame(2, 124.0, np.full((24, 32, 3), 9, dtype=np.uint8)))
+        assert reader.wait_for_frame(1, timeout=1).image.shape == (24, 32, 3)
+
+        # Once both slots have been rewritten the first view is stale
+        writer.publish(Frame(3, 125.0, np.zeros((48, 64, 3), dtype=np.uint8)))
+        assert not reader.is_frame_valid(frame)
+        del frame
+    finally:
+        reader.close()
+        writer.close()
+
+def test_oversized_frame_is_rejected():
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    try:
+        assert not writer.publish(Frame(1, 0.0, np.zeros((8, 8, 3), dtype=np.uint8)))
+    finally:
+        writer.close()
+
+def test_live_block_is_not_taken_over():
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    try:
+        with pytest.raises(FileExistsError):
+            FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+        # The running writer keeps its block
+        assert writer.publish(Frame(1, 0.0, np.zeros((4, 4, 3), dtype=np.uint8)))
+    finally:
+        writer.close()
+
+def test_stale_block_is_reclaimed():
+    stale = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    # A daemon that crashed stops updating the heartbeat
+    stale.header["heartbeat"] = time.time() - 60
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    try:
+        assert writer.header["writer_pid"] == os.getpid()
+    finally:
+        stale.header = stale.slots = None
+        stale.shm.close()
+        writer.close()
+
+def test_open_camera_prefers_running_daemon():
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    try:
+        camera = open_camera(TEST_CAMERA_INDEX)
+        assert isinstance(camera, SharedCameraClient)
+        # Sized like the daemon's CameraManager, before any frame
+        assert (camera.height, camera.width) == (4, 4)
+        assert camera.acquire() == 1
+        assert camera.release() == 0
+    finally:
+        writer.close()
+
+@patch("camera.frame_bus.HEARTBEAT_TIMEOUT", 0.2)
+def test_client_reattaches_to_restarted_daemon():
+    writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+    camera = SharedCameraClient(TEST_CAMERA_INDEX)
+    camera.acquire()
+    try:
+        writer.publish(Frame(50, time.time(), np.zeros((4, 4, 3), dtype=np.uint8)))
+        assert camera.wait_for_frame(0, timeout=1).sequence == 50
+
+        # The daemon restarts: its block is replaced and sequences start over
+        writer.close()
+        time.sleep(0.3)
+        writer = FrameBusWriter(TEST_CAMERA_INDEX, slot_count=2, max_shape=(4, 4, 3))
+        writer.publish(Frame(1, time.time(), np.full((4, 4, 3), 7, dtype=np.uint8)))
+
+        frame = camera.wait_for_frame(50, timeout=0.05)
+        assert frame.sequence == 1
+        assert frame.image[0, 0, 0] == 7
+    finally:
+        camera.release()
+        writer.close()
+
+@patch("camera.frame_bus.CameraManager.get_instance")
+def test_open_camera_falls_back_to_camera_manager(mock_get_instance):
+    camera = open_camera(TEST_CAMERA_INDEX)
+    mock_get_instance.assert_called_once_with(TEST_CAMERA_INDEX)
+    assert camera is mock_get_instance.return_value
@@ -0,0 +1,50 @@
+import sys
+import os
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from camera.camera_manager import Frame
+from camera.frame_cache import DerivedFrameCache, small_rgb, to_gray, encode_jpeg
+
+def _frame(sequence):
+    return Frame(sequence, time.time(), np.full((40, 40, 3), sequence, dtype=np.uint8))
+
+def test_derivative_computed_once_per_frame():
+    cache = DerivedFrameCache()
+    calls = []
+
+    def slow_transform(image):
+        calls.append(1)
+        time.sleep(0.05)
+        return image[:10]
+
+    frame = _frame(1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(frame, slow_transform)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert not results[0].flags.writeable
+    assert cache.misses == 1 and cache.hits == 3
+
+def test_keys_include_transform_arguments():
+    cache = DerivedFrameCache()
+    frame = _frame(1)
+    assert cache.get(frame, small_rgb, 2).shape == (20, 20, 3)
+    assert cache.get(frame, small_rgb, 4).shape == (10, 10, 3)
+    assert cache.get(frame, to_gray).shape == (40, 40)
+    assert isinstance(cache.get(frame, encode_jpeg), bytes)
+
+def test_old_frames_are_evicted():
+    cache = DerivedFrameCache(max_frames=2)
+    for sequence in range(1, 4):
+        cache.get(_frame(sequence), to_gray)
+    assert set(cache._keys_by_sequence) == {2, 3}
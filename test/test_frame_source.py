@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from camera.camera_manager import CameraManager
+from camera.frame_source import (SyntheticSource, ImageDirectorySource, VideoFileSource,
+                                 DeviceSource, create_source)
+
+def test_synthetic_source_decodes_into_buffer():
+    source = SyntheticSource(64, 48, fps=30, realtime=False, frame_limit=2)
+    assert source.open()
+    out = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    ret, frame = source.read(out)
+    assert ret and frame is out
+    ret, second = source.read(out)
+    assert ret
+    ret, _ = source.read(out)
+    assert not ret  # Frame limit reached
+
+def test_realtime_pacing_limits_frame_rate():
+    source = SyntheticSource(32, 24, fps=50, realtime=True)
+    source.open()
+    start = time.time()
+    for _ in range(6):
+        source.read()
+    # Five intervals of 20 ms between six frames
+    assert time.time() - start >= 0.09
+
+def test_image_directory_source_replays_in_order(tmp_path):
+    for value in (10, 20):
+        cv2.imwrite(str(tmp_path / f"frame_{value}.png"), np.full((8, 8, 3), value, dtype=np.uint8))
+
+    source = ImageDirectorySource(str(tmp_path), realtime=False, loop=False)
+    assert source.open()
+    assert source.read()[1][0, 0, 0] == 10
+    assert source.read()[1][0, 0, 0] == 20
+    assert source.read() == (False, None)
+
+def test_video_file_source_loops(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+    for _ in range(3):
+        writer.write(np.zeros((24, 32, 3), dtype=np.uint8))
+    writer.release()
+
+    source = VideoFileSource(path, realtime=False, loop=True)
+    assert source.open()
+    frames = [source.read()[0] for _ in range(5)]
+    assert all(frames)
+    source.release()
+
+def test_create_source():
+    assert isinstance(create_source("2"), DeviceSource)
+    assert isinstance(create_source("synthetic"), SyntheticSource)
+    assert isinstance(create_source("footage.mp4"), VideoFileSource)
+
+def test_camera_manager_captures_from_source():
+    cam = CameraManager(98, source=SyntheticSource(realtime=False))
+    try:
+        frame = cam.wait_for_frame(0, timeout=2)
+        assert frame is not None
+        assert frame.image.shape == (480, 640, 3)
+    finally:
+        cam._release_resources()
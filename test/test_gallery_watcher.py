@@ -0,0 +1,98 @@
+import os
+import numpy as np
+from unittest.mock import patch, MagicMock
+from auth.encodings_store import EncodingsStore
+from auth.gallery_watcher import GalleryWatcher
+
+
+def make_store(tmp_path, encodings=((0.1, 0.2, 0.3),), names=("TestUser",)):
+    store = EncodingsStore(str(tmp_path / "encodings.json"))
+    store.save(np.array(encodings, dtype=np.float32), list(names))
+    return store
+
+
+def test_store_change_triggers_reload(tmp_path):
+    store = make_store(tmp_path)
+    reload = MagicMock()
+    watcher = GalleryWatcher(store.path, reload)
+
+    assert watcher.check() is False
+    store.save(np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], dtype=np.float32), ["TestUser", "Other"])
+    os.utime(store.path, ns=(1, 1))  # mtime resolution can hide a fast rewrite
+
+    assert watcher.check() is True
+    reload.assert_called_once()
+    assert watcher.reloads == 1
+
+
+def test_touched_store_does_not_reload(tmp_path):
+    store = make_store(tmp_path)
+    reload = MagicMock()
+    watcher = GalleryWatcher(store.path, reload)
+
+    os.utime(store.path, ns=(1, 1))
+
+    assert watcher.check() is False
+    reload.assert_not_called()
+
+
+def test_users_version_change_triggers_reload(tmp_path):
+    store = make_store(tmp_path)
+    reload = MagicMock()
+    version = MagicMock(return_value=3)
+    watcher = GalleryWatcher(store.path, reload, users_version=version)
+
+    assert watcher.check() is False
+    version.return_value = 4
+    assert watcher.check() is True
+    reload.assert_called_once()
+
+
+def test_failed_reload_is_counted(tmp_path):
+    store = make_store(tmp_path)
+    version = MagicMock(return_value=1)
+    watcher = GalleryWatcher(store.path, MagicMock(side_effect=ValueError("corrupt")), users_version=version)
+
+    version.return_value = 2
+    watcher.check()
+
+    assert watcher.reloads == 0
+    assert watcher.failed_reloads == 1
+
+
+@patch("auth.face_authenticator.get_users_version")
+@patch("auth.face_authenticator.get_authorized_users")
+@patch("camera.camera_manager.CameraManager.get_instance")
+def test_authenticator_swaps_gallery_on_reload(mock_camera_instance, mock_get_users, mock_users_version, tmp_path):
+    from camera.camera_manager import Frame
+    from auth import face_authenticator
+
+    store = make_store(tmp_path)
+    mock_get_users.return_value = []
+    mock_users_version.return_value = 0
+
+    frames = iter(Frame(sequence, 0.0, None) for sequence in range(1, 3))
+    mock_camera = MagicMock()
+    mock_camera.wait_for_frame.side_effect = lambda *args, **kwargs: next(frames)
+    mock_camera.get_derived.return_value = np.random.RandomState(0).randint(0, 256, (120, 160, 3), dtype=np.uint8)
+    mock_camera_instance.return_value = mock_camera
+
+    with patch.object(face_authenticator, "ENCODINGS_PATH", store.path), \
+            patch("auth.face_authenticator.face_recognition") as mock_face_recognition, \
+            patch("auth.face_detector.face_recognition", mock_face_recognition):
+        auth = face_authenticator.FaceAuthenticator(motion_gating=False, hot_reload=True)
+        auth.watcher.stop()  # Checked by hand below
+        mock_face_recognition.face_locations.return_value = [(10, 50, 50, 10)]
+        mock_face_recognition.face_encodings.return_value = [np.array([0.1, 0.2, 0.3])]
+        assert auth.check_authentication() == ("TestUser", False)
+
+        # The user gets authorized while the authenticator keeps running
+        mock_get_users.return_value = ["TestUser"]
+        mock_users_version.return_value = 1
+        assert auth.watcher.check() is True
+        assert auth.check_authentication() == ("TestUser", True)
+
+    # The tracker is reset so the face is matched against the new gallery
+    assert mock_face_recognition.face_encodings.call_count == 2
+    assert auth.get_stats()["gallery_reloads"] == 1
+    auth.cleanup()
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import tempfile
 
 # Add the parent directory so `gui` can be imported
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -16,12 +17,31 @@ class TestHomepage(unittest.TestCase):
         homepage.StartNow()
         self.assertTrue(mock_popen.called, "subprocess.Popen should be called in StartNow")
 
-    @patch("gui.homepage.subprocess.Popen")  # ✅ Full path
+    @patch("gui.homepage.root")
+    @patch("gui.homepage.DatabaseService")
+    @patch("gui.homepage.train")
     @patch("gui.homepage.open_popup")        # ✅ Full path
-    def test_confirm_runs_script_and_popup(self, mock_popup, mock_popen):
-        homepage.Confirm()
-        self.assertTrue(mock_popen.called, "subprocess.Popen should be called in Confirm")
+    def test_confirm_starts_training_and_popup(self, mock_popup, mock_train, mock_db, mock_root):
+        mock_train.return_value = {"reused": 0, "recomputed": 1, "removed": 0, "encodings": 1}
+        with tempfile.TemporaryDirectory() as project_folder:
+            dataset_folder = os.path.join(project_folder, "face_rec_dataset")
+            os.makedirs(os.path.join(dataset_folder, "alice"))
+            with patch("gui.homepage.project_folder", project_folder):
+                homepage.Confirm()
+                homepage.training_thread.join(timeout=5)
+        mock_db.return_value.add_user.assert_called_once_with("alice", authorized=True)
+        mock_train.assert_called_once()
+        self.assertEqual(mock_train.call_args[1]["dataset_folder"], dataset_folder)
         self.assertTrue(mock_popup.called, "Popup should be called in Confirm")
 
+    @patch("gui.homepage.root")
+    @patch("gui.homepage.train")
+    def test_training_runs_in_background_thread(self, mock_train, mock_root):
+        mock_train.return_value = {"reused": 2, "recomputed": 1, "removed": 0, "encodings": 3}
+        homepage.start_training()
+        homepage.training_thread.join(timeout=5)
+        mock_train.assert_called_once()
+        self.assertTrue(mock_root.after.called, "Result should be shown from the GUI thread")
+
 if __name__ == "__main__":
     unittest.main()
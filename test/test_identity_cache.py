@@ -0,0 +1,66 @@
+import numpy as np
+from auth.face_gallery import Match, UNKNOWN
+from auth.identity_cache import IdentityCache
+
+
+def encoding(value, dimension=4):
+    vector = np.zeros(dimension, dtype=np.float32)
+    vector[0] = value
+    return vector
+
+
+def make_cache(**kwargs):
+    return IdentityCache(dimension=4, **kwargs)
+
+
+def test_nearby_encoding_hits_with_guaranteed_bounds():
+    cache = make_cache(max_distance=0.2)
+    cache.add(encoding(0.0), Match("Alice", 3, 0.3, 0.4), now=0)
+
+    match = cache.lookup(encoding(0.1), now=1)
+
+    assert match.name == "Alice" and match.index == 3
+    assert np.isclose(match.distance, 0.4) and np.isclose(match.margin, 0.2)
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_far_or_uncertain_encodings_miss():
+    cache = make_cache(max_distance=0.2)
+    cache.add(encoding(0.0), Match("Alice", 3, 0.3, 0.1), now=0)
+
+    assert cache.lookup(encoding(0.5), now=1) is None  # Too far from the cached encoding
+    assert cache.lookup(encoding(0.1), now=1) is None  # Runner-up could be closer
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_unknown_stays_unknown_only_when_certain():
+    cache = make_cache(max_distance=0.2, tolerance=0.6)
+    cache.add(encoding(0.0), Match(UNKNOWN, 1, 0.9, 0.2), now=0)
+
+    assert cache.lookup(encoding(0.1), now=1).name == UNKNOWN
+    cache.clear()
+    cache.add(encoding(0.0), Match(UNKNOWN, 1, 0.65, 0.2), now=0)
+    assert cache.lookup(encoding(0.1), now=1) is None
+
+
+def test_entries_expire_and_least_recently_used_is_replaced():
+    cache = make_cache(capacity=2, ttl=10.0)
+    cache.add(encoding(0.0), Match("Alice", 0, 0.1, 1.0), now=0)
+    cache.add(encoding(5.0), Match("Bob", 1, 0.1, 1.0), now=1)
+    assert cache.lookup(encoding(0.0), now=2).name == "Alice"
+
+    cache.add(encoding(10.0), Match("Carol", 2, 0.1, 1.0), now=3)  # Replaces Bob
+    assert cache.lookup(encoding(5.0), now=4) is None
+    assert cache.lookup(encoding(10.0), now=4).name == "Carol"
+
+    assert cache.lookup(encoding(10.0), now=20) is None
+    assert len(cache) == 0
+
+
+def test_clear_invalidates_entries():
+    cache = make_cache()
+    cache.add(encoding(0.0), Match("Alice", 0, 0.1, 1.0), now=0)
+    cache.clear()
+
+    assert cache.lookup(encoding(0.0), now=1) is None
+    assert cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,120 @@
+import threading
+import time
+import numpy as np
+from camera.camera_manager import Frame
+from camera.jpeg_encoder import JpegEncoder
+
+
+class FakeCamera:
+    """Publishes a numbered frame on demand and counts the JPEG encodes."""
+
+    def __init__(self):
+        self.sequence = 0
+        self.timestamp = 0.0
+        self.encodes = 0
+        self.ready = threading.Condition()
+
+    def publish(self, timestamp=None):
+        with self.ready:
+            self.sequence += 1
+            self.timestamp = time.time() if timestamp is None else timestamp
+            self.ready.notify_all()
+
+    def get_latest(self, consumer=None):
+        with self.ready:
+            if not self.sequence:
+                return None
+            return Frame(self.sequence, self.timestamp, np.zeros((4, 4, 3), dtype=np.uint8))
+
+    def wait_for_frame(self, after_sequence=0, timeout=None, consumer=None):
+        with self.ready:
+            self.ready.wait_for(lambda: self.sequence > after_sequence, timeout)
+            if self.sequence <= after_sequence:
+                return None
+            return Frame(self.sequence, self.timestamp, np.zeros((4, 4, 3), dtype=np.uint8))
+
+    def get_derived(self, frame, transform, *args):
+        self.encodes += 1
+        return f"jpeg-{frame.sequence}".encode()
+
+
+def test_frames_are_encoded_once_for_all_clients():
+    camera = FakeCamera()
+    encoder = JpegEncoder(camera)
+    encoder.add_client()
+    encoder.add_client()
+    try:
+        camera.publish()
+        first = encoder.wait_for_frame(0, timeout=1.0)
+        second = encoder.wait_for_frame(0, timeout=1.0)
+        assert first.jpeg == b"jpeg-1"
+        assert first is second  # Both clients write the same cached bytes
+
+        # Nothing new: clients wait instead of getting the same frame again
+        assert encoder.wait_for_frame(first.sequence, timeout=0.1) is None
+        camera.publish()
+        assert encoder.wait_for_frame(first.sequence, timeout=1.0).sequence == 2
+        assert camera.encodes == 2
+        assert encoder.get_stats()["clients"] == 2
+    finally:
+        encoder.stop()
+
+
+def test_nothing_is_encoded_without_clients():
+    camera = FakeCamera()
+    encoder = JpegEncoder(camera)
+    encoder.add_client()
+    encoder.remove_client()
+    try:
+        camera.publish()
+        time.sleep(0.1)
+        assert camera.encodes == 0
+        assert encoder.latest is None
+    finally:
+        encoder.stop()
+
+
+def test_snapshots_share_encodes_until_max_age():
+    camera = FakeCamera()
+    encoder = JpegEncoder(camera)
+    assert encoder.snapshot() is None  # No frame yet
+
+    camera.publish(timestamp=100.0)
+    first = encoder.snapshot(max_age=1.0)
+    assert first.jpeg == b"jpeg-1"
+    # Newer frames within max_age and repeated polls reuse the cached JPEG
+    camera.publish(timestamp=100.5)
+    assert encoder.snapshot(max_age=1.0) is first
+    assert encoder.snapshot(max_age=1.0) is first
+    assert camera.encodes == 1
+
+    camera.publish(timestamp=101.5)
+    assert encoder.snapshot(max_age=1.0).sequence == 3
+    assert camera.encodes == 2
+
+
+def test_snapshot_uses_the_stream_frame_while_clients_watch():
+    camera = FakeCamera()
+    encoder = JpegEncoder(camera)
+    encoder.add_client()
+    try:
+        camera.publish()
+        streamed = encoder.wait_for_frame(0, timeout=1.0)
+        camera.publish(timestamp=time.time() + 10)
+        # The encoder thread encodes the new frame for its clients, the snapshot never does
+        assert encoder.snapshot(max_age=0.0) in (streamed, encoder.latest)
+        encoder.wait_for_frame(streamed.sequence, timeout=1.0)
+        assert camera.encodes == 2
+    finally:
+        encoder.stop()
+
+
+def test_scaled_jpeg_keeps_aspect_ratio():
+    import cv2
+    from camera.frame_cache import scaled_jpeg
+
+    image = np.random.RandomState(0).randint(0, 256, (480, 640, 3)).astype(np.uint8)
+    jpeg = scaled_jpeg(image, 320, 60)
+    decoded = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (240, 320, 3)
+    assert len(jpeg) < len(scaled_jpeg(image, 320, 95))
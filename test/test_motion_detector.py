@@ -0,0 +1,34 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from auth.motion_detector import MotionDetector
+
+def test_static_scene_has_no_motion():
+    detector = MotionDetector()
+    frame = np.full((60, 80), 100, dtype=np.uint8)
+
+    assert detector.detect(frame)  # First frame always goes through
+    assert not detector.detect(frame)
+    assert not detector.detect(frame)
+    assert detector.frames_seen == 3
+    assert detector.frames_with_motion == 1
+
+def test_moving_object_is_detected():
+    detector = MotionDetector()
+    frame = np.full((60, 80), 100, dtype=np.uint8)
+    detector.detect(frame)
+
+    moved = frame.copy()
+    moved[20:40, 30:50] = 250
+    assert detector.detect(moved)
+
+def test_sensor_noise_is_ignored():
+    detector = MotionDetector()
+    rng = np.random.default_rng(0)
+    base = np.full((60, 80), 100, dtype=np.int16)
+    detector.detect(base.astype(np.uint8))
+    noisy = np.clip(base + rng.integers(-5, 6, base.shape), 0, 255).astype(np.uint8)
+    assert not detector.detect(noisy)
@@ -57,3 +57,15 @@ def test_disconnect(mock_mqtt_client):
     mqtt_service.disconnect()
     mock_client_instance.loop_stop.assert_called()
     mock_client_instance.disconnect.assert_called()
+
+@patch("mqtt.mqtt_service.mqtt.Client")
+def test_publish_camera_state(mock_mqtt_client):
+    mock_client_instance = MagicMock()
+    mock_mqtt_client.return_value = mock_client_instance
+
+    mqtt_service = MQTTService()
+    assert mqtt_service.publish_camera_state("Front Door Camera", "offline")
+    mock_client_instance.publish.assert_called_with(
+        "central_main/status",
+        '{"name": "Front Door Camera", "state": "offline"}'
+    )
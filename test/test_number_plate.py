@@ -2,6 +2,9 @@ import unittest
 import os
 import numpy as np
 import pytesseract
+from unittest.mock import patch, MagicMock
+import number_plate
+from camera.camera_manager import Frame
 from number_plate import LicensePlateRecognizer
 
 class TestLicensePlateRecognizer(unittest.TestCase):
@@ -30,3 +33,30 @@ class TestLicensePlateRecognizer(unittest.TestCase):
         status, plate = self.recognizer.process_frame(dummy_img)
         self.assertIsNone(status)
         self.assertIsNone(plate)
+
+class TestRecognitionLoop(unittest.TestCase):
+    @patch("number_plate.cv2")
+    @patch("number_plate.open_camera")
+    def test_recognition_survives_a_camera_reconnect(self, mock_open_camera, mock_cv2):
+        # The OCR models are not needed to run the loop
+        recognizer = LicensePlateRecognizer.__new__(LicensePlateRecognizer)
+        image = np.zeros((48, 64, 3), dtype=np.uint8)
+
+        # No frames for two timeouts while the camera reconnects, then frames again
+        frames = iter([Frame(1, 0.0, image), None, None, Frame(2, 0.0, image)])
+
+        def wait_for_frame(*args, **kwargs):
+            frame = next(frames, None)
+            if frame is None and number_plate.running and mock_cv2.imshow.called:
+                number_plate.running = False  # Stop once the camera is back
+            return frame
+
+        camera = mock_open_camera.return_value
+        camera.wait_for_frame.side_effect = wait_for_frame
+        mock_cv2.waitKey.return_value = -1
+        recognizer.last_capture_time = float("inf")  # Only display, no processing
+
+        with patch.object(number_plate, "running", True):
+            recognizer.license_plate_recognition()
+        self.assertEqual(mock_cv2.imshow.call_count, 1)
+        camera.release.assert_called_once()
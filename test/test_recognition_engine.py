@@ -0,0 +1,91 @@
+import time
+import numpy as np
+from auth.recognition_engine import RecognitionEngine
+
+def fake_recognize(image, model):
+    """Stand-in for face_recognition: one 'face' whose encoding is the image brightness."""
+    time.sleep(0.01 * (image[0, 0, 0] % 3))  # Uneven work so results finish out of order
+    return [(0, 1, 1, 0)], [np.full(128, image.mean())]
+
+def slow_recognize(image, model):
+    """Hangs on frames whose first pixel is 255, answers the others at once."""
+    if image[0, 0, 0] == 255:
+        time.sleep(60)
+    return [], []
+
+def test_results_come_back_in_order_through_shared_memory():
+    engine = RecognitionEngine(workers=2, max_shape=(12, 16, 3), recognize=fake_recognize)
+    try:
+        results = []
+        for sequence in range(1, 11):
+            image = np.full((12, 16, 3), sequence, dtype=np.uint8)
+            while not engine.submit(sequence, image):
+                results.append(engine.get_result(timeout=10))
+        while engine.in_flight():
+            results.append(engine.get_result(timeout=10))
+
+        assert [result.sequence for result in results] == list(range(1, 11))
+        for result in results:
+            assert result.error is None
+            assert result.encodings[0][0] == result.sequence
+
+        stats = engine.get_stats()
+        assert stats["submitted"] == 10
+        assert sum(worker["frames"] for worker in stats["per_worker"]) == 10
+        assert stats["per_worker"][0]["latency"]["count"] == stats["per_worker"][0]["frames"]
+    finally:
+        engine.stop()
+
+def test_get_result_times_out_when_nothing_is_ready():
+    engine = RecognitionEngine(workers=1, max_shape=(12, 16, 3), recognize=fake_recognize)
+    try:
+        assert engine.get_result(timeout=0.05) is None
+        assert not engine.submit(1, np.zeros((24, 32, 3), dtype=np.uint8))  # Too large for a slot
+    finally:
+        engine.stop()
+
+
+def test_recognize_faces_skips_encoding_low_quality_faces():
+    from unittest.mock import patch
+    from auth.face_quality import FaceQuality
+    from auth.recognition_engine import recognize_faces
+
+    image = np.random.RandomState(0).randint(0, 256, (80, 80, 3)).astype(np.uint8)
+    with patch("face_recognition.face_locations", return_value=[(10, 70, 70, 10), (10, 15, 15, 10)]), \
+            patch("face_recognition.face_encodings", return_value=[np.zeros(128)]) as mock_encodings:
+        locations, encodings = recognize_faces(image, quality=FaceQuality())
+
+    assert len(locations) == 2
+    assert encodings[0] is not None and encodings[1] is None
+    assert mock_encodings.call_args[0][1] == [(10, 70, 70, 10)]
+
+def test_dead_worker_is_restarted_and_its_frames_fail():
+    engine = RecognitionEngine(workers=1, max_shape=(12, 16, 3), recognize=slow_recognize)
+    try:
+        assert engine.submit(1, np.full((12, 16, 3), 255, dtype=np.uint8))
+        time.sleep(0.5)
+        engine._processes[0].kill()  # e.g. the out-of-memory killer
+
+        result = engine.get_result(timeout=10)
+        assert result.sequence == 1
+        assert "died" in result.error
+        assert engine.in_flight() == 0
+
+        # The restarted worker takes new frames, all slots are free again
+        for sequence in (2, 3):
+            assert engine.submit(sequence, np.zeros((12, 16, 3), dtype=np.uint8))
+        assert [engine.get_result(timeout=10).error for _ in range(2)] == [None, None]
+        assert engine.get_stats()["per_worker"][0]["restarts"] == 1
+    finally:
+        engine.stop()
+
+def test_hung_worker_is_restarted_after_the_task_timeout():
+    engine = RecognitionEngine(workers=1, max_shape=(12, 16, 3), recognize=slow_recognize, task_timeout=1.0)
+    try:
+        assert engine.submit(1, np.full((12, 16, 3), 255, dtype=np.uint8))
+        result = engine.get_result(timeout=10)
+        assert result.sequence == 1 and "longer than" in result.error
+        assert engine.submit(2, np.zeros((12, 16, 3), dtype=np.uint8))
+        assert engine.get_result(timeout=10).error is None
+    finally:
+        engine.stop()
@@ -114,6 +114,18 @@ def test_start_stream(mock_init_camera, mock_app_run):
         # Verify app.run was called with correct parameters
         mock_app_run.assert_called_once_with(host='127.0.0.1', port=5001, threaded=True)
 
+@patch("camera.video_stream.app.run")
+@patch("camera.video_stream.init_camera")
+def test_start_stream_async_mode(mock_init_camera, mock_app_run):
+    mock_init_camera.return_value = True
+
+    with patch.dict(os.environ, {"STREAM_MODE": "async"}), \
+            patch("camera.async_stream.run_async_stream", return_value=True) as mock_run_async:
+        start_stream()
+
+    mock_run_async.assert_called_once()
+    mock_app_run.assert_not_called()
+
 @patch("camera.video_stream.init_camera")
 def test_start_stream_with_camera_error(mock_init_camera):
     # Mock initialization failure
@@ -124,5 +136,146 @@ def test_start_stream_with_camera_error(mock_init_camera):
         start_stream()
         mock_print.assert_called_with("[ERROR] Could not initialize camera")
 
+@patch("camera.video_stream.camera_manager")
+def test_stats_route(mock_camera_manager):
+    mock_camera_manager.get_stats.return_value = {"capture_fps": 30.0, "consumers": {}}
+
+    response = app.test_client().get('/stats')
+    assert response.status_code == 200
+    assert response.get_json()["capture_fps"] == 30.0
+
+def test_camera_feed_writes_encoded_frames():
+    from camera.jpeg_encoder import EncodedFrame
+
+    mock_encoder = MagicMock()
+    mock_encoder.wait_for_frame.return_value = EncodedFrame(7, 0.0, b'fake-jpeg-data')
+    with patch("camera.video_stream.get_encoder", return_value=mock_encoder), \
+            patch("camera.video_stream.stream_active", True), \
+            patch.dict(os.environ, {"STREAM_MAX_FPS": "1000"}):
+        generator = get_camera_feed()
+        chunk = next(generator)
+        next(generator)
+        generator.close()
+
+    assert b'--frame' in chunk and b'fake-jpeg-data' in chunk
+    # The client only asks for frames newer than the one it was sent
+    assert mock_encoder.wait_for_frame.call_args[0][0] == 7
+    mock_encoder.add_client.assert_called_once()
+    mock_encoder.remove_client.assert_called_once()
+
+def test_camera_feed_is_paced_to_the_profile_fps():
+    from camera.jpeg_encoder import EncodedFrame
+    from camera.video_stream import StreamProfile
+
+    sequences = iter(range(1, 100))
+    mock_encoder = MagicMock()
+    mock_encoder.wait_for_frame.side_effect = lambda *args, **kwargs: EncodedFrame(next(sequences), 0.0, b'jpeg')
+    with patch("camera.video_stream.get_encoder", return_value=mock_encoder), \
+            patch("camera.video_stream.stream_active", True):
+        generator = get_camera_feed(StreamProfile(None, None, 20))
+        start = time.time()
+        for _ in range(4):
+            next(generator)
+        elapsed = time.time() - start
+        generator.close()
+
+    # Three intervals of 50 ms between four frames, although frames were always ready
+    assert elapsed >= 0.14
+
+@patch("camera.video_stream.camera_manager")
+def test_profiles_are_rounded_and_share_encoders(mock_camera_manager):
+    from werkzeug.datastructures import MultiDict
+    from camera import video_stream
+
+    mock_camera_manager.width = 640
+    profile = video_stream.parse_profile(MultiDict({"w": "330", "q": "62", "fps": "5"}))
+    assert profile == video_stream.StreamProfile(320, 60, 5.0)
+    assert video_stream.parse_profile(MultiDict({"w": "4000", "q": "abc"})) == video_stream.DEFAULT_PROFILE
+
+    with patch.dict(video_stream.jpeg_encoders, clear=True):
+        first = video_stream.get_encoder(profile)
+        assert video_stream.get_encoder(video_stream.StreamProfile(320, 60, 15.0)) is first
+        assert video_stream.get_encoder(video_stream.DEFAULT_PROFILE) is not first
+        assert (first.width, first.quality) == (320, 60)
+
+@patch.dict(os.environ, {"STREAM_CAMERAS": "1,2"})
+def test_snapshot_route_supports_etags():
+    from camera.jpeg_encoder import EncodedFrame
+
+    encoded = EncodedFrame(12, 1700000000.0, b'fake-jpeg-data')
+    with patch("camera.video_stream.get_snapshot", return_value=encoded) as mock_get_snapshot:
+        client = app.test_client()
+        response = client.get('/snapshot/1.jpg')
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.data == b'fake-jpeg-data'
+        assert mock_get_snapshot.call_args[0][0] == 1
+
+        etag = response.headers['ETag']
+        cached = client.get('/snapshot/1.jpg', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+
+    with patch("camera.video_stream.get_snapshot", return_value=None):
+        assert app.test_client().get('/snapshot/2.jpg').status_code == 503
+
+@patch("camera.video_stream.attach_camera")
+def test_cameras_are_opened_on_request_and_released_when_idle(mock_attach_camera):
+    from camera import video_stream
+
+    mock_camera = MagicMock(camera_index=2, width=640)
+    mock_attach_camera.return_value = mock_camera
+    with patch.dict(video_stream.jpeg_encoders, clear=True), \
+            patch.dict(video_stream.stream_cameras, clear=True), \
+            patch.dict(video_stream.camera_last_used, clear=True), \
+            patch("camera.video_stream.idle_thread", MagicMock()), \
+            patch.dict(os.environ, {"STREAM_IDLE_TIMEOUT": "60", "STREAM_CAMERAS": "1,2"}):
+        assert video_stream.get_stream_camera(2) is mock_camera
+        encoder = video_stream.get_encoder(video_stream.DEFAULT_PROFILE, 2)
+        assert encoder.camera is mock_camera
+        assert video_stream.get_stream_camera(2) is mock_camera
+        mock_attach_camera.assert_called_once_with(2)
+        mock_camera.acquire.assert_called_once()
+
+        opened = video_stream.camera_last_used[2]
+        # Kept while a client watches, however long
+        encoder.clients = 1
+        assert video_stream.release_idle_cameras(now=opened + 600) == 0
+        encoder.clients = 0
+        assert video_stream.release_idle_cameras(now=opened + 630) == 0
+        assert video_stream.release_idle_cameras(now=opened + 700) == 1
+        mock_camera.release.assert_called_once()
+        assert 2 not in video_stream.stream_cameras
+        assert not video_stream.jpeg_encoders
+
+@patch.dict(os.environ, {"STREAM_CAMERAS": "1,2"})
+@patch("camera.video_stream.get_stream_camera", return_value=None)
+def test_unavailable_camera_feed(mock_get_stream_camera):
+    response = app.test_client().get('/video_feed/2')
+    assert response.status_code == 503
+    mock_get_stream_camera.assert_called_once_with(2)
+
+@patch("camera.video_stream.attach_camera")
+def test_only_configured_cameras_are_attached(mock_attach_camera):
+    from camera import video_stream
+
+    client = app.test_client()
+    with patch.dict(os.environ, {"STREAM_CAMERAS": "1"}):
+        assert client.get('/video_feed/2').status_code == 404
+        assert client.get('/snapshot/7.jpg').status_code == 404
+        assert video_stream.get_stream_camera(9) is None
+    mock_attach_camera.assert_not_called()
+
+@patch("camera.frame_bus.CameraManager.get_instance")
+def test_unpublished_camera_is_not_opened_in_process(mock_get_instance):
+    from camera import video_stream
+
+    with patch.dict(video_stream.stream_cameras, clear=True), \
+            patch.dict(os.environ, {"STREAM_CAMERAS": "1,2"}):
+        # No process publishes camera 2 on the frame bus
+        assert app.test_client().get('/snapshot/2.jpg').status_code == 503
+        assert 2 not in video_stream.stream_cameras
+    mock_get_instance.assert_not_called()
+
 if __name__ == "__main__":
     pytest.main(["-v"])
\ No newline at end of file
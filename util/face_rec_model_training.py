@@ -1,55 +1,248 @@
+"""Encode the face_rec_dataset images into the face encodings store.
+
+Usable from the command line:
+
+    python util/face_rec_model_training.py --workers 4 --max-side 800
+
+or from Python, e.g. the homepage after a user change:
+
+    from util.face_rec_model_training import train
+    counts = train(progress=lambda done, total: print(done, total))
+"""
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
 from imutils import paths
 import face_recognition
-import pickle
 import cv2
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from auth.encodings_store import EncodingsStore, write_atomic
+from auth.gallery_index import create_index, index_path, save_index
+
+MANIFEST_VERSION = 1
+
+DATASET_FOLDER = "face_rec_dataset"
+MODELS_FOLDER = "models"
+STORE_FILE = "face_rec_encodings.json"
+MANIFEST_FILE = "face_rec_manifest.json"
+
+# Images larger than this (longest side, in pixels) are downscaled for detection
+DETECTION_MAX_SIDE = 800
+CHUNK_SIZE = 8
+
 def create_folder(folder_name):
     if not os.path.exists(folder_name):
         os.makedirs(folder_name)
     return folder_name
 
-print("[INFO] Starting face processing...")
+def image_hash(image_path):
+    """SHA-256 of an image file's content"""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path):
+    """Load the image hash -> face count manifest of the previous run"""
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest["images"]
+        print(f"[WARNING] Unsupported manifest version in '{manifest_path}', re-encoding all images")
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        print(f"[WARNING] Unreadable manifest '{manifest_path}', re-encoding all images: {e}")
+    return {}
 
-# Define dataset and models folder
-dataset_folder = "face_rec_dataset"
-models_folder = create_folder("models")
+def save_manifest(manifest_path, images):
+    manifest = {"version": MANIFEST_VERSION, "images": images}
+    write_atomic(manifest_path, lambda f: f.write(json.dumps(manifest, indent=1).encode()))
 
-# Initialize lists for encodings and names
-knownEncodings = []
-knownNames = []
+def load_previous_encodings(store):
+    """Encodings of the previous run grouped by image hash (row ids are '<hash>:<n>')"""
+    if not store.exists():
+        return {}
+    try:
+        data = store.load(mmap=False)
+    except ValueError as e:
+        print(f"[WARNING] Ignoring previous encodings: {e}")
+        return {}
+    by_hash = {}
+    for encoding, row_id in zip(data.matrix, data.ids):
+        by_hash.setdefault(row_id.split(":")[0], []).append(encoding)
+    return by_hash
 
-# Get image paths from the dataset folder
-imagePaths = list(paths.list_images(dataset_folder))
+def encode_image(image_path, max_side=DETECTION_MAX_SIDE):
+    """Detect the faces in an image and compute their encodings.
 
-for (i, imagePath) in enumerate(imagePaths):
-    print(f"[INFO] Processing image {i + 1}/{len(imagePaths)}")
-    name = os.path.basename(os.path.dirname(imagePath))  # Extract the person's name from the folder structure
-    
+    Detection runs on a copy downscaled to max_side, the boxes are mapped
+    back so encodings are computed at full resolution.
+    """
     # Load the image and convert it to RGB
-    image = cv2.imread(imagePath)
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"[WARNING] Could not read '{image_path}'")
+        return []
     rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
-    # Detect face locations and compute encodings
-    boxes = face_recognition.face_locations(rgb, model="hog")
-    encodings = face_recognition.face_encodings(rgb, boxes)
-    
-    # Append encodings and names to the respective lists
-    for encoding in encodings:
-        knownEncodings.append(encoding)
-        knownNames.append(name)
-
-print("[INFO] Serializing encodings...")
-
-# Save the encodings and names to a pickle file
-data = {"encodings": knownEncodings, "names": knownNames}
-pickle_file_path = os.path.join(models_folder, "face_rec_encodings.pickle")
-
-try:
-    with open(pickle_file_path, "wb") as f:
-        f.write(pickle.dumps(data))
-    print(f"[INFO] Training complete. Encodings saved to '{pickle_file_path}'")
-except IOError as e:
-    print(f"[ERROR] Failed to save encodings: {e}")
 
+    height, width = rgb.shape[:2]
+    scale = max_side / float(max(height, width)) if max_side else 1.0
+    if scale >= 1.0:
+        boxes = face_recognition.face_locations(rgb, model="hog")
+    else:
+        small = cv2.resize(rgb, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        boxes = [(max(int(top / scale), 0), min(int(right / scale), width),
+                  min(int(bottom / scale), height), max(int(left / scale), 0))
+                 for top, right, bottom, left in face_recognition.face_locations(small, model="hog")]
+    return face_recognition.face_encodings(rgb, boxes)
+
+def _encode_chunk(task):
+    """Pool worker: encode a chunk of images"""
+    image_paths, max_side = task
+    return [(image_path, encode_image(image_path, max_side)) for image_path in image_paths]
+
+def encode_images(image_paths, workers=None, chunk_size=CHUNK_SIZE, max_side=DETECTION_MAX_SIDE, progress=None):
+    """Encode images in chunks across a process pool, returning {path: encodings}.
+
+    progress(done, total) is called after every finished chunk.
+    """
+    results = {}
+    if not image_paths:
+        return results
+    chunks = [(image_paths[start:start + chunk_size], max_side)
+              for start in range(0, len(image_paths), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+
+    if workers == 1:
+        finished = map(_encode_chunk, chunks)
+        pool = None
+    else:
+        # Spawned workers do not inherit the GUI or camera threads of the caller
+        pool = multiprocessing.get_context("spawn").Pool(workers)
+        finished = pool.imap_unordered(_encode_chunk, chunks)
+    try:
+        for chunk_results in finished:
+            results.update(chunk_results)
+            if progress is not None:
+                progress(len(results), len(image_paths))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return results
+
+def update_encodings(image_paths, store, manifest_path, encode=None, workers=None,
+                     chunk_size=CHUNK_SIZE, max_side=DETECTION_MAX_SIDE, progress=None):
+    """Bring the encodings store up to date with the dataset images.
+
+    Only images whose content hash is not in the manifest of the previous
+    run are encoded, by the batch encoder or by `encode(path)` in this
+    process when given; encodings of deleted images are dropped. Returns
+    the counts of reused, recomputed and removed images.
+    """
+    manifest = load_manifest(manifest_path)
+    previous = load_previous_encodings(store)
+
+    # Decide per image whether the previous encodings can be reused
+    images = {}
+    entries = []
+    to_encode = []
+    for image_path in image_paths:
+        name = os.path.basename(os.path.dirname(image_path))  # Extract the person's name from the folder structure
+        content_hash = image_hash(image_path)
+        if content_hash in images:
+            continue  # Same picture enrolled twice, adds nothing
+        images[content_hash] = {"path": image_path, "name": name}
+        entry = manifest.get(content_hash)
+        reuse = entry is not None and entry["faces"] == len(previous.get(content_hash, []))
+        entries.append((content_hash, name, image_path, reuse))
+        if not reuse:
+            to_encode.append(image_path)
+
+    if encode is not None:
+        computed = {}
+        for image_path in to_encode:
+            computed[image_path] = encode(image_path)
+            if progress is not None:
+                progress(len(computed), len(to_encode))
+    else:
+        computed = encode_images(to_encode, workers, chunk_size, max_side, progress)
+
+    encodings = []
+    names = []
+    ids = []
+    for content_hash, name, image_path, reuse in entries:
+        image_encodings = previous.get(content_hash, []) if reuse else computed[image_path]
+        images[content_hash]["faces"] = len(image_encodings)
+        for n, encoding in enumerate(image_encodings):
+            encodings.append(encoding)
+            names.append(name)
+            ids.append(f"{content_hash}:{n}")
+
+    removed = len(set(manifest) - set(images))
+    # The store is written first; a manifest without matching rows only causes re-encoding
+    store.save(encodings, names, ids=ids)
+    save_manifest(manifest_path, images)
+    return {"reused": len(entries) - len(to_encode), "recomputed": len(to_encode),
+            "removed": removed, "encodings": len(encodings)}
+
+def save_search_basis(store):
+    """Fit the PCA basis of the coarse-to-fine gallery search and save it next to the encodings"""
+    data = store.load(mmap=False)
+    if not len(data.matrix):
+        return None
+    path = index_path(store.path, "pca")
+    save_index(create_index("pca", data.matrix), data.matrix, path)
+    return path
+
+def train(dataset_folder=DATASET_FOLDER, models_folder=MODELS_FOLDER, workers=None,
+          chunk_size=CHUNK_SIZE, max_side=DETECTION_MAX_SIDE, progress=None):
+    """Update the encodings store from the dataset folder, returning the counts of update_encodings"""
+    print("[INFO] Starting face processing...")
+    start = time.time()
+    create_folder(models_folder)
+
+    # Get image paths from the dataset folder
+    image_paths = sorted(paths.list_images(dataset_folder)) if os.path.isdir(dataset_folder) else []
+
+    store_path = os.path.join(models_folder, STORE_FILE)
+    counts = update_encodings(image_paths, EncodingsStore(store_path), os.path.join(models_folder, MANIFEST_FILE),
+                              workers=workers, chunk_size=chunk_size, max_side=max_side, progress=progress)
+    print(f"[INFO] Images reused: {counts['reused']}, recomputed: {counts['recomputed']}, "
+          f"removed: {counts['removed']}")
+    basis_path = save_search_basis(EncodingsStore(store_path))
+    if basis_path is not None:
+        print(f"[INFO] PCA search basis saved to '{basis_path}'")
+    print(f"[INFO] Training complete in {time.time() - start:.1f}s. "
+          f"{counts['encodings']} encodings saved to '{store_path}'")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode the face dataset into the encodings store")
+    parser.add_argument("--dataset", default=DATASET_FOLDER, help="Folder with one sub-folder of images per user")
+    parser.add_argument("--models", default=MODELS_FOLDER, help="Folder of the encodings store")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Images per work item")
+    parser.add_argument("--max-side", type=int, default=DETECTION_MAX_SIDE,
+                        help="Downscale larger images to this size for detection (0 = never)")
+    args = parser.parse_args()
+
+    def progress(done, total):
+        print(f"[INFO] Encoded {done}/{total} images")
+
+    try:
+        train(args.dataset, args.models, args.workers, args.chunk_size, args.max_side, progress)
+    except (IOError, ValueError) as e:
+        print(f"[ERROR] Failed to save encodings: {e}")
+        sys.exit(1)
 
+if __name__ == "__main__":
+    main()
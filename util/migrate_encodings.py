@@ -0,0 +1,44 @@
+"""Convert a legacy face_rec_encodings.pickle into the encodings store.
+
+Only run this on pickle files you created yourself, unpickling executes
+whatever the file contains.
+
+    python -m util.migrate_encodings
+    python -m util.migrate_encodings --pickle old/face_rec_encodings.pickle --remove
+"""
+import argparse
+import os
+import pickle
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from auth.encodings_store import EncodingsStore, DEFAULT_STORE_PATH
+
+
+def migrate(pickle_path, store_path=DEFAULT_STORE_PATH, remove=False):
+    """Write the encodings of a legacy pickle to the store, returning the new header."""
+    with open(pickle_path, "rb") as f:
+        data = pickle.loads(f.read())
+    header = EncodingsStore(store_path).save(data["encodings"], data["names"])
+    print(f"[INFO] Migrated {header['count']} encodings from '{pickle_path}' to '{store_path}'")
+    if remove:
+        os.remove(pickle_path)
+        print(f"[INFO] Removed '{pickle_path}'")
+    return header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert legacy pickled face encodings to the encodings store")
+    parser.add_argument("--pickle", default="models/face_rec_encodings.pickle", help="Legacy pickle file")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Encodings store header to write")
+    parser.add_argument("--remove", action="store_true", help="Delete the pickle after migrating")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pickle):
+        print(f"[ERROR] '{args.pickle}' not found")
+        sys.exit(1)
+    migrate(args.pickle, args.store, args.remove)
+
+
+if __name__ == "__main__":
+    main()